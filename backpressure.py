@@ -0,0 +1,173 @@
+"""
+    Precomputed backpressure patterns for the valid/ready drivers and monitors of cmd_tester
+
+    A pattern is a list of (on, off) windows computed once, with numpy, from its name: `on` cycles where valid (ready)
+    is asserted followed by `off` cycles where it is not, the same windows the cocotb bit generators yield. The drivers
+    and monitors step through the windows by index (Pattern.window), with no generator call or log message per window.
+    A pattern is fully determined by its name, so the name of a failing combination, as logged by the tester, replays
+    it exactly:
+
+        tb = CmdDoneTester(dut, dut.clk, valid_generator='bursty:seed=3,burst=16,gap=8', ready_generator='alternating')
+        VALID_PATTERN=random:seed=7,p=0.25 READY_PATTERN=trace:path=ready.txt make
+
+    Patterns:
+        random        every cycle on with probability p, independently
+        bursty        runs of on and off cycles of geometric length, with means `burst` and `gap`
+        periodic      `on` cycles on, `off` cycles off, forever
+        alternating   one cycle on, one off: the worst case for a handshake, a stall on every other beat
+        trace         replay of a recorded trace, a file of '0'/'1' characters one per cycle (whitespace is ignored),
+                      once and then always on unless repeat=1; 'trace:path=<path>[,repeat=1]' takes the path
+                      verbatim, commas and digits included
+
+    Random and bursty patterns are `n` windows long and repeat after that.
+"""
+import numpy as np
+
+
+class Pattern(object):
+    """ named, precomputed (on, off) windows; a drop-in for a generator function such as cocotb's random_50_percent """
+
+    def __init__(self, name, on, off, repeat=True):
+        assert len(on) == len(off) and len(on) > 0, "a pattern needs at least one window"
+        self.name = name
+        self.windows = list(zip(np.asarray(on).tolist(), np.asarray(off).tolist()))
+        self.repeat = repeat
+
+    def __repr__(self):
+        return f"Pattern('{self.name}')"
+
+    def __eq__(self, other):
+        return (isinstance(other, Pattern) and
+                (self.name, self.windows, self.repeat) == (other.name, other.windows, other.repeat))
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def __call__(self):
+        # ValidReadyTester calls its generator function to start a transaction, consumers restart at window 0
+        return self
+
+    def __iter__(self):
+        while True:
+            yield from self.windows
+            if not self.repeat:
+                return
+
+    def window(self, index):
+        """ (on, off, next index) of window `index`; past the end of a pattern that does not repeat: always on """
+        if index == len(self.windows):
+            if not self.repeat:
+                return True, False, index
+            index = 0
+        on, off = self.windows[index]
+        return on, off, index + 1
+
+    @property
+    def duty(self):
+        """ fraction of on cycles over one pass of the windows """
+        on = sum(w[0] for w in self.windows)
+        return on / (on + sum(w[1] for w in self.windows))
+
+    def bits(self):
+        """ one pass of the windows, one 0/1 per cycle, as read by `trace` """
+        return np.repeat(np.tile([1, 0], len(self.windows)).astype(np.uint8), np.ravel(self.windows))
+
+
+def _rng(seed):
+    return np.random.Generator(np.random.Philox(seed))
+
+
+def random(seed=0, p=0.5, n=1024):
+    assert 0 < p < 1, "p should be in (0, 1)"
+    rng = _rng(seed)
+    return Pattern(f"random:seed={seed},p={p},n={n}", rng.geometric(1 - p, n), rng.geometric(p, n))
+
+
+def bursty(seed=0, burst=16, gap=8, n=1024):
+    assert burst >= 1 and gap >= 1, "mean burst and gap lengths should be at least 1"
+    rng = _rng(seed)
+    return Pattern(f"bursty:seed={seed},burst={burst},gap={gap},n={n}",
+                   rng.geometric(1 / burst, n), rng.geometric(1 / gap, n))
+
+
+def periodic(on=1, off=1):
+    assert on >= 1 and off >= 0
+    return Pattern(f"periodic:on={on},off={off}", [on], [off])
+
+
+def alternating():
+    return Pattern("alternating", [1], [1])
+
+
+def from_bits(name, bits, repeat=False):
+    """ the windows of a 0/1 per-cycle sequence; leading off cycles become a window with on = 0 """
+    bits = np.asarray(bits, dtype=np.uint8)
+    assert len(bits) > 0 and np.all(bits <= 1), "bits should be a non-empty sequence of 0s and 1s"
+    if bits[0] == 0:
+        bits = np.concatenate(([1], bits))
+        lead = 1
+    else:
+        lead = 0
+    # run boundaries, alternating on/off runs starting with an on run
+    edges = np.flatnonzero(np.diff(bits)) + 1
+    runs = np.diff(np.concatenate(([0], edges, [len(bits)])))
+    if len(runs) % 2:
+        runs = np.append(runs, 0)
+    on, off = runs[0::2].copy(), runs[1::2]
+    on[0] -= lead
+    return Pattern(name, on, off, repeat=repeat)
+
+
+def trace(path, repeat=0):
+    with open(path) as f:
+        text = ''.join(f.read().split())
+    assert set(text) <= {'0', '1'}, f"{path}: a trace should hold only '0' and '1' characters"
+    return from_bits(f"trace:path={path},repeat={repeat}", np.frombuffer(text.encode(), dtype=np.uint8) - ord('0'),
+                     repeat=bool(repeat))
+
+
+PATTERNS = {'random': random, 'bursty': bursty, 'periodic': periodic, 'alternating': alternating, 'trace': trace}
+
+
+def _value(text):
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _trace_params(params):
+    """ the path of a trace is taken verbatim, ',' and digits included: everything after 'path=' up to ',repeat=' """
+    if not params.startswith('path='):
+        raise ValueError(f"trace parameters should be 'path=<path>[,repeat=<0|1>]', got '{params}'")
+    path, sep, repeat = params[len('path='):].rpartition(',repeat=')
+    if not sep:
+        return {'path': repeat}
+    return {'path': path, 'repeat': _value(repeat)}
+
+
+def pattern(name):
+    """ the Pattern named `name`: '<kind>' or '<kind>:<param>=<value>,...' as in Pattern.name """
+    kind, _, params = name.partition(':')
+    try:
+        make = PATTERNS[kind]
+    except KeyError:
+        raise ValueError(f"unknown pattern '{kind}', should be one of {sorted(PATTERNS)}") from None
+    if kind == 'trace':
+        return make(**_trace_params(params))
+    try:
+        kwargs = dict(param.split('=', 1) for param in params.split(',')) if params else {}
+    except ValueError:
+        raise ValueError(f"pattern parameters should be '<param>=<value>,...', got '{params}'") from None
+    return make(**{key: _value(value) for key, value in kwargs.items()})
+
+
+def resolve(generator):
+    """ `generator` (a generator function, a Pattern, a pattern name or None), a pattern name replaced by its Pattern """
+    return pattern(generator) if isinstance(generator, str) else generator
+
+
+__all__ = ['Pattern', 'PATTERNS', 'pattern', 'resolve', 'random', 'bursty', 'periodic', 'alternating', 'trace',
+           'from_bits']
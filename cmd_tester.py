@@ -2,12 +2,15 @@ import random
 import logging
 import math
 import os
+import csv
+import json
+import hashlib
 from collections.abc import Iterable
 import cocotb
-from cocotb.utils import hexdump
+from cocotb.utils import hexdump, get_sim_time
 from cocotb.clock import Clock
 from cocotb.binary import BinaryValue
-from cocotb.result import ReturnValue, TestError
+from cocotb.result import ReturnValue, TestError, TestFailure, TestSuccess
 from cocotb.drivers import BusDriver, ValidatedBusDriver
 from cocotb.monitors import BusMonitor
 from cocotb.triggers import RisingEdge, FallingEdge, Edge, ReadOnly, NextTimeStep, Event
@@ -19,6 +22,11 @@ from cocotb.log import SimLog
 from cocotb.generators.byte import random_data, get_bytes
 from cocotb.handle import ModifiableObject
 import itertools
+from array import array
+from collections import deque, namedtuple, Counter
+import numpy as np
+from pyber import stimulus
+import backpressure
 
 
 def compare_lists(l1, l2):
@@ -42,7 +50,294 @@ class ValidReadyProtocolError(Exception):
     pass
 
 
-class ValidReadyDriver(ValidatedBusDriver):
+class HandshakeStats(object):
+    """Handshake counters of one valid-ready bus, as seen by its driver (side 'in') or monitor (side 'out')
+
+        beats                 words transferred: valid and ready high at a rising edge
+        valid_without_ready   cycles where valid was high but ready low: the sink stalled
+        ready_without_valid   cycles where ready was high but valid low: the source stalled
+        first_beat_ns         simulation time of the first beat, None before it
+        last_beat_ns          simulation time of the last beat, None before it
+
+        Stall cycles are counted from the simulation time spent waiting, so a stall costs no trigger per cycle. As the
+        `stats` of a cocotb Monitor it also holds received_transactions, counted by Monitor._recv.
+    """
+    FIELDS = ('bus', 'side', 'beats', 'valid_without_ready', 'ready_without_valid', 'first_beat_ns', 'last_beat_ns')
+
+    def __init__(self, bus, side, clk_period):
+        self.bus = bus
+        self.side = side
+        self.clk_period = clk_period
+        self.beats = 0
+        self.valid_without_ready = 0
+        self.ready_without_valid = 0
+        self.first_beat_ns = None
+        self.last_beat_ns = None
+        self.received_transactions = 0
+
+    def beat(self):
+        now = get_sim_time('ns')
+        if self.first_beat_ns is None:
+            self.first_beat_ns = now
+        self.last_beat_ns = now
+        self.beats += 1
+
+    def cycles_since(self, t_ns):
+        """ clock cycles from simulation time t_ns until now """
+        return int(round((get_sim_time('ns') - t_ns) / self.clk_period))
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+
+def pack_words(data, width, first_in_high=True, pack_bytes=False):
+    """ bus words (Python ints) of a whole transaction, listed up front
+
+        By default every element of `data` (an iterable, bytes included, or an ndarray) is one word. With `pack_bytes`,
+        `data` (bytes-like, a uint8 ndarray or an iterable of byte values) is a byte stream: on a bus of `width` bits,
+        a multiple of 8, every word holds width // 8 bytes, the first one in the high-order bits if `first_in_high`,
+        and a short last word is padded with zero bytes.
+    """
+    if not pack_bytes:
+        if isinstance(data, np.ndarray):
+            return data.ravel().tolist()
+        return list(data)
+    nbytes = width // 8
+    if nbytes * 8 != width:
+        raise TestError(f"a byte stream can not be packed into the words of a {width}-bit bus")
+    if isinstance(data, np.ndarray):
+        if data.dtype != np.uint8:
+            raise TestError(f"a byte stream should be a uint8 array, got a {data.dtype} array")
+        b = data.ravel()
+    else:
+        b = np.frombuffer(data if isinstance(data, (bytes, bytearray, memoryview)) else bytes(data), dtype=np.uint8)
+    if nbytes == 1:
+        return b.tolist()
+    if len(b) % nbytes:
+        b = np.concatenate([b, np.zeros(nbytes - len(b) % nbytes, dtype=np.uint8)])
+    if nbytes in (2, 4, 8):
+        return np.ascontiguousarray(b).view(('>' if first_in_high else '<') + f'u{nbytes}').tolist()
+    b = b.tobytes()
+    order = 'big' if first_in_high else 'little'
+    return [int.from_bytes(b[i:i + nbytes], order) for i in range(0, len(b), nbytes)]
+
+
+@cocotb.coroutine
+def run_steps(steps):
+    """ wait in turn for every trigger or coroutine yielded by the generator `steps`; returns its return value
+
+        The valid-ready protocol, the reset sequence and the job queue of the testers are written once, as such step
+        generators (the *_steps methods below), and run by the generator coroutines of this module or awaited by the
+        native coroutines of cmd_tester_async.
+    """
+    result = yield from steps
+    raise ReturnValue(result)
+
+
+class BackpressureMixin(object):
+    """ on/off windows of the valid (driver) or ready (monitor) of a bus, shared by the drivers and monitors of
+        cmd_tester and cmd_tester_async: self.on, self.off from a generator of (on, off) windows or a backpressure.Pattern
+    """
+
+    def _set_windows(self, generator, what):
+        self._window_generator = generator
+        self._window_what = what
+        self._pattern = generator if isinstance(generator, backpressure.Pattern) else None
+        self._pattern_index = 0
+        self._next_window()
+
+    def _next_window(self):
+        if self._pattern is not None:
+            # precomputed windows: no generator call and no logging
+            self.on, self.off, self._pattern_index = self._pattern.window(self._pattern_index)
+            return
+
+        self.on = False
+
+        if self._window_generator is not None:
+            while not self.on:
+                try:
+                    self.on, self.off = next(self._window_generator)
+                except StopIteration:
+                    self.on = True
+                    self.log.info(f"{self._window_what} generator exhausted, not inserting "
+                                  f"non-{self._window_what.lower()} cycles anymore")
+                    return
+        else:
+            # every clock cycle
+            self.on, self.off = True, False
+
+
+class DriverMixin(BackpressureMixin):
+    """ sending side of a valid-ready bus, shared by the ValidReadyDriver of cmd_tester and of cmd_tester_async """
+
+    def _init_driver(self, name, valid, data, ready, clock, clk_period):
+        self._handshake = (valid, data, ready)
+        self.stats = HandshakeStats(name, 'in', clk_period)
+
+        # Avoid spurious object creation by recycling
+        self._clkedge = RisingEdge(clock)
+        self._rdonly = ReadOnly()
+        self._ready_edge = Edge(ready)
+        self._idle_word = BinaryValue(n_bits=len(data))
+        self._idle_word.binstr = "x" * len(data)
+
+        valid <= 0
+        data <= self._idle_word
+
+    def set_valid_generator(self, valid_generator=None):
+        """Set a new valid generator for this bus: a generator of (on, off) windows or a backpressure.Pattern"""
+        self.valid_generator = valid_generator
+        self._set_windows(valid_generator, 'Valid')
+
+    def _words(self, data, pack_bytes=False):
+        """ the bus words of transaction `data`, see `pack_words` """
+        return pack_words(data, len(self._handshake[1]), self.config['firstSymbolInHighOrderBits'], pack_bytes)
+
+    def _send_steps(self, words, sync=True):
+        """ steps driving pre-packed `words`, one per beat
+
+            A beat is accepted at a rising edge where ready is high. While ready stays high, consecutive beats are
+            driven on consecutive rising edges with ready sampled at the edge itself: one trigger per beat. Only on a
+            stall does it fall back to waiting for an edge of ready (ReadOnly/Edge).
+        """
+        self.log.debug(f"_send_words: sending {len(words)} words")
+        clkedge, rdonly, ready_edge = self._clkedge, self._rdonly, self._ready_edge
+        valid, data, ready = self._handshake
+        stats = self.stats
+
+        if sync:
+            yield clkedge
+
+        for word in words:
+            # Insert a gap where valid is low
+            if not self.on:
+                valid <= 0
+                for _ in range(self.off):
+                    yield clkedge
+                    if ready.value == 1:
+                        stats.ready_without_valid += 1
+                # Grab the next set of on/off values
+                self._next_window()
+
+            # Consume a valid cycle
+            if self.on is not True and self.on:
+                self.on -= 1
+
+            valid <= 1
+            data <= word
+            yield clkedge
+            if ready.value != 1:
+                # stall: hold the beat until ready is high, it is then accepted at the next rising edge
+                t_stall = get_sim_time('ns')
+                yield rdonly
+                while ready.value != 1:
+                    yield ready_edge
+                    yield rdonly
+                yield clkedge
+                stats.valid_without_ready += stats.cycles_since(t_stall)
+            stats.beat()
+
+        valid <= 0
+
+
+class MonitorMixin(BackpressureMixin):
+    """ receiving side of a valid-ready bus, shared by the ValidReadyMonitor of cmd_tester and of cmd_tester_async
+
+        Transactions are handed to self._recv (cocotb's Monitor), by mode:
+            check_word set:        every word (an int) is passed to check_word(word) as soon as it is sampled and
+                                   dropped, no transaction is assembled (see StreamingScoreboard)
+            expected_lengths:      transactions of the queued lengths, in order, then of num_expected_words words; with
+                                   `capture` they are sampled as ints straight into a preallocated array(self.typecode),
+                                   otherwise into a list of ints
+            otherwise:             every word is a transaction of its own
+    """
+
+    def _init_monitor(self, name, valid, data, ready, clock, clk_period, capture=False, check_word=None):
+        self._handshake = (valid, data, ready)
+        self.stats = HandshakeStats(name, 'out', clk_period)
+
+        self.num_expected_words = None
+        # lengths of the expected transactions not received yet, in order; num_expected_words applies when empty
+        self.expected_lengths = deque()
+        self.capture = capture and len(data) <= 64
+        self.check_word = check_word
+
+        # Avoid spurious object creation by recycling
+        self._clkedge = RisingEdge(clock)
+        self._rdonly = ReadOnly()
+        self._valid_edge = Edge(valid)
+
+    @property
+    def typecode(self):
+        """ array typecode of the captured words: the smallest unsigned type holding the data bus, None if wider """
+        width = len(self._handshake[1])
+        return next((code for code in 'BHIQ' if array(code).itemsize * 8 >= width), None)
+
+    def set_ready_generator(self, ready_generator=None):
+        """Set a new ready generator for this bus: a generator of (on, off) windows or a backpressure.Pattern"""
+        self.ready_generator = ready_generator
+        self._set_windows(ready_generator, 'Ready')
+
+    def _recv_steps(self):
+        """ steps receiving transactions forever, in the mode of the monitor """
+        while True:
+            if self.check_word is not None:
+                check = self.check_word
+                yield from self._receive_steps(None, lambda i, word: check(word))
+            n = self.expected_lengths.popleft() if self.expected_lengths else self.num_expected_words
+            if n:
+                words = array(self.typecode, bytes(array(self.typecode).itemsize * n)) if self.capture else [0] * n
+                yield from self._receive_steps(n, words.__setitem__)
+                self.log.debug(f"transaction complete: {n} words")
+                self._recv(words)
+            else:
+                # no transaction length: every word is a transaction of its own
+                yield from self._receive_steps(1, lambda i, word: self._recv(word))
+
+    def _receive_steps(self, n, put):
+        """ steps receiving `n` words (forever if None), calling put(i, word) with every word as an int
+
+            While valid is high, words are taken on consecutive rising edges with data and valid sampled at the edge
+            itself: one trigger per word. Only when valid is low does it wait for an edge of valid (ReadOnly/Edge).
+        """
+        clkedge, rdonly, valid_edge = self._clkedge, self._rdonly, self._valid_edge
+        valid, data, ready = self._handshake
+        stats = self.stats
+
+        for i in range(n) if n is not None else itertools.count():
+            if not self.on:
+                ready <= 0
+                for _ in range(self.off):
+                    yield clkedge
+                    if valid.value == 1:
+                        stats.valid_without_ready += 1
+                ready <= 1
+                # Grab the next set of on/off values
+                self._next_window()
+            # Consume a valid cycle
+            if self.on is not True and self.on:
+                self.on -= 1
+
+            yield clkedge
+            if valid.value != 1:
+                # idle: sleep until valid rises, the word is then taken at the next rising edge
+                t_idle = get_sim_time('ns')
+                yield rdonly
+                while valid.value != 1:
+                    yield valid_edge
+                    yield rdonly
+                yield clkedge
+                stats.ready_without_valid += stats.cycles_since(t_idle)
+            stats.beat()
+            try:
+                word = data.value.integer
+            except ValueError:
+                raise ValidReadyProtocolError(f"{self.name}: unresolved data {data.value.binstr} in word {i}")
+            put(i, word)
+
+
+class ValidReadyDriver(DriverMixin, ValidatedBusDriver):
     """Valid-Ready stream Driver"""
 
     _signals = ["valid", "data", "ready"]
@@ -53,19 +348,12 @@ class ValidReadyDriver(ValidatedBusDriver):
 
     def __init__(self, entity, name, clock, **kwargs):
         # config = kwargs.pop('config', {})
+        clk_period = kwargs.pop('clk_period', 10)
         ValidatedBusDriver.__init__(self, entity=entity, name=name, clock=clock, **kwargs)
         self.config = self._default_config.copy()
 
         self.clock = clock
-
-
-        word = BinaryValue(n_bits=len(self.bus.data))
-
-        word.binstr = ("x"*len(self.bus.data))
-
-        self.bus.valid <= 0
-        self.bus.data <= word
-
+        self._init_driver(name, self.bus.valid, self.bus.data, self.bus.ready, clock, clk_period)
 
     @cocotb.coroutine
     def _wait_ready(self):
@@ -80,51 +368,21 @@ class ValidReadyDriver(ValidatedBusDriver):
             yield Edge(ready)
             yield rdonly
 
+    @cocotb.coroutine
+    def _send_words(self, words, sync=True):
+        """Args:
+            words (list): pre-packed bus words (see `pack_words`), driven one per beat (see DriverMixin._send_steps).
+        """
+        yield from self._send_steps(words, sync)
+
     @cocotb.coroutine
     def _send_bytes(self, byte_string, sync=True):
         """Args:
             byte_string (bytes): A string of hex to send over the bus.
         """
         self.log.info(f"send_bytes: sending {len(byte_string)}")
-        # Avoid spurious object creation by recycling
-        clkedge = RisingEdge(self.clock)
-
-        bus_width = len(self.bus.data) // 8
-
-        word = BinaryValue(n_bits=len(self.bus.data),
-                           bigEndian=self.config['firstSymbolInHighOrderBits'])
-        self.bus.valid <= 0
-
-        while len(byte_string) > 0:
-            # Insert a gap where valid is low
-            if not self.on:
-                self.bus.valid <= 0
-                for _ in range(self.off):
-                    yield clkedge
-                # Grab the next set of on/off values
-                self._next_valids()
-
-            # Consume a valid cycle
-            if self.on is not True and self.on:
-                self.on -= 1
-
-            self.bus.valid <= 1
-            n_bytes_to_send = min(len(byte_string), bus_width)
-            data = byte_string[:n_bytes_to_send]
-            word.buff = data
-
-            if n_bytes_to_send >= bus_width:
-                byte_string = byte_string[bus_width:]
-                self.bus.data <= word
-            else:
-                byte_string = b""
-
-            yield self._wait_ready()
-
-        yield clkedge
-        self.bus.valid <= 0
-        word.binstr = ("x"*len(self.bus.data))
-        self.bus.data <= word
+        yield self._send_words(self._words(byte_string, pack_bytes=True), sync=sync)
+        self.bus.data <= self._idle_word
 
     @cocotb.coroutine
     def _send_bin_string(self, bin_string, sync=True):
@@ -149,7 +407,7 @@ class ValidReadyDriver(ValidatedBusDriver):
                 for _ in range(self.off):
                     yield clkedge
                 # Grab the next set of on/off values
-                self._next_valids()
+                self._next_window()
 
             # Consume a valid cycle
             if self.on is not True and self.on:
@@ -181,37 +439,13 @@ class ValidReadyDriver(ValidatedBusDriver):
             words_iterable (iterable): Will yield words of input data.
         """
         self.log.debug(f"_send_iterable : words_iterable={words_iterable}")
-        # Avoid spurious object creation by recycling
-        clkedge = RisingEdge(self.clock)
-        firstword = True
-
-        for word in words_iterable:
-            if not firstword or (firstword and sync):
-                self.log.debug("_send_iterable: yielding 1 clock")
-                yield clkedge
-                firstword = False
-            # Insert a gap where valid is low
-            if not self.on:
-                self.bus.valid <= 0
-                self.log.debug(f"_send_iterable: yielding {self.off} off cycles")
-                for _ in range(self.off):
-                    yield clkedge
-
-                # Grab the next set of on/off values
-                self._next_valids()
-
-            # Consume a valid cycle
-            if self.on is not True and self.on:
-                self.on -= 1
-            self.bus.valid <= 1
-            self.bus.data <= word
-            yield self._wait_ready()
-
-        yield clkedge
-        self.bus.valid <= 0
+        yield self._send_words(list(words_iterable), sync=sync)
 
     @cocotb.coroutine
-    def _driver_send(self, pkt, sync=True):
+    def _driver_send(self, pkt, sync=True, pack_bytes=False):
+        """ send(pkt): one word per element of pkt, or, with send(pkt, pack_bytes=True), pkt packed as a byte stream
+            into bus-wide words, see `pack_words`
+        """
         dut = self.entity
         # if isinstance(pkt, bytes):
         #     if len(self.bus.data) % 8 != 0:
@@ -226,13 +460,14 @@ class ValidReadyDriver(ValidatedBusDriver):
         #     yield self._send_bin_string(pkt, sync=sync)
         # el
         if isinstance(pkt, Iterable):
-            yield self._send_iterable(pkt, sync=sync)
+            words = pack_words(pkt, len(self.bus.data), self.config['firstSymbolInHighOrderBits'], pack_bytes)
+            yield self._send_words(words, sync=sync)
         else:
             self.log.error("Unknown data to send")
             raise TestError
 
 
-class ValidReadyMonitor(BusMonitor):
+class ValidReadyMonitor(MonitorMixin, BusMonitor):
     _signals = ["valid", "data", "ready"]
 
     _default_config = {
@@ -241,11 +476,17 @@ class ValidReadyMonitor(BusMonitor):
 
     def __init__(self, *args, **kwargs):
         config = kwargs.pop('config', {})
+        capture = kwargs.pop('capture', False)
+        check_word = kwargs.pop('check_word', None)
+        clk_period = kwargs.pop('clk_period', 10)
+        num_expected_words = kwargs.pop('num_expected_words', None)
+        ready_generator = kwargs.pop('ready_generator', None)
 
         BusMonitor.__init__(self, *args, **kwargs)
 
-        self.on = True
-        self.off = False
+        # capture and streaming modes: see MonitorMixin
+        self._init_monitor(self.name, self.bus.valid, self.bus.data, self.bus.ready, self.clock, clk_period,
+                           capture, check_word)
 
         self.config = self._default_config.copy()
 
@@ -254,36 +495,8 @@ class ValidReadyMonitor(BusMonitor):
             self.log.debug("Setting config option %s to %s" %
                            (configoption, str(value)))
 
-        self.on, self.off = True, False
-        
-        self.num_expected_words = kwargs.pop('num_expected_words', None)
-        self.ready_generator = kwargs.pop('ready_generator', None)
-
-    def set_ready_generator(self, ready_generator):
-        """Set a new ready generator for this bus."""
-        self.ready_generator = ready_generator
-        self._next_readys()
-
-    def _next_readys(self):
-        self.on = False
-
-        if self.ready_generator is not None:
-            while not self.on:
-                try:
-                    self.on, self.off = next(self.ready_generator)
-                except StopIteration:
-                    self.on = True
-                    self.log.info("Ready generator exhausted, not inserting "
-                                  "non-ready cycles anymore")
-                    return
-
-            self.log.debug("Will be on for %d cycles, off for %s" %
-                           (self.on, self.off))
-        else:
-            # Valid every clock cycle
-            self.on, self.off = True, False
-            self.log.debug("Not using ready generator")
-
+        self.num_expected_words = num_expected_words
+        self.set_ready_generator(ready_generator)
 
     @cocotb.coroutine
     def _monitor_recv(self):
@@ -308,18 +521,22 @@ class ValidReadyMonitor(BusMonitor):
 
         self.bus.ready <= 1
 
-        while True:
+        if self.capture or self.check_word is not None:
+            yield from self._recv_steps()
 
+        # words as BinaryValues, a transaction of the next expected length at a time
+        while True:
             # if self.in_reset:
             #     continue
             if not self.on:
-                self.log.debug(f"skipping {self.off} off cycles")
                 self.bus.ready <= 0
                 for _ in range(self.off):
                     yield clkedge
+                    if self.bus.valid.value == 1:
+                        self.stats.valid_without_ready += 1
                 self.bus.ready <= 1
                 # Grab the next set of on/off values
-                self._next_readys()
+                self._next_window()
             # Consume a valid cycle
             if self.on is not True and self.on:
                 self.on -= 1
@@ -327,21 +544,128 @@ class ValidReadyMonitor(BusMonitor):
             yield rdonly
             
             while self.bus.valid.value != 1:
+                self.stats.ready_without_valid += 1
                 yield clkedge
                 yield rdonly
             
             # self.log.info(f"received {self.bus.data.value} {len(words)}/{self.num_expected_words} on {self.name}")
-            words.append((self.bus.data.value))
+            words.append(self.bus.data.value)
                 # self.log.debug(f"received word {len(words)}{self.num_out_words} ")
-            if self.num_expected_words and len(words) >= self.num_expected_words:
-                self.log.debug(f"transaction complete: {self.num_expected_words} words")
+            n = self.expected_lengths[0] if self.expected_lengths else self.num_expected_words
+            if n and len(words) >= n:
+                if self.expected_lengths:
+                    self.expected_lengths.popleft()
+                self.log.debug(f"transaction complete: {n} words")
                 self._recv(words)
                 words = []
 
             yield clkedge
+            self.stats.beat()
+
+
+class StreamingScoreboard(object):
+    """Checks output words one at a time, as they are received, against the expected words of every bus
+
+        Keeps only the expected arrays still pending and counters: nothing received is stored. The test fails as soon
+        as `max_mismatches` words have differed, with a compact report of those words (as `compare_lists`), so a
+        mismatch early in a long transaction does not cost the rest of the transfer. Drop-in for the `result` of
+        cocotb's Scoreboard.
+    """
+
+    def __init__(self, log, max_mismatches=8):
+        self.log = log
+        self.max_mismatches = max_mismatches
+        self.words = 0
+        self.transactions = 0
+        self.mismatches = 0
+        self.diffs = []  # the first max_mismatches differences
+        self._expected = {}  # bus name -> deque of expected ndarrays, the first one being received
+        self._pos = {}  # bus name -> index of the next word in the first expected array
+
+    def expect(self, name, expected):
+        """ queue a transaction of expected words on bus `name` """
+        if isinstance(expected, (bytes, bytearray, memoryview)):
+            expected = np.frombuffer(expected, dtype=np.uint8)
+        if isinstance(expected, np.ndarray):
+            expected = expected.astype(np.int64).ravel()  # a copy: the caller may reuse its buffer
+        else:
+            expected = np.fromiter((int(w) for w in expected), dtype=np.int64)
+        self._expected.setdefault(name, deque()).append(expected)
+        self._pos.setdefault(name, 0)
+
+    def checker(self, name):
+        """ check_word callable of the monitor of bus `name` """
+        return lambda word: self.check(name, word)
+
+    def check(self, name, word):
+        self.words += 1
+        queue = self._expected.get(name)
+        if not queue:
+            self._mismatch(f"{name}: unexpected word {hex(word)}")
+            return
+        expected = queue[0]
+        i = self._pos[name]
+        exp = int(expected[i])
+        if word != exp:
+            self._mismatch(f"{name} #{self.transactions} @{i}: {hex(word)} != {hex(exp)}")
+        if i + 1 == len(expected):
+            queue.popleft()
+            self._pos[name] = 0
+            self.transactions += 1
+        else:
+            self._pos[name] = i + 1
+
+    def _mismatch(self, diff):
+        self.mismatches += 1
+        if len(self.diffs) < self.max_mismatches:
+            self.diffs.append(diff)
+        if self.mismatches >= self.max_mismatches:
+            self.log.error(self.report())
+            raise TestFailure(f"{self.mismatches} mismatching words")
+
+    def pending(self):
+        """ number of expected words not received yet """
+        return sum(sum(len(e) for e in queue) - self._pos[name] for name, queue in self._expected.items())
+
+    def report(self):
+        lines = [f"{self.words} words in {self.transactions} transactions checked, {self.mismatches} mismatches, "
+                 f"{self.pending()} words pending"]
+        return "\n".join(lines + self.diffs)
+
+    @property
+    def result(self):
+        if self.mismatches or self.pending():
+            self.log.error(self.report())
+            return TestFailure(f"{self.mismatches} mismatching words, {self.pending()} words not received")
+        return TestSuccess()
+
+
+def current_test_name():
+    """ name of the running cocotb test (of the generated test for a TestFactory), None if it is not known """
+    manager = getattr(cocotb, 'regression_manager', None)
+    test = getattr(manager, '_test', None) or getattr(manager, '_running_test', None)
+    return getattr(test, '__name__', None) or getattr(test, 'funcname', None)
+
+
+def stimulus_index(test_name=None):
+    """ stimulus index of a test: STIMULUS_INDEX if set, otherwise derived from the test name, so that a test draws
+        the same stimulus whether it runs on its own (TESTCASE=...) or after any other tests
+    """
+    index = os.getenv('STIMULUS_INDEX')
+    if index is not None:
+        return int(index)
+    if test_name is None:
+        test_name = current_test_name()
+    if test_name is None:
+        return 0
+    return int.from_bytes(hashlib.blake2b(test_name.encode(), digest_size=4).digest(), 'little')
 
 
 class ValidReadyTester(object):
+    # the driver and monitor classes of the buses, those of cmd_tester_async in its ValidReadyTester
+    _driver_class = ValidReadyDriver
+    _monitor_class = ValidReadyMonitor
+
     def __init__(self, dut, clock, **kwargs):
         """
             parameters:
@@ -349,6 +673,10 @@ class ValidReadyTester(object):
             clock:
             input_name: name of the input bus. Signals of the bus will be <input_name>_{data, valid, ready}
             output_name:
+            test_index: index of the test for `stimulus`, default: stimulus_index() of the running test
+            capture: monitors capture output transactions into arrays of ints (see ValidReadyMonitor), default: False
+            streaming: check output words as they are received (StreamingScoreboard), default: False
+            max_mismatches: number of mismatching words after which a streaming check fails the test, default: 8
         """
         self.dut = dut
         self.log = SimLog("cocotb.%s" % dut._name)
@@ -370,7 +698,11 @@ class ValidReadyTester(object):
         self.drivers = {}
         self.monitors = {}
 
-        self.scoreboard = Scoreboard(self.dut, reorder_depth=0, fail_immediately=True)
+        self.streaming = kwargs.get('streaming', False)
+        if self.streaming:
+            self.scoreboard = StreamingScoreboard(self.log, kwargs.get('max_mismatches', 8))
+        else:
+            self.scoreboard = Scoreboard(self.dut, reorder_depth=0, fail_immediately=True)
         self.log.info("created scoreboard")
         
         self.rnd = random.Random()
@@ -378,11 +710,28 @@ class ValidReadyTester(object):
         seed = os.getenv('RANDOM_SEED')
         self.rnd.seed(seed)
 
-        self.valid_generator = kwargs.get('valid_generator', None)
-        self.ready_generator = kwargs.get('ready_generator', None)
+        # vectorized stimulus keyed by RANDOM_SEED: draw with index self.test_index to make every test reproducible
+        self.test_index = kwargs.get('test_index')
+        if self.test_index is None:
+            self.test_index = stimulus_index()
+        self.stimulus = stimulus.Stimulus()
+        self.log.info(f"replay with RANDOM_SEED={self.stimulus.seed} STIMULUS_INDEX={self.test_index} "
+                      f"(test {current_test_name()})")
+
+        # backpressure: generator functions, backpressure.Patterns or pattern names, by default VALID_PATTERN and
+        # READY_PATTERN; the name of a pattern is logged to replay it
+        self.valid_generator = backpressure.resolve(kwargs.get('valid_generator', None) or os.getenv('VALID_PATTERN'))
+        self.ready_generator = backpressure.resolve(kwargs.get('ready_generator', None) or os.getenv('READY_PATTERN'))
+        for var, generator in (('VALID_PATTERN', self.valid_generator), ('READY_PATTERN', self.ready_generator)):
+            if isinstance(generator, backpressure.Pattern):
+                self.log.info(f"{var}={generator.name}")
+        self.capture = kwargs.get('capture', False)
 
         self.clk_period = kwargs.get('clk_period', 10)
         self.clk_thread = cocotb.fork(Clock(self.clock, self.clk_period, 'ns').start())
+        # Avoid spurious object creation by recycling
+        self._clkedge = RisingEdge(clock)
+        self._falledge = FallingEdge(clock)
 
         self.log.info("ValidReadyTester initialized")
 
@@ -390,36 +739,94 @@ class ValidReadyTester(object):
     def result(self):
         return self.scoreboard.result
 
+    def _run_steps(self, steps):
+        """ a coroutine of this module running the step generator `steps`, see `run_steps` """
+        return run_steps(steps)
+
     @cocotb.coroutine
-    def drive_input(self, in_bus_name, in_words, valid_generator=None):
+    def drive_input(self, in_bus_name, in_words, valid_generator=None, pack_bytes=False):
+        """ send one transaction on bus `in_bus_name`: one word per element of in_words, or in_words packed as a byte
+            stream into bus-wide words if `pack_bytes`
+        """
+        yield self._driver(in_bus_name, valid_generator).send(in_words, pack_bytes=pack_bytes)
+
+    def _driver(self, in_bus_name, valid_generator=None):
+        """ the driver of bus `in_bus_name`, created on first use, with `valid_generator` (or the default) started """
         if not valid_generator:
             valid_generator = self.valid_generator
+        valid_generator = backpressure.resolve(valid_generator)
         if in_bus_name not in self.drivers:
-            self.drivers[in_bus_name] = ValidReadyDriver(self.dut, in_bus_name, self.clock)
+            self.drivers[in_bus_name] = self._driver_class(self.dut, in_bus_name, self.clock,
+                                                           clk_period=self.clk_period)
         if valid_generator:
             self.drivers[in_bus_name].set_valid_generator(valid_generator())
-
-        yield self.drivers[in_bus_name].send(in_words)
+        return self.drivers[in_bus_name]
 
     def expect_output(self, out_bus_name, expected_output, ready_generator=None):
         if not ready_generator:
             ready_generator = self.ready_generator
-        if out_bus_name in self.monitors:
-            monitor, queue = self.monitors[out_bus_name]
-        else:
+        ready_generator = backpressure.resolve(ready_generator)
+        monitor = self._expect(out_bus_name, expected_output)
+        if ready_generator:
+            monitor.set_ready_generator(ready_generator())
+
+    def _monitor(self, out_bus_name):
+        """ (monitor, queue of expected transactions) of bus `out_bus_name`, created on first use """
+        if out_bus_name not in self.monitors:
             self.log.debug(f"adding monitor on {out_bus_name}")
-            monitor = ValidReadyMonitor(self.dut, out_bus_name, self.clock)  # , callback=self.model
+            check_word = self.scoreboard.checker(out_bus_name) if self.streaming else None
+            monitor = self._monitor_class(self.dut, out_bus_name, self.clock, capture=self.capture,
+                                          check_word=check_word, clk_period=self.clk_period)  # , callback=self.model
             queue = []
             self.monitors[out_bus_name] = (monitor, queue)
             self.log.debug(f"monitor added {out_bus_name}")
-            
-            self.scoreboard.add_interface(monitor, queue, strict_type=True)
 
-        queue.append(expected_output)
-        if ready_generator:
-            monitor.set_ready_generator(ready_generator())
-        monitor.num_expected_words = len(expected_output)
+            if not self.streaming:
+                self.scoreboard.add_interface(monitor, queue, strict_type=True)
+        return self.monitors[out_bus_name]
+
+    def _expect(self, out_bus_name, expected_output):
+        """ queue one expected transaction on bus `out_bus_name`, after those already queued; returns its monitor """
+        monitor, queue = self._monitor(out_bus_name)
+        if self.streaming:
+            self.scoreboard.expect(out_bus_name, expected_output)
+            monitor.num_expected_words = len(expected_output)
+        else:
+            # same type as the received transactions, for the strict_type comparison of the scoreboard
+            if monitor.capture:
+                expected_output = array(monitor.typecode, (int(w) for w in expected_output))
+            else:
+                expected_output = [int(w) for w in expected_output]
+            queue.append(expected_output)
+            # framed by the monitor with the length of its own transaction
+            monitor.expected_lengths.append(len(expected_output))
         self.log.info(f"expecting {len(expected_output)} bytes on bus: {out_bus_name}")
+        return monitor
+
+    def perf(self):
+        """ handshake counters of every driven and monitored bus (HandshakeStats) and, for a CmdDoneTester, the
+            command latencies and the throughput of every run_jobs (CmdDoneTester.run_jobs), the latter in the JSON only
+        """
+        buses = [d.stats.as_dict() for d in self.drivers.values()] + [m.stats.as_dict() for m, _ in self.monitors.values()]
+        return {'dut': self.dut._name, 'test_index': self.test_index, 'clk_period_ns': self.clk_period,
+                'valid_pattern': getattr(self.valid_generator, 'name', None),
+                'ready_pattern': getattr(self.ready_generator, 'name', None),
+                'buses': buses, 'commands': list(getattr(self, 'commands', [])),
+                'throughput': list(getattr(self, 'throughput', []))}
+
+    def save_perf(self, path):
+        """ write `perf()` as JSON to `path` and as CSV, one row per bus and per command, to `path` with a .csv suffix """
+        perf = self.perf()
+        with open(path, 'w') as f:
+            json.dump(perf, f, indent=2)
+        rows = [dict(kind='bus', **b) for b in perf['buses']] + [dict(kind='command', **c) for c in perf['commands']]
+        fields = ('kind',) + HandshakeStats.FIELDS + CmdDoneMixin.COMMAND_FIELDS
+        csv_path = os.path.splitext(path)[0] + '.csv'
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields, restval='')
+            writer.writeheader()
+            writer.writerows(rows)
+        self.log.info(f"performance counters written to {path} and {csv_path}")
 
     # TODO only checks right now, FIXME later
     def check_bus(self, bus_name, is_input):
@@ -457,10 +864,11 @@ class ValidReadyTester(object):
 
     @cocotb.coroutine
     def wait_transaction(self):
-            
-        clkedge = RisingEdge(self.clock)
+        yield from self._wait_transaction_steps()
+
+    def _wait_transaction_steps(self):
         while self.keep_waiting:
-            yield clkedge
+            yield self._clkedge
         # re-arm
         self.keep_waiting = True
 
@@ -474,29 +882,150 @@ class ValidReadyTester(object):
 
     @cocotb.coroutine
     def reset(self):
+        yield from self._reset_steps()
+
+    def _reset_steps(self):
         self.log.debug("Resetting DUT")
         self.dut.rst <= 0
-        yield FallingEdge(self.clock)
+        yield self._falledge
         self.dut.rst <= 1
-        yield RisingEdge(self.clock)
-        yield RisingEdge(self.clock)
-        yield RisingEdge(self.clock)
-        yield FallingEdge(self.clock)
+        yield self._clkedge
+        yield self._clkedge
+        yield self._clkedge
+        yield self._falledge
         self.dut.rst <= 0
-        yield FallingEdge(self.clock)
+        yield self._falledge
         self.log.debug("Out of reset")
 
 
-class CmdDoneTester(ValidReadyTester):
+# one command of a CmdDoneTester: the command `value` is asserted on the command signal, `inputs` is a sequence of
+# (bus name, words) transactions to drive and `outputs` one of (bus name, expected words) transactions to check
+Command = namedtuple('Command', ('name', 'value', 'inputs', 'outputs'))
+
+# one job of CmdDoneTester.run_jobs: `command` runs it with the key identified by `key` (any hashable) loaded, `load`
+# is the Command loading that key, only issued when the key differs from the one of the previous job
+Job = namedtuple('Job', ('key', 'load', 'command'))
+
+
+class CmdDoneMixin(object):
+    """ command bookkeeping shared by the CmdDoneTester of cmd_tester and of cmd_tester_async: command latencies,
+        the command sequence of a queue of Jobs and the throughput of run_jobs; no coroutines, waits are step
+        generators (see `run_steps`)
+    """
+    COMMAND_FIELDS = ('command', 'start_ns', 'done_ns', 'cycles')
+
+    def _init_cmd_done(self, done_sig_name):
+        if not done_sig_name in self.outports:
+            self.log.error(f"{done_sig_name} is not an output port of DUT")
+            raise TestError
+        self.done_signal = getattr(self.dut, done_sig_name)
+        self._done_edge = Edge(self.done_signal)
+        # latency of every command, from start_command to the done that ends it
+        self.commands = []
+        self._command = None
+        # one entry per run_jobs
+        self.throughput = []
+
+    def start_command(self, name, signal=None, value=1):
+        """ start command `name`, asserting `signal` <= value if given; the next wait_for_done records its latency """
+        if signal is not None:
+            signal <= value
+        self._command = (name, get_sim_time('ns'))
+
+    def _command_done(self):
+        """ record the latency of the command started by start_command, if any """
+        if self._command is None:
+            return
+        name, start = self._command
+        now = get_sim_time('ns')
+        self.commands.append(dict(command=name, start_ns=start, done_ns=now,
+                                  cycles=int(round((now - start) / self.clk_period))))
+        self.log.info(f"{name}: {self.commands[-1]['cycles']} cycles")
+        self._command = None
+
+    def _done_steps(self, value=1):
+        """ steps of wait_for_done: wait until the done signal is `value` after the next rising edge """
+        yield self._clkedge
+        done = self.done_signal
+        while done.value != value:
+            yield self._done_edge
+        if value == 1:
+            self._command_done()
+
+    @staticmethod
+    def job_commands(jobs):
+        """ the commands running `jobs` in order, with a key load wherever the key differs from that of the previous job """
+        commands = []
+        key = None
+        for i, job in enumerate(jobs):
+            if i == 0 or job.key != key:
+                commands.append(job.load)
+                key = job.key
+            commands.append(job.command)
+        return commands
+
+    def _queue_commands(self, commands):
+        """ expect the outputs of `commands` in order, each transaction with its own length, start the ready generator
+            of every output bus once, and return the inputs as {bus name: [words, ...]}
+        """
+        inputs = {}
+        monitors = {}
+        for command in commands:
+            for bus, expected in command.outputs:
+                monitors[bus] = self._expect(bus, expected)
+            for bus, words in command.inputs:
+                inputs.setdefault(bus, []).append(words)
+        ready_generator = backpressure.resolve(self.ready_generator)
+        if ready_generator:
+            for monitor in monitors.values():
+                monitor.set_ready_generator(ready_generator())
+        return inputs
+
+    def _feed_steps(self, bus, transactions):
+        for words in transactions:
+            yield self.drive_input(bus, words)
+
+    def _job_steps(self, jobs, signal):
+        """ steps of run_jobs; returns the throughput of the run """
+        jobs = list(jobs)
+        commands = self.job_commands(jobs)
+        inputs = self._queue_commands(commands)
+        feeders = [cocotb.fork(self._run_steps(self._feed_steps(bus, transactions)))
+                   for bus, transactions in inputs.items()]
+        start_ns = get_sim_time('ns')
+        for command in commands:
+            self.start_command(command.name, signal, command.value)
+            yield self.wait_for_done()
+            signal <= 0
+            yield self.wait_for_done(value=0)
+        for feeder in feeders:
+            yield feeder.join()
+        return self._record_throughput(jobs, commands, start_ns)
+
+    def _record_throughput(self, jobs, commands, start_ns):
+        """ append the throughput of a run_jobs that started at `start_ns` and ended now to self.throughput """
+        end_ns = get_sim_time('ns')
+        cycles = int(round((end_ns - start_ns) / self.clk_period))
+        per_command = Counter(job.command.name for job in jobs)
+        run = dict(jobs=len(jobs), key_loads=len(commands) - len(jobs), start_ns=start_ns, end_ns=end_ns,
+                   cycles=cycles, jobs_per_mcycle=len(jobs) * 1e6 / cycles if cycles else 0.0,
+                   per_command={name: dict(jobs=n, per_mcycle=n * 1e6 / cycles if cycles else 0.0)
+                                for name, n in per_command.items()})
+        self.throughput.append(run)
+        self.log.info(f"{run['jobs']} jobs, {run['key_loads']} key loads in {cycles} cycles: " +
+                      ", ".join(f"{name} {c['per_mcycle']:.1f}" for name, c in run['per_command'].items()) +
+                      " per million cycles")
+        return run
+
+
+class CmdDoneTester(ValidReadyTester, CmdDoneMixin):
+
     def __init__(self, dut, clock, **kwargs):
         """ init """
         dut._log.info(f"initializing CmdDoneTester...")
         done_sig_name = kwargs.pop('done_signal', 'o_done')
         ValidReadyTester.__init__(self, dut, clock, **kwargs)
-        if not done_sig_name in self.outports:
-            self.log.error(f"{done_sig_name} is not an output port of DUT")
-            raise TestError
-        self.done_signal = getattr(dut, done_sig_name)
+        self._init_cmd_done(done_sig_name)
         self.log.info(f"CmdDoneTester initialized")
 
     # def register_commands(self, commands_dict):
@@ -509,10 +1038,22 @@ class CmdDoneTester(ValidReadyTester):
 
     @cocotb.coroutine
     def wait_for_done(self, value=1):
-        yield RisingEdge(self.dut.clk)
-        done = self.done_signal
-        while done.value != value:
-            yield Edge(done)
+        yield from self._done_steps(value)
+
+    @cocotb.coroutine
+    def run_jobs(self, jobs, signal):
+        """ throughput mode: run a queue of Jobs back to back through the command signal `signal`
+
+            The inputs of every command are streamed in order on their buses as soon as the DUT is ready for them and
+            the outputs are checked in order by the scoreboard. A key is loaded only when it changes, and every command
+            is asserted as soon as the previous one's done, acknowledged with command <= 0, reads 0 again.
+            Returns the throughput of the run, also appended to self.throughput.
+
+            The inputs of later commands are driven while earlier ones run: the DUT must gate the ready of every input
+            bus by its state, asserting it only while the current command consumes that bus.
+        """
+        throughput = yield from self._job_steps(jobs, signal)
+        raise ReturnValue(throughput)
 
     # @cocotb.coroutine
     # def command(self, cmd, input=None):
@@ -0,0 +1,134 @@
+"""
+    Native-coroutine (async/await) versions of the cmd_tester classes
+
+    The protocol of the drivers and monitors, the reset sequence and the job queue of the testers are the step
+    generators of `cmd_tester`, awaited trigger by trigger by `run_steps`: same semantics, counters, streaming and capture
+    modes, scoreboards and perf export, with no generator coroutines and no BusDriver scaffolding. The drivers and
+    monitors are bound to the <name>_{data, valid, ready} signals, and every trigger they wait on (RisingEdge, ReadOnly,
+    Edge of valid/ready) is created once per object and reused on every cycle.
+
+        from cmd_tester_async import CmdDoneTester
+
+        @cocotb.test()
+        async def test(dut):
+            tb = CmdDoneTester(dut, dut.clk)
+            await tb.reset()
+            tb.expect_output('pdo', ct)
+            await tb.drive_input('pdi', atpk)
+            await tb.wait_for_done()
+"""
+import cocotb
+from cocotb.log import SimLog
+from cocotb.monitors import Monitor
+from cocotb.triggers import RisingEdge
+
+import cmd_tester
+from cmd_tester import (pack_words, DriverMixin, MonitorMixin, HandshakeStats, StreamingScoreboard,
+                        ValidReadyProtocolError, Command, Job, compare_lists, to_hex_str)
+
+
+async def run_steps(steps):
+    """ await in turn every trigger or coroutine yielded by the generator `steps`; returns its return value """
+    while True:
+        try:
+            step = next(steps)
+        except StopIteration as stop:
+            return stop.value
+        await step
+
+
+class ValidReadyDriver(DriverMixin):
+    """Valid-Ready stream Driver"""
+
+    _default_config = {
+        "firstSymbolInHighOrderBits": True,
+    }
+
+    def __init__(self, entity, name, clock, valid_generator=None, clk_period=10, config=None):
+        self.entity = entity
+        self.name = name
+        self.clock = clock
+        self.log = SimLog(f"cocotb.{entity._name}.{name}")
+        self.config = self._default_config.copy()
+        self.config.update(config or {})
+
+        self.valid = getattr(entity, f"{name}_valid")
+        self.data = getattr(entity, f"{name}_data")
+        self.ready = getattr(entity, f"{name}_ready")
+        self._init_driver(name, self.valid, self.data, self.ready, clock, clk_period)
+
+        self.set_valid_generator(valid_generator)
+
+    async def send(self, data, sync=True, pack_bytes=False):
+        """ send one transaction: one word per element of `data`, or `data` packed as a byte stream into bus-wide words
+            if `pack_bytes`, see `pack_words`
+        """
+        await run_steps(self._send_steps(self._words(data, pack_bytes), sync))
+
+
+class ValidReadyMonitor(MonitorMixin, Monitor):
+    """Valid-Ready stream Monitor: drives ready and receives words as ints, in the modes of cmd_tester.MonitorMixin"""
+
+    def __init__(self, entity, name, clock, ready_generator=None, capture=False, check_word=None, callback=None,
+                 clk_period=10):
+        self.entity = entity
+        self.name = name
+        self.clock = clock
+        self.log = SimLog(f"cocotb.{entity._name}.{name}")
+
+        self.valid = getattr(entity, f"{name}_valid")
+        self.data = getattr(entity, f"{name}_data")
+        self.ready = getattr(entity, f"{name}_ready")
+
+        Monitor.__init__(self, callback)
+        self._init_monitor(name, self.valid, self.data, self.ready, clock, clk_period, capture, check_word)
+        self.set_ready_generator(ready_generator)
+
+    async def _monitor_recv(self):
+        self.ready <= 0
+        await RisingEdge(self.clock)
+        self.ready <= 1
+        await run_steps(self._recv_steps())
+
+
+class ValidReadyTester(cmd_tester.ValidReadyTester):
+    """ cmd_tester.ValidReadyTester on the native-coroutine driver and monitor, with the same kwargs """
+    _driver_class = ValidReadyDriver
+    _monitor_class = ValidReadyMonitor
+
+    def _run_steps(self, steps):
+        return run_steps(steps)
+
+    async def drive_input(self, in_bus_name, in_words, valid_generator=None, pack_bytes=False):
+        await self._driver(in_bus_name, valid_generator).send(in_words, pack_bytes=pack_bytes)
+
+    async def wait_transaction(self):
+        await run_steps(self._wait_transaction_steps())
+
+    async def reset(self):
+        await run_steps(self._reset_steps())
+
+
+class CmdDoneTester(ValidReadyTester, cmd_tester.CmdDoneMixin):
+
+    def __init__(self, dut, clock, **kwargs):
+        """ init """
+        done_sig_name = kwargs.pop('done_signal', 'o_done')
+        ValidReadyTester.__init__(self, dut, clock, **kwargs)
+        self._init_cmd_done(done_sig_name)
+        self.log.info(f"CmdDoneTester initialized")
+
+    async def wait_for_done(self, value=1):
+        await run_steps(self._done_steps(value))
+
+    async def run_jobs(self, jobs, signal):
+        """ throughput mode: run a queue of Jobs back to back through the command signal `signal`, see
+            cmd_tester.CmdDoneTester.run_jobs (the ready of every input bus must be gated by the DUT state); returns the
+            throughput of the run
+        """
+        return await run_steps(self._job_steps(jobs, signal))
+
+
+__all__ = ['ValidReadyDriver', 'ValidReadyMonitor', 'ValidReadyTester', 'CmdDoneTester', 'Command', 'Job',
+           'run_steps', 'pack_words', 'HandshakeStats', 'StreamingScoreboard', 'ValidReadyProtocolError',
+           'compare_lists', 'to_hex_str']
@@ -1,10 +1,10 @@
 # from pyber import KYBER_SYMBYTES, KYBER_INDCPA_MSGBYTES, atpk_bytes, compressed_pk_bytes
-import pyber2 as pyber
-from pyber2 import (atpk_bytes, KYBER_INDCPA_PUBLICKEYBYTES, KYBER_Q, KYBER_CIPHERTEXTBYTES, KYBER_INDCPA_SECRETKEYBYTES, KYBER_POLYVECCOMPRESSEDBYTES,
-                    KYBER_POLYCOMPRESSEDBYTES, KYBER_INDCPA_MSGBYTES, KYBER_SYMBYTES)
+import pyber
 
 
 from pathlib import Path
+from pyber import vectors, pipeline
+import os
 import subprocess
 from cocorun.conf import Manifest
 from cocorun.sim.ghdl import Ghdl
@@ -13,18 +13,15 @@ from random import randint
 
 import random as rnd
 
-pk, sk = pyber.indcpa_keypair()
+pyber = pyber.load(round=2)
 
-rsk = pyber.repack_sk_nontt(sk)
+SEED = int(os.getenv('PYBER_SEED', '0'))
+INDEX = int(os.getenv('PYBER_INDEX', '0'))
 
-msg = [rnd.randint(0, 0xff) for i in range(KYBER_INDCPA_MSGBYTES)]
-coins = [rnd.randint(0, 0xff) for i in range(KYBER_SYMBYTES)]
+store = vectors.open_or_create(os.getenv('PYBER_VECTORS', f'cpa_vectors_r{pyber.NIST_ROUND}_k{pyber.KYBER_K}.bin'), pyber, SEED, INDEX + 1)
+v = store[INDEX]
 
-ct = list(pyber.indcpa_enc(msg, pk, coins))
-
-msg1 = list(pyber.indcpa_dec(ct, sk))
-
-assert msg == msg1
+rsk, msg, ct = v.rsk, list(v.msg), v.ct
 
 # coins = [randint(0, 0xff) for _ in range(KYBER_SYMBYTES)]  # [i & 0xff for i in range(KYBER_SYMBYTES)]
 # pk = [randint(0, 0xff) for i in range(compressed_pk_bytes())]
@@ -36,13 +33,8 @@ exp_str = [hex(e)[2:].zfill(2) for e in exp]
 
 print(f'exp={exp_str}')
 
-with Path("sdi.in.txt").open('w') as fi:
-    for x in rsk:
-        fi.write(f"{hex(x)[2:].zfill(2)}\n")
-
-with Path("pdi.in.txt").open('w') as fi:
-    for x in ct:
-        fi.write(f"{hex(x)[2:].zfill(2)}\n")
+pipeline.write_record("sdi.in.txt", rsk, 'bytes')
+pipeline.run(pipeline.store_batches(store, INDEX, INDEX + 1), [("pdi.in.txt", 'ct', 'bytes')])
 
 # with Path("coins.in.txt").open('w') as fi:
 #     for x in coins:
@@ -1,48 +1,27 @@
 # from pyber import KYBER_SYMBYTES, KYBER_INDCPA_MSGBYTES, atpk_bytes, compressed_pk_bytes
-import pyber2 as pyber
-from pyber2 import (atpk_bytes, KYBER_INDCPA_PUBLICKEYBYTES, KYBER_Q, KYBER_CIPHERTEXTBYTES, KYBER_INDCPA_SECRETKEYBYTES, KYBER_POLYVECCOMPRESSEDBYTES,
-                    KYBER_POLYCOMPRESSEDBYTES, KYBER_INDCPA_MSGBYTES, KYBER_SYMBYTES)
+import pyber
 
 
 from pathlib import Path
+from pyber import generate, pipeline
+import os
 import subprocess
 from itertools import zip_longest
 from random import randint
 
 import random as rnd
 
-pk, sk = pyber.indcpa_keypair()
+pyber = pyber.load(round=2)
 
-rsk = pyber.repack_sk_nontt(sk)
+SEED = int(os.getenv('PYBER_SEED', '0'))
+N_VECTORS = int(os.getenv('PYBER_N_VECTORS', '10000'))
 
+N_WORKERS = int(os.getenv('PYBER_WORKERS', '0')) or None  # default: all cores
 
-with Path("sdi.fobos.txt").open('w') as fi:
-    for x in rsk:
-        fi.write(f"{hex(x)[2:].zfill(2)}")
-    fi.write("\n")
+store = generate.open_or_generate(os.getenv('PYBER_VECTORS', f'cpa_vectors_r{pyber.NIST_ROUND}_k{pyber.KYBER_K}.bin'), pyber, SEED, N_VECTORS,
+                                  workers=N_WORKERS)
 
+pipeline.write_record("sdi.fobos.txt", store[0].rsk, 'fobos')
 
-
-with Path("pdi.fobos.txt").open('w') as fi:
-    for i in range(10000):
-
-        msg = [rnd.randint(0, 0xff) for _ in range(KYBER_INDCPA_MSGBYTES)]
-
-        # msg[0] = i
-
-        print(f"msg={msg}")
-
-        coins = [rnd.randint(0, 0xff) for _ in range(KYBER_SYMBYTES)]
-
-        ct = list(pyber.indcpa_enc(msg=msg, pk=pk, coins=coins))
-        print(f"ct[0]={ct[0]}")
-        msg1 = list(pyber.indcpa_dec(ct, sk))
-        assert msg == msg1
-
-        print(f"ct[0]={ct[0]} msg1={msg1[0]} msg={msg[0]}")
-
-        for x in ct:
-            fi.write(f"{hex(x)[2:].zfill(2)}")
-
-        fi.write("\n")
-
+batches = pipeline.self_check(pipeline.store_batches(store, 0, N_VECTORS), pyber, [store[0].sk])
+pipeline.run(batches, [("pdi.fobos.txt", 'ct', 'fobos')])
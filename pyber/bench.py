@@ -0,0 +1,306 @@
+"""
+    Microbenchmarks of the pyber wrappers
+
+    For every wrapper this measures:
+        total_us      one call of the wrapper
+        c_us          the bare C calls the wrapper makes, on preallocated arguments
+        overhead_us   total_us - c_us: argument marshalling and result construction in Python (0 when lost in noise)
+        alloc_blocks  Python memory blocks still held per call when the results are kept (result objects)
+        alloc_bytes   peak bytes allocated during one call (traced by tracemalloc)
+
+    Times are the best of `repeat` runs. Results can be saved as a JSON baseline and later runs compared against it:
+
+        python bench.py --round 2 -k 3 --save bench_r2_k3.json
+        python bench.py --round 2 -k 3 --compare bench_r2_k3.json --threshold 0.2
+
+    With --kem N, the batched CCA KEM functions are timed instead, on batches of N, and reported as key pairs,
+    encapsulations and decapsulations per second (the software baseline for the CCA wrapper around the cpa core).
+
+    The comparison lists every benchmark whose time or allocations grew by more than `threshold` (relative) and exits
+    with status 1 if there is any.
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import sys
+import timeit
+import tracemalloc
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    from . import load
+except ImportError:
+    from pyber import load
+
+Benchmark = namedtuple('Benchmark', 'name call c_call')
+
+RESULT_FIELDS = ('total_us', 'c_us', 'overhead_us', 'alloc_blocks', 'alloc_bytes')
+
+
+@contextlib.contextmanager
+def _quiet():
+    """ silence stdout, including the prints of the C model, which write to fd 1 directly """
+    sys.stdout.flush()
+    saved = os.dup(1)
+    try:
+        with open(os.devnull, 'w') as devnull:
+            os.dup2(devnull.fileno(), 1)
+            with contextlib.redirect_stdout(devnull):
+                yield
+    finally:
+        os.dup2(saved, 1)
+        os.close(saved)
+
+
+def benchmarks(model):
+    """ Benchmarks of `model`, each a wrapper call and the equivalent bare C calls (None if it makes none) """
+    ffi, lib = model.ffi, model.pyber_clib
+    rng = np.random.default_rng(0)
+
+    def cbuf(data):
+        return ffi.new('unsigned char[]', data)
+
+    pk, sk = model.seeded_keypair(0)
+    msgs, coins = model.seeded_msg_coins(0, 0)
+    ct = model.indcpa_enc(msgs, pk, coins)
+    atpk = model.atpk_bytes(pk)
+    rsk = model.repack_sk_nontt(sk)
+    c_pk, c_sk, c_ct, c_msg, c_coins = cbuf(pk), cbuf(sk), cbuf(ct), cbuf(msgs), cbuf(coins)
+    c_atpk, c_rsk = cbuf(atpk), cbuf(rsk)
+    c_ct_out = ffi.new(f'unsigned char[{model.KYBER_CIPHERTEXTBYTES}]')
+    c_msg_out = ffi.new(f'unsigned char[{model.KYBER_INDCPA_MSGBYTES}]')
+    c_atpk_out = ffi.new(f'unsigned char[{model.KYBER_PKBYTES}]')
+    c_rsk_out = ffi.new(f'unsigned char[{model.KYBER_INDCPA_SECRETKEYBYTES}]')
+
+    a = model.Polynomial.random()
+    b = model.Polynomial.random()
+    va = model.PolynomialVector.random()
+    vb = model.PolynomialVector.random()
+    c_a, c_b, c_r = a.to_cpoly(), b.to_cpoly(), model.Polynomial.zero().to_cpoly()
+    c_va, c_vb = va.to_cpolyvec(), vb.to_cpolyvec()
+    c_va_ntt, c_vb_ntt = ffi.from_buffer('polyvec *', va.ntt()), ffi.from_buffer('polyvec *', vb.ntt())
+    c_pv_r = model.PolynomialVector.zero().to_cpolyvec()
+
+    batch = 64
+    batch_r = rng.integers(0, model.KYBER_Q, size=(batch, model.KYBER_N)).astype(model.COEFF_DTYPE)
+    batch_a, batch_b = (rng.integers(0, model.KYBER_Q, size=(batch, model.KYBER_K, model.KYBER_N)).astype(model.COEFF_DTYPE)
+                        for _ in range(2))
+    batch_out = batch_r.copy()  # updated in place by the C-only run, stays in [0, KYBER_Q)
+    c_batch_r = ffi.from_buffer('poly *', batch_out)
+    c_batch_a, c_batch_b = ffi.from_buffer('polyvec *', batch_a), ffi.from_buffer('polyvec *', batch_b)
+
+    poly_ct = ct[-model.KYBER_POLYCOMPRESSEDBYTES:]
+    polyvec_ct = ct[:model.KYBER_POLYVECCOMPRESSEDBYTES]
+    c_poly_ct, c_polyvec_ct = cbuf(poly_ct), cbuf(polyvec_ct)
+
+    def c_add():
+        lib.poly_add(c_r, c_a, c_b)
+        lib.poly_freeze(c_r)
+
+    def c_mul():
+        lib.polyvec_pointwise_acc(c_r, c_va_ntt, c_vb_ntt)
+        lib.poly_invntt(c_r)
+
+    def atpk_miss():
+        model.atpk_cache.clear()
+        return model.atpk_bytes(pk)
+
+    def repack_sk_miss():
+        model.repack_sk_cache.clear()
+        return model.repack_sk_nontt(sk)
+
+    yield Benchmark('Polynomial.__add__', lambda: a + b, c_add)
+    yield Benchmark('PolynomialVector.__mul__', lambda: va * vb, c_mul)
+    yield Benchmark('polyvec_nega_mac', lambda: model.polyvec_nega_mac(a, va, vb),
+                    lambda: lib.polyvec_nega_mac(c_r, c_va, c_vb, 0))
+    yield Benchmark(f'polyvec_nega_mac_batch[{batch}]', lambda: model.polyvec_nega_mac_batch(batch_r, batch_a, batch_b),
+                    lambda: lib.polyvec_nega_mac_batch(c_batch_r, c_batch_a, c_batch_b, 0, batch))
+    yield Benchmark('poly_decompress', lambda: model.poly_decompress(poly_ct),
+                    lambda: lib.poly_decompress(c_r, c_poly_ct))
+    yield Benchmark('polyvec_decompress', lambda: model.polyvec_decompress(polyvec_ct),
+                    lambda: lib.polyvec_decompress(c_pv_r, c_polyvec_ct))
+    yield Benchmark('indcpa_enc', lambda: model.indcpa_enc(msgs, pk, coins),
+                    lambda: lib.indcpa_enc(c_ct_out, c_msg, c_pk, c_coins))
+    yield Benchmark('indcpa_dec', lambda: model.indcpa_dec(ct, sk),
+                    lambda: lib.indcpa_dec(c_msg_out, c_ct, c_sk))
+    yield Benchmark('indcpa_enc_nontt', lambda: model.indcpa_enc_nontt(msgs, atpk, coins),
+                    lambda: lib.indcpa_enc_nontt(c_ct_out, c_msg, c_atpk, c_coins))
+    yield Benchmark('indcpa_dec_nontt', lambda: model.indcpa_dec_nontt(ct, rsk),
+                    lambda: lib.indcpa_dec_nontt(c_msg_out, c_ct, c_rsk))
+    yield Benchmark('atpk_bytes[miss]', atpk_miss, lambda: lib.repack_at_pk(c_atpk_out, c_pk))
+    yield Benchmark('atpk_bytes[hit]', lambda: model.atpk_bytes(pk), None)
+    yield Benchmark('repack_sk_nontt[miss]', repack_sk_miss, lambda: lib.repack_sk_nontt(c_rsk_out, c_sk))
+    yield Benchmark('repack_sk_nontt[hit]', lambda: model.repack_sk_nontt(sk), None)
+    kem_pk, kem_sk = model.crypto_kem_keypair()
+    kem_ct, _ = model.crypto_kem_enc(kem_pk)
+    c_kem_pk, c_kem_sk, c_kem_ct = cbuf(kem_pk), cbuf(kem_sk), cbuf(kem_ct)
+    c_kem_ct_out = ffi.new(f'unsigned char[{model.CRYPTO_CIPHERTEXTBYTES}]')
+    c_kem_ss_out = ffi.new(f'unsigned char[{model.CRYPTO_BYTES}]')
+    yield Benchmark('crypto_kem_enc', lambda: model.crypto_kem_enc(kem_pk),
+                    lambda: lib.crypto_kem_enc(c_kem_ct_out, c_kem_ss_out, c_kem_pk))
+    yield Benchmark('crypto_kem_dec', lambda: model.crypto_kem_dec(kem_ct, kem_sk),
+                    lambda: lib.crypto_kem_dec(c_kem_ss_out, c_kem_ct, c_kem_sk))
+    if hasattr(lib, 'poly_getnoise_bytes'):
+        c_noise = ffi.new(f'unsigned char[{model.KYBER_ETA * model.KYBER_N // 4}]')
+        yield Benchmark('getnoise_bytes', lambda: model.getnoise_bytes(coins, 0),
+                        lambda: lib.poly_getnoise_bytes(c_noise, c_coins, 0))
+
+
+def kem_benchmarks(model, n):
+    """ Benchmarks of the batched CCA KEM functions on batches of `n` """
+    ffi, lib = model.ffi, model.pyber_clib
+    pks, sks = model.crypto_kem_keypair_batch(n)
+    cts, sss = model.crypto_kem_enc_batch(pks, n)
+    assert model.crypto_kem_dec_batch(cts, sks) == sss, "decapsulation does not match encapsulation"
+    c_pks, c_sks, c_cts = (ffi.from_buffer('unsigned char[]', b) for b in (pks, sks, cts))
+    c_pks_out, c_sks_out = ffi.new(f'unsigned char[{len(pks)}]'), ffi.new(f'unsigned char[{len(sks)}]')
+    c_cts_out, c_sss_out = ffi.new(f'unsigned char[{len(cts)}]'), ffi.new(f'unsigned char[{len(sss)}]')
+
+    yield Benchmark(f'crypto_kem_keypair_batch[{n}]', lambda: model.crypto_kem_keypair_batch(n),
+                    lambda: lib.crypto_kem_keypair_batch(c_pks_out, c_sks_out, n))
+    yield Benchmark(f'crypto_kem_enc_batch[{n}]', lambda: model.crypto_kem_enc_batch(pks, n),
+                    lambda: lib.crypto_kem_enc_batch(c_cts_out, c_sss_out, c_pks, model.CRYPTO_PUBLICKEYBYTES, n))
+    yield Benchmark(f'crypto_kem_dec_batch[{n}]', lambda: model.crypto_kem_dec_batch(cts, sks),
+                    lambda: lib.crypto_kem_dec_batch(c_sss_out, c_cts, c_sks, model.CRYPTO_SECRETKEYBYTES, n))
+
+
+def kem_rates(results: dict) -> dict:
+    """ operations per second of the kem_benchmarks in `results` """
+    rates = {}
+    for name, r in results.items():
+        for op, label in (('keypair', 'keypairs_per_s'), ('enc', 'encaps_per_s'), ('dec', 'decaps_per_s')):
+            if name.startswith(f'crypto_kem_{op}_batch['):
+                n = int(name[name.index('[') + 1:-1])
+                rates[label] = n / r['total_us'] * 1e6
+    return rates
+
+
+def _time_us(fn, repeat):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def _allocations(fn, n):
+    gc.collect()
+    results = []
+    blocks = sys.getallocatedblocks()
+    for _ in range(n):
+        results.append(fn())
+    alloc_blocks = (sys.getallocatedblocks() - blocks - 1) / n  # - 1: growth of the results list itself is negligible
+    del results
+
+    tracemalloc.start()
+    try:
+        fn()  # warm up
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return max(alloc_blocks, 0.0), peak - current
+
+
+def run(model, repeat=5, select=None, kem=None) -> dict:
+    """ run the benchmarks of `model` whose name contains one of the strings in `select` (all if None)
+
+        kem: run the batched KEM benchmarks on batches of `kem` instead
+    """
+    results = {}
+    with _quiet():
+        for bench in (kem_benchmarks(model, kem) if kem else benchmarks(model)):
+            if select and not any(s in bench.name for s in select):
+                continue
+            total = _time_us(bench.call, repeat)
+            c = _time_us(bench.c_call, repeat) if bench.c_call is not None else 0.0
+            alloc_blocks, alloc_bytes = _allocations(bench.call, 4 if kem else 64)
+            results[bench.name] = dict(total_us=total, c_us=c, overhead_us=max(total - c, 0.0),
+                                       alloc_blocks=alloc_blocks, alloc_bytes=alloc_bytes)
+    return results
+
+
+def metadata(model) -> dict:
+    return dict(round=model.NIST_ROUND, k=model.KYBER_K, python=platform.python_version(),
+                machine=platform.machine(), processor=platform.processor(), numpy=np.__version__)
+
+
+def save(path, model, results):
+    with open(path, 'w') as f:
+        json.dump(dict(meta=metadata(model), results=results), f, indent=2, sort_keys=True)
+
+
+def compare(baseline: dict, results: dict, threshold: float) -> list:
+    """ (name, field, baseline value, new value) of every measure in `results` that grew by more than `threshold`
+
+        Only total time and allocations are compared: c_us and overhead_us are just its breakdown.
+    """
+    regressions = []
+    for name, new in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        for field in ('total_us', 'alloc_blocks', 'alloc_bytes'):
+            if new[field] > old[field] * (1 + threshold) and new[field] - old[field] >= 1:
+                regressions.append((name, field, old[field], new[field]))
+    return regressions
+
+
+def report(results: dict, baseline: dict = None):
+    print(f"{'benchmark':<30}{'total_us':>12}{'c_us':>12}{'overhead_us':>13}{'alloc_blocks':>14}{'alloc_bytes':>13}"
+          + (f"{'vs baseline':>13}" if baseline else ""))
+    for name, r in results.items():
+        line = (f"{name:<30}{r['total_us']:>12.2f}{r['c_us']:>12.2f}{r['overhead_us']:>13.2f}"
+                f"{r['alloc_blocks']:>14.1f}{r['alloc_bytes']:>13d}")
+        if baseline and name in baseline:
+            line += f"{r['total_us'] / baseline[name]['total_us']:>12.2f}x"
+        print(line)
+    for label, rate in kem_rates(results).items():
+        print(f"{label:<30}{rate:>12.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Microbenchmarks of the pyber wrappers')
+    parser.add_argument('--round', type=int, default=1, help='NIST round of the model')
+    parser.add_argument('-k', type=int, default=3, help='KYBER_K of the model')
+    parser.add_argument('--repeat', type=int, default=5, help='timing runs per benchmark, the best is kept')
+    parser.add_argument('--select', nargs='*', help='only run benchmarks whose name contains one of these')
+    parser.add_argument('--kem', type=int, metavar='N', help='time the batched CCA KEM on batches of N instead')
+    parser.add_argument('--save', metavar='JSON', help='write the results as a baseline to this file')
+    parser.add_argument('--compare', metavar='JSON', help='compare the results with this baseline')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative growth over the baseline reported as a regression (default: 0.1)')
+    args = parser.parse_args(argv)
+
+    model = load(args.round, args.k)
+    results = run(model, args.repeat, args.select, args.kem)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if (baseline['meta']['round'], baseline['meta']['k']) != (model.NIST_ROUND, model.KYBER_K):
+            parser.error(f"{args.compare} is a baseline of round {baseline['meta']['round']} K={baseline['meta']['k']}")
+        baseline = baseline['results']
+
+    report(results, baseline)
+    if args.save:
+        save(args.save, model, results)
+
+    if baseline is not None:
+        regressions = compare(baseline, results, args.threshold)
+        for name, field, old, new in regressions:
+            print(f"REGRESSION {name}: {field} {old:.2f} -> {new:.2f} (+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
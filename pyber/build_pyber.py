@@ -1,21 +1,24 @@
 from cffi import FFI
 from pathlib import Path
-ffibuilder = FFI()
-ffibuilder2 = FFI()
 import os
+import shutil
+import sys
 
 ROOT_DIR = Path(os.path.dirname(os.path.abspath(__file__)))
 
-#print("Path(__file__)=", os.path.abspath(__file__))
-# src_path = Path(ROOT_DIR).joinpath('cref')  # Path(__file__).parents[1].joinpath('kyber','ref')
-src_path = Path(ROOT_DIR).joinpath('cref')
-assert src_path.exists(), f"{src_path} does not exist"
+# one extension per (NIST round, KYBER_K); K=3 keeps the original module names
+KYBER_KS = (2, 3, 4)
 
 
-ffibuilder.cdef(
-"""
+def module_name(round, k):
+    name = '_pyber' if round == 1 else '_pyber2'
+    return name if k == 3 else f'{name}_k{k}'
+
+
+# KYBER_K is substituted by make_ffibuilder
+CDEF_ROUND1 = """
     #define KYBER_N 256
-    #define KYBER_K 3
+    #define KYBER_K {kyber_k}
     #define KYBER_SYMBYTES 32
     #define KYBER_Q ...
     #define KYBER_ETA ...
@@ -58,6 +61,7 @@ ffibuilder.cdef(
 
     // added by me:
     void polyvec_nega_mac(poly *r, const polyvec *a, const polyvec *b, int neg);
+    void polyvec_nega_mac_batch(poly *r, const polyvec *a, const polyvec *b, int neg, size_t n);
     void poly_freeze(poly *a);
     void at_pk_frombytes(polyvec *at, polyvec *pkpv, const unsigned char *bytes);
     void repack_at_pk(unsigned char *pk_at_bytes, const unsigned char *pk);
@@ -71,6 +75,31 @@ ffibuilder.cdef(
     void indcpa_dec_nontt(unsigned char *m, const unsigned char *c,
                       const unsigned char *sk);
 
+    typedef struct {
+        polyvec r;
+        polyvec e1;
+        poly e2;
+        polyvec u;
+        poly vmac;
+        poly msg;
+        poly v;
+        unsigned char c[...];
+    } indcpa_enc_trace;
+
+    typedef struct {
+        polyvec u;
+        poly v;
+        polyvec s;
+        poly mp;
+        unsigned char m[...];
+    } indcpa_dec_trace;
+
+    void indcpa_enc_nontt_traced(unsigned char *c, const unsigned char *m, const unsigned char *pk_at_bytes,
+                                 const unsigned char *coins, indcpa_enc_trace *t);
+    void indcpa_dec_nontt_traced(unsigned char *m, const unsigned char *c, const unsigned char *rsk,
+                                 indcpa_dec_trace *t);
+
+
 
     int crypto_encrypt(unsigned char *c, unsigned long long *clen,
                    const unsigned char *m, unsigned long long mlen,
@@ -102,14 +131,33 @@ ffibuilder.cdef(
     void unpack_ciphertext(polyvec *b, poly *v, const unsigned char *c);
 
     void indcpa_keypair(unsigned char *pk, unsigned char *sk);
+    void indcpa_keypair_from_seed(unsigned char *pk, unsigned char *sk, const unsigned char *seed);
     void indcpa_enc(unsigned char *c, const unsigned char *m, const unsigned char *pk, const unsigned char *coins);
     void indcpa_dec(unsigned char *m, const unsigned char *c, const unsigned char *sk);
-""")
 
-ffibuilder2.cdef(
+    void indcpa_keypair_batch(unsigned char *pk, unsigned char *sk, size_t n);
+    void indcpa_enc_batch(unsigned char *c, const unsigned char *m, const unsigned char *pk, size_t pk_stride,
+                          const unsigned char *coins, size_t n);
+    void indcpa_dec_batch(unsigned char *m, const unsigned char *c, const unsigned char *sk, size_t sk_stride, size_t n);
+
+    #define KYBER_SECRETKEYBYTES ...
+    #define CRYPTO_PUBLICKEYBYTES ...
+    #define CRYPTO_SECRETKEYBYTES ...
+    #define CRYPTO_CIPHERTEXTBYTES ...
+    #define CRYPTO_BYTES ...
+
+    int crypto_kem_keypair(unsigned char *pk, unsigned char *sk);
+    int crypto_kem_enc(unsigned char *ct, unsigned char *ss, const unsigned char *pk);
+    int crypto_kem_dec(unsigned char *ss, const unsigned char *ct, const unsigned char *sk);
+
+    void crypto_kem_keypair_batch(unsigned char *pk, unsigned char *sk, size_t n);
+    void crypto_kem_enc_batch(unsigned char *ct, unsigned char *ss, const unsigned char *pk, size_t pk_stride, size_t n);
+    void crypto_kem_dec_batch(unsigned char *ss, const unsigned char *ct, const unsigned char *sk, size_t sk_stride, size_t n);
 """
+
+CDEF_ROUND2 = """
     #define KYBER_N 256
-    #define KYBER_K 3
+    #define KYBER_K {kyber_k}
     #define KYBER_SYMBYTES 32
     #define KYBER_Q ...
     #define KYBER_ETA ...
@@ -149,8 +197,38 @@ ffibuilder2.cdef(
 
     void repack_sk_nontt(unsigned char *rsk, const unsigned char *sk);
     void repack_at_pk(unsigned char *pk_at_bytes, const unsigned char *pk);
+    void indcpa_enc_nontt(unsigned char *c, const unsigned char *m, const unsigned char *pk_at_bytes,
+                          const unsigned char *coins);
+    void indcpa_dec_nontt(unsigned char *m, const unsigned char *c, const unsigned char *rsk);
+
+    typedef struct {
+        polyvec r;
+        polyvec e1;
+        poly e2;
+        polyvec u;
+        poly vmac;
+        poly msg;
+        poly v;
+        unsigned char c[...];
+    } indcpa_enc_trace;
+
+    typedef struct {
+        polyvec u;
+        poly v;
+        polyvec s;
+        poly mp;
+        unsigned char m[...];
+    } indcpa_dec_trace;
+
+    void indcpa_enc_nontt_traced(unsigned char *c, const unsigned char *m, const unsigned char *pk_at_bytes,
+                                 const unsigned char *coins, indcpa_enc_trace *t);
+    void indcpa_dec_nontt_traced(unsigned char *m, const unsigned char *c, const unsigned char *rsk,
+                                 indcpa_dec_trace *t);
+
 
     // added by me:
+    void polyvec_nega_mac(poly *r, const polyvec *a, const polyvec *b, int neg);
+    void polyvec_nega_mac_batch(poly *r, const polyvec *a, const polyvec *b, int neg, size_t n);
     void poly_freeze(poly *a);
 
     void polyvec_pointwise_acc(poly *r, const polyvec *a, const polyvec *b);
@@ -165,41 +243,55 @@ ffibuilder2.cdef(
     void gen_matrix(polyvec *a, const unsigned char *seed, int transposed);
 
     void indcpa_keypair(unsigned char *pk, unsigned char *sk);
+    void indcpa_keypair_from_seed(unsigned char *pk, unsigned char *sk, const unsigned char *seed);
     void indcpa_enc(unsigned char *c, const unsigned char *m, const unsigned char *pk, const unsigned char *coins);
     void indcpa_dec(unsigned char *m, const unsigned char *c, const unsigned char *sk);
-""")
 
-sources=[str(src) for src in src_path.glob("*.c") if src.name not in ['rng.c', "PQCgenKAT_kem.c", 'testvectors.c', 'kex.c', 'PQCgenKAT_encrypt.c', 'speed.c', 'test_kex.c', 'precomp.gp.c']  ]
+    void indcpa_keypair_batch(unsigned char *pk, unsigned char *sk, size_t n);
+    void indcpa_enc_batch(unsigned char *c, const unsigned char *m, const unsigned char *pk, size_t pk_stride,
+                          const unsigned char *coins, size_t n);
+    void indcpa_dec_batch(unsigned char *m, const unsigned char *c, const unsigned char *sk, size_t sk_stride, size_t n);
 
-print(sources)
+    #define KYBER_SECRETKEYBYTES ...
+    #define CRYPTO_PUBLICKEYBYTES ...
+    #define CRYPTO_SECRETKEYBYTES ...
+    #define CRYPTO_CIPHERTEXTBYTES ...
+    #define CRYPTO_BYTES ...
 
-ffibuilder.set_source("_pyber",
-f"""
-    #include "{src_path}/poly.h"
-    #include "{src_path}/polyvec.h"
-    #include "{src_path}/indcpa.h"
-    #include "{src_path}/params.h"
-    #include "{src_path}/reduce.h"
-    #include "{src_path}/cbd.h"
-    #include "{src_path}/ntt.h"
-    #include "{src_path}/fips202.h"
-    #include "{src_path}/rng.h"
-""" +
+    int crypto_kem_keypair(unsigned char *pk, unsigned char *sk);
+    int crypto_kem_enc(unsigned char *ct, unsigned char *ss, const unsigned char *pk);
+    int crypto_kem_dec(unsigned char *ss, const unsigned char *ct, const unsigned char *sk);
+
+    void crypto_kem_keypair_batch(unsigned char *pk, unsigned char *sk, size_t n);
+    void crypto_kem_enc_batch(unsigned char *ct, unsigned char *ss, const unsigned char *pk, size_t pk_stride, size_t n);
+    void crypto_kem_dec_batch(unsigned char *ss, const unsigned char *ct, const unsigned char *sk, size_t sk_stride, size_t n);
 """
 
-""",
-    sources=sources,
-    #[ str(src_path.joinpath(src)) for src in  ['reduce.c', 'precomp.c', 'ntt.c', 'cbd.c', 'poly.c', 'polyvec.c']],
-    # libraries=['m']
-    )
+SRC_PATH = {1: ROOT_DIR.joinpath('cref'), 2: ROOT_DIR.joinpath('cref2')}
 
-src_path = Path(ROOT_DIR).joinpath('cref2')
-assert src_path.exists(), f"{src_path} does not exist"
+EXCLUDED_SOURCES = {
+    1: ['rng.c', "PQCgenKAT_kem.c", 'testvectors.c', 'kex.c', 'PQCgenKAT_encrypt.c', 'speed.c', 'test_kex.c', 'precomp.gp.c'],
+    # randombytes.c duplicates rng.c, test.c and test_kyber.c both define main()
+    2: ["PQCgenKAT_kem.c", 'randombytes.c', 'test.c', 'test_kyber.c',
+        'testvectors.c', 'kex.c', 'PQCgenKAT_encrypt.c', 'speed.c', 'test_kex.c', 'precomp.gp.c'],
+}
 
-sources = [str(src) for src in src_path.glob("*.c") if src.name not in ["PQCgenKAT_kem.c",
-                                                                        'testvectors.c', 'kex.c', 'PQCgenKAT_encrypt.c', 'speed.c', 'test_kex.c', 'precomp.gp.c']]
 
-ffibuilder2.set_source("_pyber2",
+def make_ffibuilder(round, k):
+    src_path = SRC_PATH[round]
+    assert src_path.exists(), f"{src_path} does not exist"
+    assert k in KYBER_KS, f"KYBER_K must be in {KYBER_KS}"
+
+    ffi = FFI()
+    ffi.cdef((CDEF_ROUND1 if round == 1 else CDEF_ROUND2).replace('{kyber_k}', str(k)))
+
+    sources = [str(src) for src in src_path.glob("*.c") if src.name not in EXCLUDED_SOURCES[round]]
+
+    kwargs = {}
+    if round == 2:
+        kwargs = dict(libraries=['ssl', 'crypto'], library_dirs=['/usr/local/Cellar/openssl/1.0.2r/lib'])
+
+    ffi.set_source(module_name(round, k),
 f"""
     #include "{src_path}/poly.h"
     #include "{src_path}/polyvec.h"
@@ -210,16 +302,26 @@ f"""
     #include "{src_path}/ntt.h"
     #include "{src_path}/fips202.h"
     #include "{src_path}/rng.h"
-""" +
-"""
-
+    #include "{src_path}/api.h"
 """,
-    sources=sources,
-    #[ str(src_path.joinpath(src)) for src in  ['reduce.c', 'precomp.c', 'ntt.c', 'cbd.c', 'poly.c', 'polyvec.c']],
-    libraries=['ssl', 'crypto'],
-    library_dirs=['/usr/local/Cellar/openssl/1.0.2r/lib'],
-    )
+        sources=sources,
+        define_macros=[('KYBER_K', str(k))],
+        **kwargs
+        )
+    return ffi
+
+
+ffibuilder = make_ffibuilder(1, 3)
+ffibuilder2 = make_ffibuilder(2, 3)
+ffibuilder_k2 = make_ffibuilder(1, 2)
+ffibuilder_k4 = make_ffibuilder(1, 4)
+ffibuilder2_k2 = make_ffibuilder(2, 2)
+ffibuilder2_k4 = make_ffibuilder(2, 4)
 
 if __name__ == "__main__":
-    ffibuilder.compile(verbose=False)
-    ffibuilder2.compile(verbose=False)
+    # python build_pyber.py [<round>:<K> ...], default: everything
+    targets = [tuple(int(x) for x in arg.split(':')) for arg in sys.argv[1:]] or [(r, k) for r in (1, 2) for k in KYBER_KS]
+    for round, k in targets:
+        # separate temporary directories: every extension compiles the same sources with a different KYBER_K
+        lib = make_ffibuilder(round, k).compile(tmpdir=str(ROOT_DIR.joinpath('build', module_name(round, k))), verbose=False)
+        shutil.copy(lib, ROOT_DIR)
@@ -1,6 +1,7 @@
 #ifndef API_H
 #define API_H
 
+#include <stddef.h>
 #include "params.h"
 
 #define CRYPTO_SECRETKEYBYTES  KYBER_SECRETKEYBYTES
@@ -24,6 +25,10 @@ int crypto_kem_enc(unsigned char *ct, unsigned char *ss, const unsigned char *pk
 
 int crypto_kem_dec(unsigned char *ss, const unsigned char *ct, const unsigned char *sk);
 
+void crypto_kem_keypair_batch(unsigned char *pk, unsigned char *sk, size_t n);
+void crypto_kem_enc_batch(unsigned char *ct, unsigned char *ss, const unsigned char *pk, size_t pk_stride, size_t n);
+void crypto_kem_dec_batch(unsigned char *ss, const unsigned char *ct, const unsigned char *sk, size_t sk_stride, size_t n);
+
 
 int crypto_encrypt_keypair(unsigned char *pk, unsigned char *sk);
 int crypto_encrypt(unsigned char *c, unsigned long long *clen, const unsigned char *m, unsigned long long mlen, const unsigned char *pk);
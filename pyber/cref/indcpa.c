@@ -190,6 +190,27 @@ int crypto_encrypt_keypair(unsigned char *pk, unsigned char *sk) {
  *KYBER_INDCPA_SECRETKEYBYTES bytes)
  **************************************************/
 void indcpa_keypair(unsigned char *pk, unsigned char *sk) {
+  unsigned char seed[KYBER_SYMBYTES];
+
+  randombytes(seed, KYBER_SYMBYTES);
+  indcpa_keypair_from_seed(pk, sk, seed);
+}
+
+/*************************************************
+ * Name:        indcpa_keypair_from_seed
+ *
+ * Description: Deterministic version of indcpa_keypair; the seed takes the
+ *              place of the KYBER_SYMBYTES bytes drawn from randombytes
+ *
+ * Arguments:   - unsigned char *pk: pointer to output public key (of length
+ *KYBER_INDCPA_PUBLICKEYBYTES bytes)
+ *              - unsigned char *sk: pointer to output private key (of length
+ *KYBER_INDCPA_SECRETKEYBYTES bytes)
+ *              - const unsigned char *seed: pointer to input seed (of length
+ *KYBER_SYMBYTES bytes)
+ **************************************************/
+void indcpa_keypair_from_seed(unsigned char *pk, unsigned char *sk,
+                              const unsigned char *seed) {
   polyvec a[KYBER_K], e, pkpv, skpv;
   unsigned char buf[KYBER_SYMBYTES + KYBER_SYMBYTES];
   unsigned char *publicseed = buf;
@@ -197,7 +218,7 @@ void indcpa_keypair(unsigned char *pk, unsigned char *sk) {
   int i;
   unsigned char nonce = 0;
 
-  randombytes(buf, KYBER_SYMBYTES);
+  memcpy(buf, seed, KYBER_SYMBYTES);
   sha3_512(buf, buf, KYBER_SYMBYTES);
 
   gen_a(a, publicseed);
@@ -366,9 +387,10 @@ void at_pk_frombytes(polyvec *at, polyvec *pkpv, const unsigned char *bytes) {
   }
   polyvec_frombytes(pkpv, bytes + KYBER_K * KYBER_POLYVECBYTES);
 }
-void indcpa_enc_nontt(unsigned char *c, const unsigned char *m,
-                      const unsigned char *pk_at_bytes,
-                      const unsigned char *coins) {
+/* indcpa_enc_nontt, also storing its intermediates in *t unless t is NULL */
+void indcpa_enc_nontt_traced(unsigned char *c, const unsigned char *m,
+                             const unsigned char *pk_at_bytes,
+                             const unsigned char *coins, indcpa_enc_trace *t) {
   polyvec s_pv, pkpv, at[KYBER_K], b_pv;
   poly v, msg_poly;
 
@@ -413,6 +435,12 @@ void indcpa_enc_nontt(unsigned char *c, const unsigned char *m,
   // printf("   ===pk.pkpv:\n");
   // polyvec_print(&pkpv);
 
+  if (t) {
+    t->r = s_pv;
+    t->e1 = b_pv;
+    t->e2 = v;
+  }
+
   for (int i = 0; i < KYBER_K; i++)
     polyvec_nega_mac(&b_pv.vec[i], at + i, &s_pv, 0);
 
@@ -424,6 +452,9 @@ void indcpa_enc_nontt(unsigned char *c, const unsigned char *m,
   // printf("\n\n-- V after MAC:\n");
   // poly_print(&v);
 
+  if (t)
+    t->vmac = v;
+
   poly_frommsg(&msg_poly, m);
 
   // printf("\n\n-- msg_polyC:\n");
@@ -438,6 +469,20 @@ void indcpa_enc_nontt(unsigned char *c, const unsigned char *m,
   // poly_print(&v);
 
   pack_ciphertext(c, &b_pv, &v);
+
+  if (t) {
+    t->u = b_pv;
+    t->msg = msg_poly;
+    t->v = v;
+    if (t->c != c)
+      memcpy(t->c, c, KYBER_INDCPA_BYTES);
+  }
+}
+
+void indcpa_enc_nontt(unsigned char *c, const unsigned char *m,
+                      const unsigned char *pk_at_bytes,
+                      const unsigned char *coins) {
+  indcpa_enc_nontt_traced(c, m, pk_at_bytes, coins, NULL);
 }
 
 int crypto_encrypt_open(unsigned char *m, unsigned long long *mlen,
@@ -508,8 +553,9 @@ void repack_sk_nontt(unsigned char *rsk, const unsigned char *sk) {
   pack_sk(rsk, &skpv);
 }
 
-void indcpa_dec_nontt(unsigned char *m, const unsigned char *c,
-                  const unsigned char *rsk) {
+/* indcpa_dec_nontt, also storing its intermediates in *t unless t is NULL */
+void indcpa_dec_nontt_traced(unsigned char *m, const unsigned char *c,
+                             const unsigned char *rsk, indcpa_dec_trace *t) {
   polyvec bp, skpv, mask;
   poly v;
 
@@ -517,6 +563,12 @@ void indcpa_dec_nontt(unsigned char *m, const unsigned char *c,
 
   unpack_sk(&skpv, rsk);
 
+  if (t) {
+    t->u = bp;
+    t->v = v;
+    t->s = skpv;
+  }
+
 #ifdef DEBUG
   printf("indcpa_dec_nontt: input v: \n");
   poly_dump(&v);
@@ -542,5 +594,78 @@ void indcpa_dec_nontt(unsigned char *m, const unsigned char *c,
   poly_dump(&v);
 #endif
 
+  if (t)
+    t->mp = v;
+
   poly_tomsg_nofreeze(m, &v);
+
+  if (t && t->m != m)
+    memcpy(t->m, m, KYBER_INDCPA_MSGBYTES);
+}
+
+void indcpa_dec_nontt(unsigned char *m, const unsigned char *c,
+                      const unsigned char *rsk) {
+  indcpa_dec_nontt_traced(m, c, rsk, NULL);
+}
+
+/*************************************************
+ * Name:        indcpa_keypair_batch
+ *
+ * Description: Generates n key pairs in a single call
+ *
+ * Arguments:   - unsigned char *pk: pointer to output public keys (of length
+ *n * KYBER_INDCPA_PUBLICKEYBYTES bytes)
+ *              - unsigned char *sk: pointer to output private keys (of length
+ *n * KYBER_INDCPA_SECRETKEYBYTES bytes)
+ *              - size_t n:          number of key pairs
+ **************************************************/
+void indcpa_keypair_batch(unsigned char *pk, unsigned char *sk, size_t n) {
+  for (size_t i = 0; i < n; i++)
+    indcpa_keypair(pk + i * KYBER_INDCPA_PUBLICKEYBYTES,
+                   sk + i * KYBER_INDCPA_SECRETKEYBYTES);
+}
+
+/*************************************************
+ * Name:        indcpa_enc_batch
+ *
+ * Description: Encrypts n messages in a single call
+ *
+ * Arguments:   - unsigned char *c:          pointer to output ciphertexts (of
+ *length n * KYBER_INDCPA_BYTES bytes)
+ *              - const unsigned char *m:    pointer to input messages (of
+ *length n * KYBER_INDCPA_MSGBYTES bytes)
+ *              - const unsigned char *pk:   pointer to input public key(s)
+ *              - size_t pk_stride:          distance in bytes between
+ *consecutive public keys; 0 encrypts all messages under the same key
+ *              - const unsigned char *coins: pointer to input random coins (of
+ *length n * KYBER_SYMBYTES bytes)
+ *              - size_t n:                  number of messages
+ **************************************************/
+void indcpa_enc_batch(unsigned char *c, const unsigned char *m,
+                      const unsigned char *pk, size_t pk_stride,
+                      const unsigned char *coins, size_t n) {
+  for (size_t i = 0; i < n; i++)
+    indcpa_enc(c + i * KYBER_INDCPA_BYTES, m + i * KYBER_INDCPA_MSGBYTES,
+               pk + i * pk_stride, coins + i * KYBER_SYMBYTES);
+}
+
+/*************************************************
+ * Name:        indcpa_dec_batch
+ *
+ * Description: Decrypts n ciphertexts in a single call
+ *
+ * Arguments:   - unsigned char *m:        pointer to output messages (of
+ *length n * KYBER_INDCPA_MSGBYTES bytes)
+ *              - const unsigned char *c:  pointer to input ciphertexts (of
+ *length n * KYBER_INDCPA_BYTES bytes)
+ *              - const unsigned char *sk: pointer to input secret key(s)
+ *              - size_t sk_stride:        distance in bytes between
+ *consecutive secret keys; 0 decrypts all ciphertexts with the same key
+ *              - size_t n:                number of ciphertexts
+ **************************************************/
+void indcpa_dec_batch(unsigned char *m, const unsigned char *c,
+                      const unsigned char *sk, size_t sk_stride, size_t n) {
+  for (size_t i = 0; i < n; i++)
+    indcpa_dec(m + i * KYBER_INDCPA_MSGBYTES, c + i * KYBER_INDCPA_BYTES,
+               sk + i * sk_stride);
 }
@@ -336,7 +336,7 @@ void polyvec_pointwise_acc(poly *r, const polyvec *a, const polyvec *b)
 #include <stdlib.h>
 
 // negacyclic school-book polynomial-vector multiply-accumulate
-void polyvec_nega_mac(poly *r, const polyvec *a, const polyvec *b, int neg) {
+static void nega_mac(poly *r, const polyvec *a, const polyvec *b, int neg) {
   int a_idx, sgn;
   int aa, bb;
 
@@ -346,7 +346,6 @@ void polyvec_nega_mac(poly *r, const polyvec *a, const polyvec *b, int neg) {
 //   polyvec_print(b);
 //   printf("\n--- r (in): --- \n");
 //   poly_print(r);
-  printf("polyvec_nega_mac\n");
   for (int r_idx = 0; r_idx < KYBER_N; r_idx++) {
     int ri = r->coeffs[r_idx];
     for (int k = 0; k < KYBER_K; k++) {
@@ -378,6 +377,29 @@ void polyvec_nega_mac(poly *r, const polyvec *a, const polyvec *b, int neg) {
 //   poly_print(r);
 }
 
+void polyvec_nega_mac(poly *r, const polyvec *a, const polyvec *b, int neg) {
+  printf("polyvec_nega_mac\n");
+  nega_mac(r, a, b, neg);
+}
+
+/*************************************************
+* Name:        polyvec_nega_mac_batch
+*
+* Description: polyvec_nega_mac over n independent (r, a, b) triples
+*
+* Arguments:   - poly *r:          pointer to n in/output polynomials
+*              - const polyvec *a: pointer to n input vectors of polynomials
+*              - const polyvec *b: pointer to n input vectors of polynomials
+*              - int neg:          subtract instead of add, as in polyvec_nega_mac
+*              - size_t n:         number of triples
+**************************************************/
+void polyvec_nega_mac_batch(poly *r, const polyvec *a, const polyvec *b, int neg, size_t n)
+{
+  size_t i;
+  for(i=0;i<n;i++)
+    nega_mac(&r[i], &a[i], &b[i], neg);
+}
+
 /*************************************************
 * Name:        polyvec_add
 *
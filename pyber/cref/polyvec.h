@@ -1,6 +1,7 @@
 #ifndef POLYVEC_H
 #define POLYVEC_H
 
+#include <stddef.h>
 #include "params.h"
 #include "poly.h"
 
@@ -19,6 +20,7 @@ void polyvec_invntt(polyvec *r);
 
 void polyvec_pointwise_acc(poly *r, const polyvec *a, const polyvec *b);
 void polyvec_nega_mac(poly *r, const polyvec *a, const polyvec *b, int neg);
+void polyvec_nega_mac_batch(poly *r, const polyvec *a, const polyvec *b, int neg, size_t n);
 
 void polyvec_add(polyvec *r, const polyvec *a, const polyvec *b);
 
@@ -1,9 +1,39 @@
 #ifndef INDCPA_H
 #define INDCPA_H
 
+#include <stddef.h>
+#include "params.h"
+#include "poly.h"
+#include "polyvec.h"
+
+/* intermediates of indcpa_enc_nontt, in the order they are computed */
+typedef struct {
+  polyvec r;                              /* noise vector r */
+  polyvec e1;                             /* noise vector e1 */
+  poly e2;                                /* noise polynomial e2 */
+  polyvec u;                              /* u = A^T r + e1 */
+  poly vmac;                              /* t^T r + e2 */
+  poly msg;                               /* message polynomial */
+  poly v;                                 /* v = t^T r + e2 + msg */
+  unsigned char c[KYBER_INDCPA_BYTES];    /* compressed u || compressed v */
+} indcpa_enc_trace;
+
+/* intermediates of indcpa_dec_nontt */
+typedef struct {
+  polyvec u;                              /* decompressed u */
+  poly v;                                 /* decompressed v */
+  polyvec s;                              /* time-domain secret-key vector */
+  poly mp;                                /* v - s^T u, input of poly_tomsg */
+  unsigned char m[KYBER_INDCPA_MSGBYTES]; /* decrypted message */
+} indcpa_dec_trace;
+
 void indcpa_keypair(unsigned char *pk,
                     unsigned char *sk);
 
+void indcpa_keypair_from_seed(unsigned char *pk,
+                              unsigned char *sk,
+                              const unsigned char *seed);
+
 void indcpa_enc(unsigned char *c,
                 const unsigned char *m,
                 const unsigned char *pk,
@@ -13,4 +43,47 @@ void indcpa_dec(unsigned char *m,
                 const unsigned char *c,
                 const unsigned char *sk);
 
+void indcpa_enc_nontt(unsigned char *c,
+                      const unsigned char *m,
+                      const unsigned char *pk_at_bytes,
+                      const unsigned char *coins);
+
+void indcpa_dec_nontt(unsigned char *m,
+                      const unsigned char *c,
+                      const unsigned char *rsk);
+
+void indcpa_enc_nontt_traced(unsigned char *c,
+                             const unsigned char *m,
+                             const unsigned char *pk_at_bytes,
+                             const unsigned char *coins,
+                             indcpa_enc_trace *t);
+
+void indcpa_dec_nontt_traced(unsigned char *m,
+                             const unsigned char *c,
+                             const unsigned char *rsk,
+                             indcpa_dec_trace *t);
+
+void repack_sk_nontt(unsigned char *rsk,
+                     const unsigned char *sk);
+
+void repack_at_pk(unsigned char *pk_at_bytes,
+                  const unsigned char *pk);
+
+void indcpa_keypair_batch(unsigned char *pk,
+                          unsigned char *sk,
+                          size_t n);
+
+void indcpa_enc_batch(unsigned char *c,
+                      const unsigned char *m,
+                      const unsigned char *pk,
+                      size_t pk_stride,
+                      const unsigned char *coins,
+                      size_t n);
+
+void indcpa_dec_batch(unsigned char *m,
+                      const unsigned char *c,
+                      const unsigned char *sk,
+                      size_t sk_stride,
+                      size_t n);
+
 #endif
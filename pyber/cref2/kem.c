@@ -98,3 +98,55 @@ int crypto_kem_dec(unsigned char *ss, const unsigned char *ct, const unsigned ch
   kdf(ss, kr, 2*KYBER_SYMBYTES);                                           /* hash concatenation of pre-k and H(c) to k */
   return 0;
 }
+
+/*************************************************
+* Name:        crypto_kem_keypair_batch
+*
+* Description: Generates n key pairs in a single call
+*
+* Arguments:   - unsigned char *pk: pointer to output public keys (of length n * CRYPTO_PUBLICKEYBYTES bytes)
+*              - unsigned char *sk: pointer to output private keys (of length n * CRYPTO_SECRETKEYBYTES bytes)
+*              - size_t n:          number of key pairs
+**************************************************/
+void crypto_kem_keypair_batch(unsigned char *pk, unsigned char *sk, size_t n)
+{
+  size_t i;
+  for(i=0;i<n;i++)
+    crypto_kem_keypair(pk + i*CRYPTO_PUBLICKEYBYTES, sk + i*CRYPTO_SECRETKEYBYTES);
+}
+
+/*************************************************
+* Name:        crypto_kem_enc_batch
+*
+* Description: Encapsulates n shared secrets in a single call
+*
+* Arguments:   - unsigned char *ct:       pointer to output cipher texts (of length n * CRYPTO_CIPHERTEXTBYTES bytes)
+*              - unsigned char *ss:       pointer to output shared secrets (of length n * CRYPTO_BYTES bytes)
+*              - const unsigned char *pk: pointer to input public key(s)
+*              - size_t pk_stride:        distance in bytes between consecutive public keys; 0 uses the same key for all
+*              - size_t n:                number of encapsulations
+**************************************************/
+void crypto_kem_enc_batch(unsigned char *ct, unsigned char *ss, const unsigned char *pk, size_t pk_stride, size_t n)
+{
+  size_t i;
+  for(i=0;i<n;i++)
+    crypto_kem_enc(ct + i*CRYPTO_CIPHERTEXTBYTES, ss + i*CRYPTO_BYTES, pk + i*pk_stride);
+}
+
+/*************************************************
+* Name:        crypto_kem_dec_batch
+*
+* Description: Decapsulates n cipher texts in a single call
+*
+* Arguments:   - unsigned char *ss:       pointer to output shared secrets (of length n * CRYPTO_BYTES bytes)
+*              - const unsigned char *ct: pointer to input cipher texts (of length n * CRYPTO_CIPHERTEXTBYTES bytes)
+*              - const unsigned char *sk: pointer to input private key(s)
+*              - size_t sk_stride:        distance in bytes between consecutive private keys; 0 uses the same key for all
+*              - size_t n:                number of decapsulations
+**************************************************/
+void crypto_kem_dec_batch(unsigned char *ss, const unsigned char *ct, const unsigned char *sk, size_t sk_stride, size_t n)
+{
+  size_t i;
+  for(i=0;i<n;i++)
+    crypto_kem_dec(ss + i*CRYPTO_BYTES, ct + i*CRYPTO_CIPHERTEXTBYTES, sk + i*sk_stride);
+}
@@ -316,4 +316,22 @@ void polyvec_nega_mac(poly *r, const polyvec *a, const polyvec *b, int neg) {
 
   //   printf("\n--- r (out): --- \n");
   //   poly_print(r);
-}
\ No newline at end of file
+}
+
+/*************************************************
+* Name:        polyvec_nega_mac_batch
+*
+* Description: polyvec_nega_mac over n independent (r, a, b) triples
+*
+* Arguments:   - poly *r:          pointer to n in/output polynomials
+*              - const polyvec *a: pointer to n input vectors of polynomials
+*              - const polyvec *b: pointer to n input vectors of polynomials
+*              - int neg:          subtract instead of add, as in polyvec_nega_mac
+*              - size_t n:         number of triples
+**************************************************/
+void polyvec_nega_mac_batch(poly *r, const polyvec *a, const polyvec *b, int neg, size_t n)
+{
+  size_t i;
+  for(i=0;i<n;i++)
+    polyvec_nega_mac(&r[i], &a[i], &b[i], neg);
+}
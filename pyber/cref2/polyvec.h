@@ -1,6 +1,7 @@
 #ifndef POLYVEC_H
 #define POLYVEC_H
 
+#include <stddef.h>
 #include "params.h"
 #include "poly.h"
 
@@ -32,5 +33,6 @@ void polyvec_dump(const polyvec *pv);
 
 void polyvec_freeze(polyvec *skpv);
 void polyvec_nega_mac(poly *r, const polyvec *a, const polyvec *b, int neg);
+void polyvec_nega_mac_batch(poly *r, const polyvec *a, const polyvec *b, int neg, size_t n);
 
 #endif
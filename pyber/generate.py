@@ -0,0 +1,147 @@
+"""
+    Parallel generation of golden-vector stores
+
+    Produces the same store file as `vectors.create`, with the vectors encrypted by a pool of worker processes. The
+    parent writes the header and key records and preallocates the file; the vector index range is then cut into
+    shards of `chunk` vectors and every worker encrypts its shards straight into their own disjoint region of a shared
+    mmap of the file. A record depends only on (round, K, seed, index) and the C model holds no state between calls,
+    so the file is byte-identical for any number of workers and any shard size.
+
+        store = generate.open_or_generate('cpa_vectors.bin', pyber2, seed=0, n_vectors=10**6, workers=16)
+
+        python generate.py --round 2 -k 3 -n 1000000 --workers 16 cpa_vectors_r2_k3.bin
+"""
+import argparse
+import mmap
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+try:
+    from . import load, vectors
+except ImportError:
+    import vectors
+    from pyber import load
+
+# state of a worker process, set once by _init_worker
+_worker = {}
+
+
+def _records(mm, model, n_keys, n_vectors) -> np.ndarray:
+    """ writable (n_vectors, vector record bytes) view of the vector region of a mapped store """
+    sizes = vectors.field_sizes(model)
+    key_bytes = sum(sizes[name] for name in vectors.KEY_FIELDS)
+    record_bytes = sum(sizes[name] for name in vectors.VECTOR_FIELDS)
+    return np.ndarray(shape=(n_vectors, record_bytes), dtype=np.uint8, buffer=mm,
+                      offset=vectors.HEADER_BYTES + n_keys * key_bytes)
+
+
+def _init_worker(path, round, k, seed, keys, n_vectors):
+    _worker.update(model=load(round, k), path=path, seed=seed, keys=keys, n_vectors=n_vectors)
+
+
+def _fill_shard(start, stop):
+    """ encrypt shard start .. stop - 1 into its region of the file, flushed and unmapped before returning, so the
+        parent renames a file no worker still has mapped
+    """
+    w = _worker
+    with open(w['path'], 'r+b') as f, mmap.mmap(f.fileno(), 0) as mm:
+        records = _records(mm, w['model'], len(w['keys']), w['n_vectors'])
+        vectors.fill_vectors(w['model'], w['seed'], w['keys'], start, records[start:stop])
+        del records
+        mm.flush()
+    return stop - start
+
+
+def shards(n_vectors: int, chunk: int):
+    """ (start, stop) index ranges of `chunk` vectors covering 0 .. n_vectors - 1 """
+    return [(start, min(start + chunk, n_vectors)) for start in range(0, n_vectors, chunk)]
+
+
+def generate(path, model, seed: int, n_vectors: int, n_keys: int = 1, workers: int = None,
+             chunk: int = 4096, progress=None) -> vectors.VectorStore:
+    """ generate the vector set of `model` and `seed` into a new store at `path` using `workers` processes
+
+        workers: number of processes, os.cpu_count() if None; 1 generates in this process
+        chunk: vectors per shard, the unit of work handed to a worker
+        progress: optional callable(done, n_vectors) called as shards complete
+
+        As with `vectors.create`, the file is written to a temporary name and renamed when complete.
+    """
+    assert n_keys >= 1 and n_vectors >= 0 and chunk >= 1
+    if workers is None:
+        workers = os.cpu_count() or 1
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+    keys = vectors.key_records(model, seed, n_keys)
+    parts = shards(n_vectors, chunk)
+    try:
+        with tmp.open('wb') as f:
+            f.write(vectors.header_bytes(model, seed, n_keys, n_vectors))
+            for key in keys:
+                f.write(b''.join(key))
+            f.truncate(vectors.store_bytes(model, n_keys, n_vectors))
+
+        done = 0
+        if workers == 1 or len(parts) <= 1:
+            with tmp.open('r+b') as f, mmap.mmap(f.fileno(), 0) as mm:
+                records = _records(mm, model, n_keys, n_vectors)
+                for start, stop in parts:
+                    vectors.fill_vectors(model, seed, keys, start, records[start:stop])
+                    done += stop - start
+                    if progress:
+                        progress(done, n_vectors)
+                del records
+        else:
+            initargs = (str(tmp), model.NIST_ROUND, model.KYBER_K, seed, keys, n_vectors)
+            with ProcessPoolExecutor(min(workers, len(parts)), initializer=_init_worker, initargs=initargs) as pool:
+                for n in pool.map(_fill_shard, *zip(*parts)):
+                    done += n
+                    if progress:
+                        progress(done, n_vectors)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return vectors.VectorStore(path)
+
+
+def open_or_generate(path, model, seed: int, n_vectors: int, n_keys: int = 1, workers: int = None,
+                     chunk: int = 4096) -> vectors.VectorStore:
+    """ open the store at `path`, (re)generating it in parallel first if it does not hold the requested vector set """
+    store = vectors.open_matching(path, model, seed, n_vectors, n_keys)
+    if store is not None:
+        return store
+    return generate(path, model, seed, n_vectors, n_keys, workers, chunk)
+
+
+__all__ = ['generate', 'open_or_generate', 'shards']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Parallel generation of pyber golden-vector stores')
+    parser.add_argument('path', help='store file to write')
+    parser.add_argument('--round', type=int, default=1, help='NIST round of the model')
+    parser.add_argument('-k', type=int, default=3, help='KYBER_K of the model')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the vector set')
+    parser.add_argument('-n', '--vectors', type=int, default=10000, help='number of vectors')
+    parser.add_argument('--keys', type=int, default=1, help='number of keys, vector i uses key i %% keys')
+    parser.add_argument('--workers', type=int, help='worker processes (default: all cores)')
+    parser.add_argument('--chunk', type=int, default=4096, help='vectors per shard')
+    args = parser.parse_args(argv)
+
+    model = load(args.round, args.k)
+    t0 = time.perf_counter()
+    with generate(args.path, model, args.seed, args.vectors, args.keys, args.workers, args.chunk) as store:
+        dt = time.perf_counter() - t0
+        print(f"{store}: {dt:.2f} s, {store.n_vectors / dt if dt else 0:.0f} vectors/s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
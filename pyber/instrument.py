@@ -0,0 +1,107 @@
+"""
+    Opt-in instrumentation of the pyber wrappers
+
+    Off by default: a wrapper then costs a single flag test on top of the call. Enable it with the PYBER_TRACE
+    environment variable or, for a block of code, with the `tracing` context manager:
+
+        PYBER_TRACE=1   count calls, cumulative time and bytes produced per function, read through `pyber.stats()`
+        PYBER_TRACE=2   also log every call and its diagnostics (expanded keys, noise inputs, ...) on the
+                        'pyber' logger at DEBUG level
+
+        with pyber.tracing():
+            ...
+        print(pyber.stats())
+"""
+import contextlib
+import functools
+import logging
+import os
+import time
+from collections import namedtuple
+
+COUNT = 1
+LOG = 2
+
+level = int(os.getenv('PYBER_TRACE', '0') or 0)
+
+log = logging.getLogger('pyber')
+
+Stat = namedtuple('Stat', 'calls seconds nbytes')
+
+_stats = {}  # name -> [calls, seconds, nbytes]
+
+
+def enable(lvl: int = COUNT):
+    global level
+    level = lvl
+
+
+def disable():
+    enable(0)
+
+
+@contextlib.contextmanager
+def tracing(lvl: int = COUNT):
+    """ enable the instrumentation at `lvl` (COUNT or LOG) for the duration of the block """
+    global level
+    saved = level
+    level = lvl
+    try:
+        yield
+    finally:
+        level = saved
+
+
+def stats(prefix: str = '') -> dict:
+    """ Stat(calls, seconds, nbytes) of every instrumented function called since the last reset, by name """
+    return {name: Stat(*s) for name, s in sorted(_stats.items()) if name.startswith(prefix)}
+
+
+def reset():
+    _stats.clear()
+
+
+def nbytes(obj) -> int:
+    """ size in bytes of a wrapper result: buffers, Polynomials/PolynomialVectors, lists of bytes and tuples of those """
+    if isinstance(obj, tuple):
+        return sum(nbytes(o) for o in obj)
+    if isinstance(obj, list):
+        return len(obj)
+    coeffs = getattr(obj, 'coeffs', None)
+    if coeffs is not None:
+        return coeffs.nbytes
+    try:
+        return memoryview(obj).nbytes
+    except TypeError:
+        return 0
+
+
+def instrumented(prefix: str):
+    """ decorator counting the calls of a function as '<prefix>.<name>' while the instrumentation is enabled """
+    def decorator(fn):
+        name = f"{prefix}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not level:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            result = fn(*args, **kwargs)
+            dt = time.perf_counter() - t0
+            n = nbytes(result)
+            s = _stats.get(name)
+            if s is None:
+                s = _stats[name] = [0, 0.0, 0]
+            s[0] += 1
+            s[1] += dt
+            s[2] += n
+            if level >= LOG:
+                log.debug("%s: %.1f us, %d bytes", name, dt * 1e6, n)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+__all__ = ['tracing', 'stats', 'reset', 'enable', 'disable', 'instrumented', 'Stat', 'COUNT', 'LOG']
@@ -0,0 +1,368 @@
+"""
+    Pure-numpy reference implementation of the Kyber arithmetic used by pyber.
+
+    Works on whole batches of polynomials: polynomials are arrays shaped (..., KYBER_N), polynomial vectors
+    (..., KYBER_K, KYBER_N) and byte strings (..., nbytes) of uint8. Leading dimensions are broadcast.
+
+    Does not need the compiled _pyber/_pyber2 extensions, so it can generate expected values on machines
+    without a C toolchain and doubles as a differential oracle for the C reference (see `crosscheck`).
+    Get one through `pyber.load(round, k, backend='numpy')`.
+
+    Outputs of the packing/sampling functions (compress/decompress, cbd, frommsg/tomsg, tobytes/frombytes)
+    are bit-exact with the C model. The NTT here is the plain (non-Montgomery) transform mod q, reduced to [0, q):
+    `ntt` equals poly_ntt of the C model mod q, and `invntt` equals poly_invntt mod q in round 1, while in round 2
+    poly_invntt leaves its result in the Montgomery domain (times 2^16 mod q). `crosscheck` verifies all of these.
+"""
+import numpy as np
+
+
+# (round, K) -> (KYBER_Q, KYBER_ETA, POLY bits, POLYCOMPRESSED bits, POLYVECCOMPRESSED bits)
+PARAMS = {
+    (1, 2): (7681, 5, 13, 3, 11),
+    (1, 3): (7681, 4, 13, 3, 11),
+    (1, 4): (7681, 3, 13, 3, 11),
+    (2, 2): (3329, 2, 12, 3, 10),
+    (2, 3): (3329, 2, 12, 4, 10),
+    (2, 4): (3329, 2, 12, 5, 11),
+}
+
+
+def _bit_reverse(x, bits):
+    return int(format(x, f'0{bits}b')[::-1], 2)
+
+
+def _root_of_unity(q, order):
+    """ smallest element of Z_q of multiplicative order `order` """
+    for g in range(2, q):
+        if pow(g, order, q) == 1 and all(pow(g, order // p, q) != 1 for p in {2, 3, 5, 7} if order % p == 0):
+            return g
+    raise ValueError(f"no element of order {order} mod {q}")
+
+
+def pack_bits(a, bits):
+    """ pack the `bits` low bits of each element of `a` (..., n) into a little-endian bit stream (..., n * bits // 8) """
+    a = np.asarray(a, dtype=np.int64)
+    b = ((a[..., None] >> np.arange(bits)) & 1).astype(np.uint8)
+    b = b.reshape(a.shape[:-1] + (a.shape[-1] * bits,))
+    return np.packbits(b, axis=-1, bitorder='little')
+
+
+def unpack_bits(buf, bits, n):
+    """ inverse of pack_bits: read `n` values of `bits` bits each from the little-endian bit stream `buf` (..., nbytes) """
+    buf = np.asarray(buf, dtype=np.uint8)
+    b = np.unpackbits(buf, axis=-1, bitorder='little')[..., :n * bits]
+    b = b.reshape(buf.shape[:-1] + (n, bits)).astype(np.int64)
+    return b @ (1 << np.arange(bits, dtype=np.int64))
+
+
+def _as_bytes(buf, nbytes):
+    """ bytes-like or uint8 array of trailing dimension `nbytes` -> uint8 ndarray """
+    if isinstance(buf, (bytes, bytearray, memoryview)):
+        buf = np.frombuffer(buf, dtype=np.uint8)
+    buf = np.asarray(buf, dtype=np.uint8)
+    if buf.ndim == 1 and buf.shape[0] != nbytes:
+        assert buf.shape[0] % nbytes == 0, f"length of buffer should be a multiple of {nbytes} bytes but was {buf.shape[0]}"
+        buf = buf.reshape(-1, nbytes)
+    assert buf.shape[-1] == nbytes, f"trailing dimension should be {nbytes} bytes but was {buf.shape[-1]}"
+    return buf
+
+
+class NumpyBackend():
+    KYBER_N = 256
+    KYBER_SYMBYTES = 32
+    KYBER_INDCPA_MSGBYTES = KYBER_SYMBYTES
+
+    def __init__(self, round=1, k=3):
+        assert (round, k) in PARAMS, f"unsupported parameter set: round={round} K={k}"
+        q, eta, poly_bits, pc_bits, pvc_bits = PARAMS[(round, k)]
+        n = self.KYBER_N
+
+        self.round = round
+        self.KYBER_K = k
+        self.KYBER_Q = q
+        self.KYBER_ETA = eta
+        self.COEFF_DTYPE = np.uint16 if round == 1 else np.int16
+        self.poly_bits = poly_bits
+        self.poly_compressed_bits = pc_bits
+        self.polyvec_compressed_bits = pvc_bits
+        self.KYBER_POLYBYTES = n * poly_bits // 8
+        self.KYBER_POLYVECBYTES = k * self.KYBER_POLYBYTES
+        self.KYBER_POLYCOMPRESSEDBYTES = n * pc_bits // 8
+        self.KYBER_POLYVECCOMPRESSEDBYTES = k * n * pvc_bits // 8
+        self.KYBER_CIPHERTEXTBYTES = self.KYBER_POLYVECCOMPRESSEDBYTES + self.KYBER_POLYCOMPRESSEDBYTES
+
+        # round 1 (q = 1 mod 2n) has a complete NTT down to linear factors; round 2 (q = 1 mod n) stops at
+        # 128 quadratic factors X^2 - zeta and multiplies those pairwise in basemul
+        if (q - 1) % (2 * n) == 0:
+            self.ntt_min_len = 1
+            psi = _root_of_unity(q, 2 * n)
+            levels = 8
+        else:
+            self.ntt_min_len = 2
+            psi = _root_of_unity(q, n)
+            levels = 7
+        self.zetas = np.array([pow(psi, _bit_reverse(i, levels), q) for i in range(1 << levels)], dtype=np.int64)
+        self.zetas_inv = np.array([pow(int(z), q - 2, q) for z in self.zetas], dtype=np.int64)
+        self.inv2 = (q + 1) // 2
+        if self.ntt_min_len == 2:
+            # X^2 - zeta factor of each coefficient pair, in the order poly_basemul walks them
+            z = self.zetas[n // 4:]
+            self.basemul_zetas = np.stack([z, q - z], axis=-1).reshape(-1)
+
+    def __repr__(self):
+        return f"NumpyBackend(round={self.round}, k={self.KYBER_K})"
+
+    def _canon(self, a):
+        """ int64 copy of `a` reduced to [0, q) """
+        return np.asarray(a, dtype=np.int64) % self.KYBER_Q
+
+    def _out(self, a):
+        return a.astype(self.COEFF_DTYPE)
+
+    ###############################################################################################
+    # NTT
+    ###############################################################################################
+    def _stages(self):
+        n = self.KYBER_N
+        k = 1
+        length = n // 2
+        while length >= self.ntt_min_len:
+            groups = n // (2 * length)
+            yield length, k, groups
+            k += groups
+            length //= 2
+
+    def ntt(self, a):
+        """ forward negacyclic NTT (bit-reversed output) of polynomials `a` (..., N); canonical int64 output """
+        q = self.KYBER_Q
+        r = self._canon(a)
+        shape = r.shape
+        for length, k, groups in self._stages():
+            r = r.reshape(shape[:-1] + (groups, 2, length))
+            zeta = self.zetas[k:k + groups, None]
+            t = r[..., 1, :] * zeta % q
+            lo = r[..., 0, :]
+            r = np.stack([(lo + t) % q, (lo - t) % q], axis=-2)
+        return r.reshape(shape)
+
+    def invntt(self, a):
+        """ inverse of `ntt` """
+        q = self.KYBER_Q
+        r = self._canon(a)
+        shape = r.shape
+        for length, k, groups in reversed(list(self._stages())):
+            r = r.reshape(shape[:-1] + (groups, 2, length))
+            zeta_inv = self.zetas_inv[k:k + groups, None]
+            lo, hi = r[..., 0, :], r[..., 1, :]
+            r = np.stack([(lo + hi) * self.inv2 % q, (lo - hi) * self.inv2 % q * zeta_inv % q], axis=-2)
+        return r.reshape(shape)
+
+    def basemul(self, a_hat, b_hat):
+        """ product of two polynomials in the NTT domain """
+        q = self.KYBER_Q
+        a_hat = self._canon(a_hat)
+        b_hat = self._canon(b_hat)
+        if self.ntt_min_len == 1:
+            return a_hat * b_hat % q
+        a0, a1 = a_hat[..., 0::2], a_hat[..., 1::2]
+        b0, b1 = b_hat[..., 0::2], b_hat[..., 1::2]
+        r0 = (a0 * b0 + a1 * b1 % q * self.basemul_zetas) % q
+        r1 = (a0 * b1 + a1 * b0) % q
+        return np.stack([r0, r1], axis=-1).reshape(np.broadcast_shapes(a_hat.shape, b_hat.shape))
+
+    def polyvec_pointwise_acc(self, a_hat, b_hat):
+        """ inner product of two polynomial vectors (..., K, N) in the NTT domain """
+        return self.basemul(a_hat, b_hat).sum(axis=-2) % self.KYBER_Q
+
+    def poly_mul(self, a, b):
+        """ a * b in Z_q[X]/(X^N + 1) through the NTT """
+        return self._out(self.invntt(self.basemul(self.ntt(a), self.ntt(b))))
+
+    def polyvec_mul(self, a, b):
+        """ inner product of two polynomial vectors (..., K, N) through the NTT """
+        return self._out(self.invntt(self.polyvec_pointwise_acc(self.ntt(a), self.ntt(b))))
+
+    ###############################################################################################
+    # schoolbook
+    ###############################################################################################
+    def polyvec_nega_mac(self, r, a, b, subtract=False):
+        """ schoolbook negacyclic MAC, same as polyvec_nega_mac in the C model:
+
+            @returns: (r - a * b) if subtract else (r + a * b), a and b are (..., K, N), r is (..., N)
+        """
+        q = self.KYBER_Q
+        a = self._canon(a)
+        b = self._canon(b)
+        acc = np.zeros(np.broadcast_shapes(a.shape, b.shape), dtype=np.int64)
+        shifted = a.copy()  # X^j * a
+        for j in range(self.KYBER_N):
+            acc += shifted * b[..., j:j + 1]
+            shifted = np.roll(shifted, 1, axis=-1)
+            shifted[..., 0] *= -1
+        prod = acc.sum(axis=-2)
+        r = self._canon(r)
+        return self._out((r - prod if subtract else r + prod) % q)
+
+    ###############################################################################################
+    # (de)serialization, compression, sampling
+    ###############################################################################################
+    def _compress(self, a, bits):
+        q = self.KYBER_Q
+        return ((self._canon(a) << bits) + q // 2) // q & ((1 << bits) - 1)
+
+    def _decompress(self, t, bits):
+        return self._out((t * self.KYBER_Q + (1 << (bits - 1))) >> bits)
+
+    def poly_compress(self, a):
+        """ (..., N) -> (..., KYBER_POLYCOMPRESSEDBYTES) uint8 """
+        return pack_bits(self._compress(a, self.poly_compressed_bits), self.poly_compressed_bits)
+
+    def poly_decompress(self, buf):
+        """ (..., KYBER_POLYCOMPRESSEDBYTES) -> (..., N) """
+        buf = _as_bytes(buf, self.KYBER_POLYCOMPRESSEDBYTES)
+        bits = self.poly_compressed_bits
+        return self._decompress(unpack_bits(buf, bits, self.KYBER_N), bits)
+
+    def polyvec_compress(self, a):
+        """ (..., K, N) -> (..., KYBER_POLYVECCOMPRESSEDBYTES) uint8 """
+        bits = self.polyvec_compressed_bits
+        t = self._compress(a, bits)
+        return pack_bits(t.reshape(t.shape[:-2] + (-1,)), bits)
+
+    def polyvec_decompress(self, buf):
+        """ (..., KYBER_POLYVECCOMPRESSEDBYTES) -> (..., K, N) """
+        buf = _as_bytes(buf, self.KYBER_POLYVECCOMPRESSEDBYTES)
+        bits = self.polyvec_compressed_bits
+        t = unpack_bits(buf, bits, self.KYBER_K * self.KYBER_N)
+        return self._decompress(t.reshape(t.shape[:-1] + (self.KYBER_K, self.KYBER_N)), bits)
+
+    def poly_tobytes(self, a):
+        """ (..., N) -> (..., KYBER_POLYBYTES) uint8 """
+        return pack_bits(self._canon(a), self.poly_bits)
+
+    def poly_frombytes(self, buf):
+        """ (..., KYBER_POLYBYTES) -> (..., N) """
+        buf = _as_bytes(buf, self.KYBER_POLYBYTES)
+        return self._out(unpack_bits(buf, self.poly_bits, self.KYBER_N))
+
+    def polyvec_tobytes(self, a):
+        """ (..., K, N) -> (..., KYBER_POLYVECBYTES) uint8 """
+        t = self.poly_tobytes(a)
+        return t.reshape(t.shape[:-2] + (-1,))
+
+    def polyvec_frombytes(self, buf):
+        """ (..., KYBER_POLYVECBYTES) -> (..., K, N) """
+        buf = _as_bytes(buf, self.KYBER_POLYVECBYTES)
+        return self.poly_frombytes(buf.reshape(buf.shape[:-1] + (self.KYBER_K, self.KYBER_POLYBYTES)))
+
+    def poly_frommsg(self, msg):
+        """ (..., KYBER_INDCPA_MSGBYTES) -> (..., N) """
+        msg = _as_bytes(msg, self.KYBER_INDCPA_MSGBYTES)
+        bits = unpack_bits(msg, 1, self.KYBER_N)
+        return self._out(bits * ((self.KYBER_Q + 1) // 2))
+
+    def poly_tomsg(self, a):
+        """ (..., N) -> (..., KYBER_INDCPA_MSGBYTES) uint8 """
+        return pack_bits(self._compress(a, 1), 1)
+
+    def cbd(self, buf):
+        """ centered binomial sample of (..., KYBER_ETA * N / 4) noise bytes, in the C model's representation """
+        eta = self.KYBER_ETA
+        buf = _as_bytes(buf, eta * self.KYBER_N // 4)
+        bits = unpack_bits(buf, 1, 2 * eta * self.KYBER_N).reshape(buf.shape[:-1] + (self.KYBER_N, 2, eta))
+        s = bits.sum(axis=-1)
+        a, b = s[..., 0], s[..., 1]
+        if self.round == 1:
+            return self._out(a + self.KYBER_Q - b)
+        return self._out(a - b)
+
+
+def crosscheck(round=1, k=3, batch=16, seed=1):
+    """ differential test of NumpyBackend against the compiled C model of the same round """
+    import random
+    import pyber
+    model = pyber.load(round, k)
+
+    be = NumpyBackend(round, k)
+    rnd = random.Random(seed)
+    rng = np.random.default_rng(seed)
+    q, n = be.KYBER_Q, be.KYBER_N
+
+    for _ in range(batch):
+        a = model.PolynomialVector.random(rnd)
+        b = model.PolynomialVector.random(rnd)
+        v = model.Polynomial.random(rnd)
+        assert np.array_equal(be.polyvec_mul(a.coeffs, b.coeffs) % q, np.asarray(list(a * b)) % q), "polyvec_mul"
+        for subtract in (False, True):
+            exp = model.polyvec_nega_mac(v, a, b, subtract=subtract)
+            assert np.array_equal(be.polyvec_nega_mac(v.coeffs, a.coeffs, b.coeffs, subtract), exp.coeffs), "polyvec_nega_mac"
+
+    a = rng.integers(0, q, size=(batch, be.KYBER_K, n))
+    b = rng.integers(0, q, size=(batch, be.KYBER_K, n))
+    v = rng.integers(0, q, size=(batch, n))
+    for subtract in (False, True):
+        exp = model.polyvec_nega_mac_batch(v, a, b, subtract)
+        assert np.array_equal(be.polyvec_nega_mac(v, a, b, subtract), exp), "polyvec_nega_mac_batch"
+
+    buf = rng.integers(0, 256, size=(batch, be.KYBER_POLYCOMPRESSEDBYTES), dtype=np.uint8)
+    exp = np.stack([model.poly_decompress(bytes(x)).coeffs for x in buf])
+    assert np.array_equal(be.poly_decompress(buf), exp), "poly_decompress"
+
+    buf = rng.integers(0, 256, size=(batch, be.KYBER_POLYVECCOMPRESSEDBYTES), dtype=np.uint8)
+    exp = np.stack([model.polyvec_decompress(bytes(x)).coeffs for x in buf])
+    assert np.array_equal(be.polyvec_decompress(buf), exp), "polyvec_decompress"
+
+    buf = rng.integers(0, 256, size=(batch, be.KYBER_ETA * n // 4), dtype=np.uint8)
+    exp = np.stack([model.Polynomial.cbd(x.tolist()).coeffs for x in buf])
+    assert np.array_equal(be.cbd(buf), exp), "cbd"
+
+    a = rng.integers(0, q, size=(batch, n))
+    for x, m in zip(a, be.poly_tomsg(a)):
+        cpoly = model.Polynomial(x).to_cpoly()
+        cmsg = model.ffi.new(f'unsigned char [{be.KYBER_INDCPA_MSGBYTES}]')
+        model.pyber_clib.poly_tomsg(cmsg, cpoly)
+        assert bytes(m) == bytes(cmsg), "poly_tomsg"
+        cpoly = model.Polynomial.zero().to_cpoly()
+        model.pyber_clib.poly_frommsg(cpoly, cmsg)
+        assert np.array_equal(be.poly_frommsg(m), np.frombuffer(model.ffi.buffer(cpoly.coeffs), dtype=be.COEFF_DTYPE)), "poly_frommsg"
+
+    # round 2 poly_invntt leaves its result multiplied by the Montgomery factor 2^16
+    mont = 1 if round == 1 else (1 << 16) % q
+    for x in a:
+        for name, fn, scale in (('poly_ntt', be.ntt, 1), ('poly_invntt', be.invntt, mont)):
+            cpoly = model.Polynomial(x).to_cpoly()
+            getattr(model.pyber_clib, name)(cpoly)
+            c = np.frombuffer(model.ffi.buffer(cpoly.coeffs), dtype=be.COEFF_DTYPE).astype(np.int64) % q
+            assert np.array_equal(fn(x) * scale % q, c), name
+
+        cbuf = model.ffi.new(f'unsigned char [{be.KYBER_POLYCOMPRESSEDBYTES}]')
+        model.pyber_clib.poly_compress(cbuf, model.Polynomial(x).to_cpoly())
+        assert bytes(be.poly_compress(x)) == bytes(cbuf), "poly_compress"
+        cbuf = model.ffi.new(f'unsigned char [{be.KYBER_POLYBYTES}]')
+        model.pyber_clib.poly_tobytes(cbuf, model.Polynomial(x).to_cpoly())
+        assert bytes(be.poly_tobytes(x)) == bytes(cbuf), "poly_tobytes"
+
+    def cpolyvec(x):
+        return model.PolynomialVector([model.Polynomial(row) for row in x]).to_cpolyvec()
+
+    a = rng.integers(0, q, size=(batch, be.KYBER_K, n))
+    for x in a:
+        cpv = cpolyvec(x)
+        model.pyber_clib.polyvec_ntt(cpv)
+        c = np.frombuffer(model.ffi.buffer(cpv), dtype=be.COEFF_DTYPE).reshape(x.shape).astype(np.int64) % q
+        assert np.array_equal(be.ntt(x), c), "polyvec_ntt"
+
+        cbuf = model.ffi.new(f'unsigned char [{be.KYBER_POLYVECCOMPRESSEDBYTES}]')
+        model.pyber_clib.polyvec_compress(cbuf, cpolyvec(x))
+        assert bytes(be.polyvec_compress(x)) == bytes(cbuf), "polyvec_compress"
+        cbuf = model.ffi.new(f'unsigned char [{be.KYBER_POLYVECBYTES}]')
+        model.pyber_clib.polyvec_tobytes(cbuf, cpolyvec(x))
+        assert bytes(be.polyvec_tobytes(x)) == bytes(cbuf), "polyvec_tobytes"
+
+    print(f"{be}: all checks passed")
+
+
+if __name__ == '__main__':
+    import sys
+    args = [int(x) for x in sys.argv[1:]]
+    crosscheck(*args)
@@ -0,0 +1,142 @@
+"""
+    Streaming pipeline for writing test vectors: source -> (self-check) -> formatter -> file
+
+    Vectors travel in batches of `chunk` records, each field a (n, size) uint8 array, and every formatter encodes a
+    whole batch with one hexlify call, so memory stays at a few chunks for runs of any length and the files are
+    written in large blocks:
+
+        batches = pipeline.store_batches(store, 0, n)                 # or pipeline.model_batches(model, seed, 0, n)
+        batches = pipeline.self_check(batches, model, [store[0].sk])  # optional: decrypt(ct) == msg
+        pipeline.run(batches, [('pdi.fobos.txt', 'ct', 'fobos'), ('exp.txt', 'msg', 'fobos')])
+
+    Formats:
+        fobos   one record per line, lowercase hex (FOBOS pdi/sdi files)
+        bytes   one byte per line, lowercase hex (the `*.in.txt` files of the GHDL testbenches)
+        raw     the records back to back, binary
+"""
+import binascii
+import itertools
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    from . import vectors
+except ImportError:
+    import vectors
+
+Batch = namedtuple('Batch', ('start',) + vectors.VECTOR_FIELDS)
+
+BUFFER_BYTES = 1 << 20
+
+
+def _hex(records: np.ndarray) -> np.ndarray:
+    """ (n, 2 * size) uint8 array of the lowercase hex digits of a (n, size) uint8 array """
+    digits = binascii.hexlify(np.ascontiguousarray(records))
+    return np.frombuffer(digits, dtype=np.uint8).reshape(len(records), 2 * records.shape[1])
+
+
+def fobos_lines(records: np.ndarray) -> np.ndarray:
+    out = np.empty((len(records), 2 * records.shape[1] + 1), dtype=np.uint8)
+    out[:, :-1] = _hex(records)
+    out[:, -1] = ord('\n')
+    return out
+
+
+def byte_lines(records: np.ndarray) -> np.ndarray:
+    out = np.empty((records.size, 3), dtype=np.uint8)
+    out[:, :2] = _hex(records.reshape(-1, 1))
+    out[:, 2] = ord('\n')
+    return out
+
+
+def raw(records: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(records)
+
+
+FORMATS = {'fobos': fobos_lines, 'bytes': byte_lines, 'raw': raw}
+
+
+def encode(fmt: str, records) -> np.ndarray:
+    """ `records` (a (n, size) uint8 array, or one bytes-like record) in format `fmt`, as a uint8 array """
+    if not isinstance(records, np.ndarray):
+        records = np.frombuffer(records, dtype=np.uint8).reshape(1, -1)
+    try:
+        formatter = FORMATS[fmt]
+    except KeyError:
+        raise ValueError(f"unknown format '{fmt}', should be one of {sorted(FORMATS)}") from None
+    return formatter(records)
+
+
+def store_batches(store, start: int = 0, stop: int = None, chunk: int = 4096):
+    """ Batches of vectors start .. stop - 1 of a VectorStore, as zero-copy views of its mmap """
+    stop = len(store) if stop is None else min(stop, len(store))
+    columns = {name: store.column(name) for name in vectors.VECTOR_FIELDS}
+    for s in range(start, stop, chunk):
+        e = min(s + chunk, stop)
+        yield Batch(s, *(columns[name][s:e] for name in vectors.VECTOR_FIELDS))
+
+
+def model_batches(model, seed: int, start: int = 0, stop: int = None, n_keys: int = 1, chunk: int = 4096, keys=None):
+    """ Batches of the vector set of `model` and `seed` generated on the fly, without a store (stop=None: endless)
+
+        Vectors are identical to those of a store of the same set. The arrays of a batch are reused by the next one.
+    """
+    if keys is None:
+        keys = vectors.key_records(model, seed, n_keys)
+    sizes = vectors.field_sizes(model)
+    records = np.empty((chunk, sum(sizes[name] for name in vectors.VECTOR_FIELDS)), dtype=np.uint8)
+    offsets = np.cumsum([0] + [sizes[name] for name in vectors.VECTOR_FIELDS])
+    for s in itertools.count(start, chunk) if stop is None else range(start, stop, chunk):
+        rec = records if stop is None else records[:min(chunk, stop - s)]
+        vectors.fill_vectors(model, seed, keys, s, rec)
+        yield Batch(s, *(rec[:, offsets[i]:offsets[i + 1]] for i in range(len(vectors.VECTOR_FIELDS))))
+
+
+def self_check(batches, model, sks):
+    """ pass `batches` through, checking that every ct decrypts to its msg under sks[index % len(sks)] """
+    n_keys = len(sks)
+    for batch in batches:
+        n = len(batch.ct)
+        key = (batch.start + np.arange(n)) % n_keys
+        for k in range(min(n_keys, n)):
+            rows = np.flatnonzero(key == k)
+            msgs = np.frombuffer(model.indcpa_dec_batch(np.ascontiguousarray(batch.ct[rows]), sks[k]),
+                                 dtype=np.uint8).reshape(len(rows), -1)
+            bad = np.flatnonzero((msgs != batch.msg[rows]).any(axis=1))
+            assert len(bad) == 0, f"self-check: vector {batch.start + rows[bad[0]]} does not decrypt to its msg"
+        yield batch
+
+
+def write_record(path, record, fmt: str):
+    """ write a single record (e.g. the rsk of sdi.in.txt) to `path` in format `fmt` """
+    with open(path, 'wb') as f:
+        f.write(encode(fmt, record))
+
+
+def run(batches, sinks, buffer_bytes: int = BUFFER_BYTES) -> int:
+    """ drain `batches`, writing field `field` of every batch to `path` in format `fmt` for each (path, field, fmt)
+        of `sinks`; returns the number of vectors written
+    """
+    sinks = [(path, field, fmt) for path, field, fmt in sinks]
+    for _, field, fmt in sinks:
+        assert field in vectors.VECTOR_FIELDS, f"unknown field '{field}', should be one of {vectors.VECTOR_FIELDS}"
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown format '{fmt}', should be one of {sorted(FORMATS)}")
+    files = []
+    try:
+        for path, _, _ in sinks:
+            files.append(open(path, 'wb', buffering=buffer_bytes))
+        n = 0
+        for batch in batches:
+            for f, (_, field, fmt) in zip(files, sinks):
+                f.write(encode(fmt, getattr(batch, field)))
+            n += len(batch.ct)
+    finally:
+        for f in files:
+            f.close()
+    return n
+
+
+__all__ = ['Batch', 'FORMATS', 'encode', 'fobos_lines', 'byte_lines', 'raw', 'store_batches', 'model_batches',
+           'self_check', 'write_record', 'run']
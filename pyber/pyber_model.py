@@ -0,0 +1,853 @@
+"""
+    Python model of one Kyber parameter set on top of its cffi extension
+
+    Do not import this module directly: `pyber.load(round, k)` executes it once per extension, with `_ext` (the
+    compiled _pyber* module) and NIST_ROUND already set in its namespace, and caches the result.
+"""
+import random
+import numpy as np
+from collections.abc import Iterable
+from typing import List, Tuple, Iterable as IterableType
+import shutil
+from math import log2, ceil
+import os
+import sys
+import itertools
+import hashlib
+from collections import OrderedDict, namedtuple
+
+try:
+    from . import instrument
+except ImportError:
+    import instrument
+
+ffi = _ext.ffi  # _ext and NIST_ROUND are bound by pyber.load
+pyber_clib = _ext.lib
+
+KYBER_N = pyber_clib.KYBER_N
+KYBER_K = pyber_clib.KYBER_K
+KYBER_Q = pyber_clib.KYBER_Q
+KYBER_ETA = pyber_clib.KYBER_ETA
+KYBER_SYMBYTES = pyber_clib.KYBER_SYMBYTES
+KYBER_POLYBYTES = pyber_clib.KYBER_POLYBYTES
+KYBER_POLYVECBYTES = pyber_clib.KYBER_POLYVECBYTES
+KYBER_POLYCOMPRESSEDBYTES = pyber_clib.KYBER_POLYCOMPRESSEDBYTES
+KYBER_POLYVECCOMPRESSEDBYTES = pyber_clib.KYBER_POLYVECCOMPRESSEDBYTES
+KYBER_INDCPA_MSGBYTES = pyber_clib.KYBER_INDCPA_MSGBYTES
+KYBER_PUBLICKEYBYTES = pyber_clib.KYBER_PUBLICKEYBYTES
+KYBER_CIPHERTEXTBYTES = pyber_clib.KYBER_CIPHERTEXTBYTES
+KYBER_INDCPA_MSGBYTES = pyber_clib.KYBER_INDCPA_MSGBYTES
+KYBER_INDCPA_PUBLICKEYBYTES = pyber_clib.KYBER_INDCPA_PUBLICKEYBYTES
+KYBER_INDCPA_SECRETKEYBYTES = pyber_clib.KYBER_INDCPA_SECRETKEYBYTES
+
+KYBER_PKBYTES = KYBER_POLYVECBYTES * (KYBER_K + 1)
+
+# CCA KEM (kem.c)
+CRYPTO_PUBLICKEYBYTES = pyber_clib.CRYPTO_PUBLICKEYBYTES
+CRYPTO_SECRETKEYBYTES = pyber_clib.CRYPTO_SECRETKEYBYTES
+CRYPTO_CIPHERTEXTBYTES = pyber_clib.CRYPTO_CIPHERTEXTBYTES
+CRYPTO_BYTES = pyber_clib.CRYPTO_BYTES
+
+COEFF_DTYPE = np.uint16 if NIST_ROUND == 1 else np.int16  # type of poly.coeffs in the C model
+
+# calls are counted as e.g. 'kyber_r1_k3.atpk_bytes' in pyber.stats() while the instrumentation is enabled
+_instrumented = instrument.instrumented(__name__.rsplit('.', 1)[-1])
+
+
+def to_hex_str(lst):
+    return [hex(e)[2:].zfill(2) for e in lst]
+
+def _from_buffer(buf):
+    """ zero-copy cdata view of a bytes-like `buf`; other iterables of ints are packed into bytes first
+
+        ndarrays must be uint8: any other dtype is a TypeError rather than a truncating conversion
+    """
+    if isinstance(buf, np.ndarray) and buf.dtype != np.uint8:
+        raise TypeError(f"expected a uint8 array of bytes, got a {buf.dtype} array (use .view(np.uint8) on purpose)")
+    try:
+        return ffi.from_buffer('unsigned char[]', buf)
+    except TypeError:
+        return ffi.from_buffer('unsigned char[]', bytes(buf))
+
+
+def _input(buf, nbytes, what):
+    """ `unsigned char[]` view of an input argument that must be `nbytes` long """
+    cbuf = _from_buffer(buf)
+    assert len(cbuf) == nbytes, f"{what}: argument was {len(cbuf)} bytes but should be {nbytes} bytes"
+    return cbuf
+
+
+def _output(out, nbytes, what):
+    """ `unsigned char[]` for an `nbytes` result: a new array, or a view of the caller's writable buffer `out` """
+    if out is None:
+        return ffi.new(f'unsigned char[{nbytes}]')
+    cout = ffi.from_buffer('unsigned char[]', out, require_writable=True)
+    assert len(cout) == nbytes, f"{what}: out was {len(cout)} bytes but should be {nbytes} bytes"
+    return cout
+
+
+def _result(cout, out):
+    return ffi.buffer(cout)[:] if out is None else out
+
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses evictions entries nbytes max_bytes max_entries')
+
+
+class ExpansionCache():
+    """ LRU cache of the results of a key expansion, keyed by a digest of the key
+
+        Bounded by the total size of the cached results (`max_bytes`, 0 disables the cache) and optionally by the
+        number of entries. The least recently used entries are evicted first.
+    """
+
+    def __init__(self, name, max_bytes, max_entries=None):
+        self.name = name
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.resize(max_bytes, max_entries)
+
+    def __repr__(self):
+        return f"ExpansionCache('{self.name}', {self.info()})"
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __call__(self, key, expand) -> bytes:
+        """ cached `expand()` for the bytes-like `key` """
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        value = self._entries.get(digest)
+        if value is not None:
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = expand()
+        if len(value) <= self.max_bytes:
+            self._entries[digest] = value
+            self.nbytes += len(value)
+            self._evict()
+        return value
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes or (self.max_entries is not None and len(self._entries) > self.max_entries):
+            _, value = self._entries.popitem(last=False)
+            self.nbytes -= len(value)
+            self.evictions += 1
+
+    def resize(self, max_bytes=None, max_entries=None):
+        """ change the bounds, evicting entries that no longer fit; max_entries=None means no entry limit """
+        if max_bytes is not None:
+            assert max_bytes >= 0
+            self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._evict()
+
+    def clear(self):
+        """ drop all entries and reset the counters """
+        self._entries.clear()
+        self.nbytes = self.hits = self.misses = self.evictions = 0
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.evictions, len(self._entries), self.nbytes, self.max_bytes,
+                         self.max_entries)
+
+
+# expanded public keys and repacked secret keys, each bounded to PYBER_CACHE_BYTES (default 16 MiB)
+_CACHE_BYTES = int(os.getenv('PYBER_CACHE_BYTES', str(16 << 20)))
+atpk_cache = ExpansionCache('atpk_bytes', _CACHE_BYTES)
+repack_sk_cache = ExpansionCache('repack_sk_nontt', _CACHE_BYTES)
+
+
+def cache_info() -> dict:
+    return {c.name: c.info() for c in (atpk_cache, repack_sk_cache)}
+
+
+def cache_clear():
+    atpk_cache.clear()
+    repack_sk_cache.clear()
+
+
+def _cached(cache, ckey, expand, out):
+    value = cache(ffi.buffer(ckey), expand)
+    if out is None:
+        return value
+    cout = _output(out, len(value), cache.name)
+    ffi.memmove(cout, value, len(value))
+    return out
+
+
+@_instrumented
+def getnoise_bytes(coins, nonce, out=None):
+    """ round 1 only
+
+        @returns: list of KYBER_ETA * KYBER_N / 4 noise bytes, or `out` filled with them
+    """
+    ccoins = _input(coins, KYBER_SYMBYTES, "getnoise_bytes")
+    if instrument.level >= instrument.LOG:
+        instrument.log.debug("getnoise_bytes: coins=%s nonce=%d", ffi.buffer(ccoins)[:].hex(), nonce)
+    crbuf = _output(out, KYBER_ETA * KYBER_N // 4, "getnoise_bytes")
+    pyber_clib.poly_getnoise_bytes(crbuf, ccoins, nonce)
+    return list(crbuf) if out is None else out
+
+
+def compressed_pk_bytes():
+    return KYBER_INDCPA_PUBLICKEYBYTES
+
+
+PK_BYTES = KYBER_INDCPA_PUBLICKEYBYTES
+
+@_instrumented
+def atpk_bytes(compressed_pk, out=None) -> bytes:
+    """ A^T and pk of `compressed_pk` repacked for the hardware; results are cached in `atpk_cache` """
+    cpk = _input(compressed_pk, compressed_pk_bytes(), "atpk_bytes")
+
+    def expand():
+        if instrument.level >= instrument.LOG:
+            instrument.log.debug("atpk_bytes: expanding %d bytes public-key to %d bytes", compressed_pk_bytes(), KYBER_PKBYTES)
+        c_at_pk_bytes = ffi.new(f'unsigned char[{KYBER_PKBYTES}]')
+        pyber_clib.repack_at_pk(c_at_pk_bytes, cpk)
+        return ffi.buffer(c_at_pk_bytes)[:]
+
+    return _cached(atpk_cache, cpk, expand, out)
+
+
+@_instrumented
+def indcpa_dec_nontt(ct, sk, out=None) -> bytes:
+    cct = _input(ct, KYBER_CIPHERTEXTBYTES, "indcpa_dec_nontt: ct")
+    csk = _input(sk, KYBER_INDCPA_SECRETKEYBYTES, "indcpa_dec_nontt: sk")
+    cmsg = _output(out, KYBER_INDCPA_MSGBYTES, "indcpa_dec_nontt")
+    pyber_clib.indcpa_dec_nontt(cmsg, cct, csk)
+
+    return _result(cmsg, out)
+
+@_instrumented
+def indcpa_dec(ct, sk, out=None) -> bytes:
+    cct = _input(ct, KYBER_CIPHERTEXTBYTES, "indcpa_dec: ct")
+    csk = _input(sk, KYBER_INDCPA_SECRETKEYBYTES, "indcpa_dec: sk")
+    cmsg = _output(out, KYBER_INDCPA_MSGBYTES, "indcpa_dec")
+    pyber_clib.indcpa_dec(cmsg, cct, csk)
+
+    return _result(cmsg, out)
+
+
+@_instrumented
+def indcpa_enc_nontt(msg, pkat, coins, out=None) -> bytes:
+    cmsg = _input(msg, KYBER_INDCPA_MSGBYTES, "indcpa_enc_nontt: msg")
+    c_at_pk_bytes = _input(pkat, KYBER_PKBYTES, "indcpa_enc_nontt: pkat")
+    ccoins = _input(coins, KYBER_SYMBYTES, "indcpa_enc_nontt: coins")
+    cct = _output(out, KYBER_CIPHERTEXTBYTES, "indcpa_enc_nontt")
+
+    pyber_clib.indcpa_enc_nontt(cct, cmsg, c_at_pk_bytes, ccoins)
+
+    return _result(cct, out)
+
+@_instrumented
+def indcpa_enc(msg, pk, coins, out=None) -> bytes:
+    cmsg = _input(msg, KYBER_INDCPA_MSGBYTES, "indcpa_enc: msg")
+    cpk = _input(pk, KYBER_PUBLICKEYBYTES, "indcpa_enc: pk")
+    ccoins = _input(coins, KYBER_SYMBYTES, "indcpa_enc: coins")
+    cct = _output(out, KYBER_CIPHERTEXTBYTES, "indcpa_enc")
+
+    pyber_clib.indcpa_enc(cct, cmsg, cpk, ccoins)
+
+    return _result(cct, out)
+
+
+def _trace_dtype(ctype, fields):
+    """ numpy structured dtype laid out exactly as the C struct `ctype`; fields: (name, field, dtype, shape) """
+    return np.dtype({'names': [name for name, _, _, _ in fields],
+                     'formats': [(dtype, shape) for _, _, dtype, shape in fields],
+                     'offsets': [ffi.offsetof(ctype, field) + extra for _, (field, extra), _, _ in fields],
+                     'itemsize': ffi.sizeof(ctype)})
+
+
+_PV, _P = (KYBER_K, KYBER_N), (KYBER_N,)
+
+# one indcpa_enc_trace record: every intermediate of indcpa_enc_nontt; c_u and c_v are the two parts of c
+ENC_TRACE_DTYPE = _trace_dtype('indcpa_enc_trace', [
+    ('r', ('r', 0), COEFF_DTYPE, _PV), ('e1', ('e1', 0), COEFF_DTYPE, _PV), ('e2', ('e2', 0), COEFF_DTYPE, _P),
+    ('u', ('u', 0), COEFF_DTYPE, _PV), ('vmac', ('vmac', 0), COEFF_DTYPE, _P), ('msg', ('msg', 0), COEFF_DTYPE, _P),
+    ('v', ('v', 0), COEFF_DTYPE, _P), ('c', ('c', 0), np.uint8, (KYBER_CIPHERTEXTBYTES,)),
+    ('c_u', ('c', 0), np.uint8, (KYBER_POLYVECCOMPRESSEDBYTES,)),
+    ('c_v', ('c', KYBER_POLYVECCOMPRESSEDBYTES), np.uint8, (KYBER_POLYCOMPRESSEDBYTES,))])
+
+# one indcpa_dec_trace record: every intermediate of indcpa_dec_nontt
+DEC_TRACE_DTYPE = _trace_dtype('indcpa_dec_trace', [
+    ('u', ('u', 0), COEFF_DTYPE, _PV), ('v', ('v', 0), COEFF_DTYPE, _P), ('s', ('s', 0), COEFF_DTYPE, _PV),
+    ('mp', ('mp', 0), COEFF_DTYPE, _P), ('m', ('m', 0), np.uint8, (KYBER_INDCPA_MSGBYTES,))])
+
+
+def _trace_output(out, dtype, what):
+    if out is None:
+        return np.zeros((), dtype=dtype)
+    assert isinstance(out, np.ndarray) and out.dtype == dtype and out.size == 1 and out.flags.c_contiguous, \
+        f"{what}: out should be a contiguous single-record array of dtype {what.upper()}_DTYPE"
+    return out
+
+
+@_instrumented
+def indcpa_enc_nontt_traced(msg, pkat, coins, out=None) -> np.ndarray:
+    """
+        indcpa_enc_nontt keeping every intermediate, all filled in by a single C call
+        returns a 0-d ENC_TRACE_DTYPE record (or @out): noise r, e1, e2, u = A^T r + e1, vmac = t^T r + e2,
+        the message polynomial msg, v = vmac + msg and the ciphertext c = c_u || c_v
+    """
+    cmsg = _input(msg, KYBER_INDCPA_MSGBYTES, "indcpa_enc_nontt_traced: msg")
+    c_at_pk_bytes = _input(pkat, KYBER_PKBYTES, "indcpa_enc_nontt_traced: pkat")
+    ccoins = _input(coins, KYBER_SYMBYTES, "indcpa_enc_nontt_traced: coins")
+    trace = _trace_output(out, ENC_TRACE_DTYPE, "enc_trace")
+    ctrace = ffi.from_buffer('indcpa_enc_trace *', trace, require_writable=True)
+
+    pyber_clib.indcpa_enc_nontt_traced(ctrace.c, cmsg, c_at_pk_bytes, ccoins, ctrace)
+
+    return trace
+
+@_instrumented
+def indcpa_dec_nontt_traced(ct, sk, out=None) -> np.ndarray:
+    """
+        indcpa_dec_nontt keeping every intermediate, all filled in by a single C call
+        returns a 0-d DEC_TRACE_DTYPE record (or @out): decompressed u and v, secret s, mp = v - s^T u and message m
+    """
+    cct = _input(ct, KYBER_CIPHERTEXTBYTES, "indcpa_dec_nontt_traced: ct")
+    csk = _input(sk, KYBER_INDCPA_SECRETKEYBYTES, "indcpa_dec_nontt_traced: sk")
+    trace = _trace_output(out, DEC_TRACE_DTYPE, "dec_trace")
+    ctrace = ffi.from_buffer('indcpa_dec_trace *', trace, require_writable=True)
+
+    pyber_clib.indcpa_dec_nontt_traced(ctrace.m, cct, csk, ctrace)
+
+    return trace
+
+
+class Polynomial():
+    def __init__(self, coeffs: List[int]):
+        coeffs = np.asarray(coeffs)
+        assert coeffs.shape == (KYBER_N,) and np.issubdtype(coeffs.dtype, np.integer), "wrong argument type"
+        self.coeffs = coeffs.astype(COEFF_DTYPE)  # need to make a copy!!!
+
+    @classmethod
+    def _wrap(cls, coeffs: np.ndarray):
+        """ wrap a contiguous (KYBER_N,) COEFF_DTYPE array without copying it """
+        poly = cls.__new__(cls)
+        poly.coeffs = coeffs
+        return poly
+
+    @classmethod
+    def cbd(cls, buf, out=None):
+        cbuf = _input(buf, KYBER_ETA * KYBER_N // 4, "cbd")
+        poly = cls.zero() if out is None else out
+        pyber_clib.cbd(poly.to_cpoly(), cbuf)
+        return poly
+
+    @classmethod
+    def getnoise(cls, coins, nonce, out=None):
+        ccoins_buf = _input(coins, KYBER_SYMBYTES, "getnoise")
+        poly = cls.zero() if out is None else out
+        pyber_clib.poly_getnoise(poly.to_cpoly(), ccoins_buf, nonce)
+        return poly
+
+    @classmethod
+    def random(cls, rnd=None):
+        """create new Polynomial of order KYBER_N with random coefficients over Z/KYBER_Q
+
+            rnd: random.Random or numpy.random.Generator, a fresh unseeded numpy.random.Generator if None; for
+            reproducible batches of stimulus see `stimulus.Stimulus`
+        """
+        if rnd is None:
+            rnd = np.random.default_rng()
+        if isinstance(rnd, np.random.Generator):
+            return cls._wrap(rnd.integers(0, KYBER_Q, KYBER_N).astype(COEFF_DTYPE))
+
+        def random_word(min, max):
+            return (rnd.randint(min, max))
+
+        return cls(coeffs=[random_word(0, KYBER_Q - 1) for _ in range(KYBER_N)])
+
+    @classmethod
+    def from_cpoly(cls, cpoly):
+        return cls(np.frombuffer(ffi.buffer(cpoly.coeffs), dtype=COEFF_DTYPE))
+
+    @classmethod
+    def zero(cls):
+        """create new Polynomial of order KYBER_N with all coefficients set to 0 """
+        return cls._wrap(np.zeros(KYBER_N, dtype=COEFF_DTYPE))
+
+    def __iter__(self):
+        yield from self.coeffs.tolist()
+
+    def dump(self):
+        term_width, _ = shutil.get_terminal_size()
+        col = 0
+        nibles = (int(ceil(log2(KYBER_Q))) + 3) // 4
+        for c in self.coeffs.tolist():
+            col += nibles + 1
+            if col + nibles >= term_width:
+                end = os.linesep
+                col = 0
+            else:
+                end = " "
+            print(f"{c:0>{nibles}X}", end=end)
+
+        print("")
+
+    def to_cpoly(self):
+        """ `poly *` view of the coefficients; no copy is made, so C writes through it update this Polynomial """
+        return ffi.from_buffer('poly *', self.coeffs)
+
+    def __add__(self, other):
+        """ add two Polynomials and return result """
+        r = Polynomial.zero()
+        cpoly_r = r.to_cpoly()
+
+        pyber_clib.poly_add(cpoly_r, self.to_cpoly(), other.to_cpoly())
+        pyber_clib.poly_freeze(cpoly_r)
+
+        return r
+
+    def __sub__(self, other):
+        """ add two Polynomials and return result """
+        r = Polynomial.zero()
+        cpoly_r = r.to_cpoly()
+
+        pyber_clib.poly_sub(cpoly_r, self.to_cpoly(), other.to_cpoly())
+        pyber_clib.poly_freeze(cpoly_r)
+
+        return r
+
+    def __eq__(self, other):
+        return np.array_equal(self.coeffs, other.coeffs)
+
+class PolynomialVector():
+    def __init__(self, polys: List[Polynomial]):
+        assert isinstance(polys, Iterable) and all(isinstance(p, Polynomial) for p in polys) and len(polys) == KYBER_K, "wrong argument type"
+        self.coeffs = np.stack([p.coeffs for p in polys])
+        self.polys = [Polynomial._wrap(row) for row in self.coeffs]
+        self._ntt_cache = None
+
+    @classmethod
+    def _wrap(cls, coeffs: np.ndarray):
+        """ wrap a contiguous (KYBER_K, KYBER_N) COEFF_DTYPE array without copying it """
+        pv = cls.__new__(cls)
+        pv.coeffs = coeffs
+        pv.polys = [Polynomial._wrap(row) for row in coeffs]
+        pv._ntt_cache = None
+        return pv
+
+    @classmethod
+    def random(cls, rnd=None):
+        if rnd is None:
+            rnd = np.random.default_rng()
+        return cls(polys=[Polynomial.random(rnd) for _ in range(KYBER_K)])
+
+    @classmethod
+    def zero(cls):
+        return cls._wrap(np.zeros((KYBER_K, KYBER_N), dtype=COEFF_DTYPE))
+
+    @classmethod
+    def from_cpolyvec(cls, cpolyvec):
+        coeffs = np.frombuffer(ffi.buffer(cpolyvec.vec), dtype=COEFF_DTYPE).reshape(KYBER_K, KYBER_N)
+        return cls._wrap(coeffs.copy())
+
+    def __iter__(self):
+        yield from self.coeffs.ravel().tolist()  # flatten
+
+    def dump(self):
+        for i, p in enumerate(self.polys):
+            print(f" Poly[{i}]:")
+            p.dump()
+
+    def to_cpolyvec(self):
+        """ `polyvec *` view of the coefficients; no copy is made """
+        return ffi.from_buffer('polyvec *', self.coeffs)
+
+    def invalidate_ntt(self):
+        """ drop the cached NTT form """
+        self._ntt_cache = None
+
+    def ntt(self) -> np.ndarray:
+        """ read-only (KYBER_K, KYBER_N) NTT form of the coefficients
+
+            Cached on the vector: the transform is recomputed only when the coefficients changed since the last call.
+        """
+        if self._ntt_cache is None or not np.array_equal(self._ntt_cache[0], self.coeffs):
+            snapshot = self.coeffs.copy()
+            ntt = self.coeffs.copy()
+            pyber_clib.polyvec_ntt(ffi.from_buffer('polyvec *', ntt))  # NTT is done in place
+            ntt.flags.writeable = False
+            self._ntt_cache = (snapshot, ntt)
+        return self._ntt_cache[1]
+
+    def __mul__(self, other):
+        r = Polynomial.zero()
+        cpoly_r = r.to_cpoly()
+
+        pyber_clib.polyvec_pointwise_acc(cpoly_r, ffi.from_buffer('polyvec *', self.ntt()), ffi.from_buffer('polyvec *', other.ntt()))
+        pyber_clib.poly_invntt(cpoly_r)
+
+        return r
+
+
+
+@_instrumented
+def polyvec_nega_mac(p_r: Polynomial, pv_a: PolynomialVector, pv_b: PolynomialVector, subtract=False, out=None) -> Polynomial:
+    """ 
+
+        @returns: Polynomial  (pv_a * pv_b - p_r) if subtract:True else (pv_a * pv_b + p_r) 
+        @out: Polynomial to write the result into (may be p_r itself) instead of a new one
+    """
+    assert isinstance(p_r, Polynomial) and isinstance(
+        pv_a, PolynomialVector) and isinstance(pv_b, PolynomialVector)
+
+    if out is None:
+        r = Polynomial(p_r.coeffs)  # need to copy!!!
+    else:
+        r = out
+        if r is not p_r:
+            np.copyto(r.coeffs, p_r.coeffs)
+
+    pyber_clib.polyvec_nega_mac(r.to_cpoly(), pv_a.to_cpolyvec(), pv_b.to_cpolyvec(), 1 if subtract else 0)
+
+    return r
+
+
+def _coeff_array(x, what):
+    """ contiguous COEFF_DTYPE copy (or view) of integer coefficients `x`, which must all be in [0, KYBER_Q)
+
+        the C polyvec_nega_mac exits the process on a coefficient out of range, and a cast would wrap e.g. -1 silently
+    """
+    x = np.asarray(x)
+    if x.dtype.kind not in 'iu':
+        raise ValueError(f"polyvec_nega_mac_batch: {what} should hold integer coefficients, got a {x.dtype} array")
+    if x.size and (x.min() < 0 or x.max() >= KYBER_Q):
+        raise ValueError(f"polyvec_nega_mac_batch: {what} should hold coefficients in [0, {KYBER_Q}), "
+                         f"got values in [{x.min()}, {x.max()}]")
+    return np.ascontiguousarray(x, dtype=COEFF_DTYPE)
+
+
+@_instrumented
+def polyvec_nega_mac_batch(R, A, B, subtract=False, out=None) -> np.ndarray:
+    """ polyvec_nega_mac over a batch of triples in a single call into the C model
+
+        R: (batch, KYBER_N), A and B: (batch, KYBER_K, KYBER_N) integer coefficients in [0, KYBER_Q), a ValueError
+        otherwise
+        @returns: (batch, KYBER_N) array with (R[i] - A[i] * B[i]) if subtract:True else (R[i] + A[i] * B[i])
+        @out: contiguous (batch, KYBER_N) COEFF_DTYPE array to write the results into (may be R itself)
+    """
+    R = _coeff_array(R, "R")
+    A = _coeff_array(A, "A")
+    B = _coeff_array(B, "B")
+    n = len(A)
+    assert A.shape == B.shape == (n, KYBER_K, KYBER_N), f"polyvec_nega_mac_batch: A and B should be ({n}, {KYBER_K}, {KYBER_N}) arrays"
+    assert np.shape(R) == (n, KYBER_N), f"polyvec_nega_mac_batch: R should be a ({n}, {KYBER_N}) array"
+
+    if out is None:
+        r = R.copy()
+    else:
+        assert out.shape == (n, KYBER_N) and out.dtype == COEFF_DTYPE and out.flags.c_contiguous, \
+            f"polyvec_nega_mac_batch: out should be a contiguous ({n}, {KYBER_N}) {np.dtype(COEFF_DTYPE)} array"
+        r = out
+        if r is not R:
+            np.copyto(r, R)
+
+    if n:
+        pyber_clib.polyvec_nega_mac_batch(ffi.from_buffer('poly *', r), ffi.from_buffer('polyvec *', A),
+                                          ffi.from_buffer('polyvec *', B), 1 if subtract else 0, n)
+
+    return r
+
+
+@_instrumented
+def poly_decompress(ct_bytes, out=None) -> Polynomial:
+    ca = _input(ct_bytes, KYBER_POLYCOMPRESSEDBYTES, "poly_decompress")
+    poly = Polynomial.zero() if out is None else out
+    pyber_clib.poly_decompress(poly.to_cpoly(), ca)
+    return poly
+
+@_instrumented
+def polyvec_decompress(ct_bytes, out=None) -> PolynomialVector:
+    ca = _input(ct_bytes, KYBER_POLYVECCOMPRESSEDBYTES, "polyvec_decompress")
+    polyvec = PolynomialVector.zero() if out is None else out
+    pyber_clib.polyvec_decompress(polyvec.to_cpolyvec(), ca)
+    return polyvec
+
+
+@_instrumented
+def poly_tomsg(poly: Polynomial, out=None) -> bytes:
+    cpoly = Polynomial(poly.coeffs).to_cpoly()  # poly_tomsg reduces its argument in place
+    cmsg = _output(out, KYBER_SYMBYTES, "poly_tomsg")
+    pyber_clib.poly_tomsg(cmsg, cpoly)
+
+    return _result(cmsg, out)
+
+@_instrumented
+def indcpa_keypair(out=None) -> Tuple[(bytes, bytes)]:
+    """ @out: optional (pk, sk) pair of writable buffers to fill instead of returning new bytes """
+    out_pk, out_sk = (None, None) if out is None else out
+    cpk = _output(out_pk, KYBER_INDCPA_PUBLICKEYBYTES, "indcpa_keypair: pk")
+    csk = _output(out_sk, KYBER_INDCPA_SECRETKEYBYTES, "indcpa_keypair: sk")
+    pyber_clib.indcpa_keypair(cpk, csk)
+
+    return _result(cpk, out_pk), _result(csk, out_sk)
+
+
+@_instrumented
+def indcpa_keypair_from_seed(seed, out=None) -> Tuple[(bytes, bytes)]:
+    """ deterministic indcpa_keypair: `seed` (KYBER_SYMBYTES bytes) replaces the randomness the C model would draw """
+    cseed = _input(seed, KYBER_SYMBYTES, "indcpa_keypair_from_seed")
+    out_pk, out_sk = (None, None) if out is None else out
+    cpk = _output(out_pk, KYBER_INDCPA_PUBLICKEYBYTES, "indcpa_keypair_from_seed: pk")
+    csk = _output(out_sk, KYBER_INDCPA_SECRETKEYBYTES, "indcpa_keypair_from_seed: sk")
+    pyber_clib.indcpa_keypair_from_seed(cpk, csk, cseed)
+
+    return _result(cpk, out_pk), _result(csk, out_sk)
+
+
+def seed_stream(label: str, seed, index: int, nbytes: int) -> bytes:
+    """ `nbytes` pseudo-random bytes identified by (NIST_ROUND, KYBER_K, label, seed, index)
+
+        `seed` is an int or bytes-like. The same arguments always produce the same bytes, for any number of
+        previously drawn indices, so a single vector of a long run can be regenerated on its own.
+    """
+    if isinstance(seed, int):
+        seed = seed.to_bytes(max(1, (seed.bit_length() + 7) // 8), 'little')
+    seed = bytes(seed)
+    h = hashlib.shake_256(b'pyber')
+    for field in (bytes([NIST_ROUND, KYBER_K]), label.encode(), seed, index.to_bytes(8, 'little')):
+        h.update(len(field).to_bytes(4, 'little') + field)
+    return h.digest(nbytes)
+
+
+@_instrumented
+def seeded_keypair(seed, index: int = 0) -> Tuple[(bytes, bytes)]:
+    """ key pair `index` of the vector set identified by (NIST_ROUND, KYBER_K, seed) """
+    return indcpa_keypair_from_seed(seed_stream('keypair', seed, index, KYBER_SYMBYTES))
+
+
+@_instrumented
+def seeded_msg_coins(seed, index: int, n: int = 1) -> Tuple[(bytes, bytes)]:
+    """ messages and coins of vectors index .. index + n - 1 of the vector set identified by (NIST_ROUND, KYBER_K, seed)
+
+        @returns: (msgs, coins) n concatenated messages and n concatenated coins, ready for indcpa_enc_batch
+    """
+    msgs = b''.join(seed_stream('msg', seed, i, KYBER_INDCPA_MSGBYTES) for i in range(index, index + n))
+    coins = b''.join(seed_stream('coins', seed, i, KYBER_SYMBYTES) for i in range(index, index + n))
+    return msgs, coins
+
+
+def _batch_len(buf, record_bytes, what):
+    l = len(buf)
+    assert l % record_bytes == 0, f"{what}: length must be a multiple of {record_bytes} bytes but {l} bytes were provided"
+    return l // record_bytes
+
+
+@_instrumented
+def indcpa_keypair_batch(n, out=None) -> Tuple[(bytes, bytes)]:
+    """ generate `n` key pairs in a single call into the C model
+
+        @returns: (pks, sks) n concatenated public keys and n concatenated secret keys
+    """
+    out_pks, out_sks = (None, None) if out is None else out
+    cpks = _output(out_pks, n * KYBER_INDCPA_PUBLICKEYBYTES, "indcpa_keypair_batch: pks")
+    csks = _output(out_sks, n * KYBER_INDCPA_SECRETKEYBYTES, "indcpa_keypair_batch: sks")
+    pyber_clib.indcpa_keypair_batch(cpks, csks, n)
+
+    return _result(cpks, out_pks), _result(csks, out_sks)
+
+
+@_instrumented
+def indcpa_enc_batch(msgs, pk, coins, out=None) -> bytes:
+    """ encrypt n messages in a single call into the C model
+
+        @msgs:  n * KYBER_INDCPA_MSGBYTES contiguous bytes
+        @pk:    one public key shared by all messages, or n concatenated public keys
+        @coins: n * KYBER_SYMBYTES contiguous bytes
+        @returns: n concatenated ciphertexts
+    """
+    cmsgs = _from_buffer(msgs)
+    n = _batch_len(cmsgs, KYBER_INDCPA_MSGBYTES, "indcpa_enc_batch: msgs")
+    ccoins = _input(coins, n * KYBER_SYMBYTES, "indcpa_enc_batch: coins")
+    cpk = _from_buffer(pk)
+    if len(cpk) == KYBER_PUBLICKEYBYTES:
+        pk_stride = 0
+    else:
+        assert len(cpk) == n * KYBER_PUBLICKEYBYTES, f"indcpa_enc_batch: pk should be {KYBER_PUBLICKEYBYTES} or {n * KYBER_PUBLICKEYBYTES} bytes"
+        pk_stride = KYBER_PUBLICKEYBYTES
+
+    ccts = _output(out, n * KYBER_CIPHERTEXTBYTES, "indcpa_enc_batch")
+    pyber_clib.indcpa_enc_batch(ccts, cmsgs, cpk, pk_stride, ccoins, n)
+
+    return _result(ccts, out)
+
+
+@_instrumented
+def indcpa_dec_batch(cts, sk, out=None) -> bytes:
+    """ decrypt n ciphertexts in a single call into the C model
+
+        @cts:   n * KYBER_CIPHERTEXTBYTES contiguous bytes
+        @sk:    one secret key shared by all ciphertexts, or n concatenated secret keys
+        @returns: n concatenated messages
+    """
+    ccts = _from_buffer(cts)
+    n = _batch_len(ccts, KYBER_CIPHERTEXTBYTES, "indcpa_dec_batch: cts")
+    csk = _from_buffer(sk)
+    if len(csk) == KYBER_INDCPA_SECRETKEYBYTES:
+        sk_stride = 0
+    else:
+        assert len(csk) == n * KYBER_INDCPA_SECRETKEYBYTES, f"indcpa_dec_batch: sk should be {KYBER_INDCPA_SECRETKEYBYTES} or {n * KYBER_INDCPA_SECRETKEYBYTES} bytes"
+        sk_stride = KYBER_INDCPA_SECRETKEYBYTES
+
+    cmsgs = _output(out, n * KYBER_INDCPA_MSGBYTES, "indcpa_dec_batch")
+    pyber_clib.indcpa_dec_batch(cmsgs, ccts, csk, sk_stride, n)
+
+    return _result(cmsgs, out)
+
+
+@_instrumented
+def crypto_kem_keypair(out=None) -> Tuple[(bytes, bytes)]:
+    """ CCA KEM key pair (pk, sk); @out: optional (pk, sk) pair of writable buffers """
+    out_pk, out_sk = (None, None) if out is None else out
+    cpk = _output(out_pk, CRYPTO_PUBLICKEYBYTES, "crypto_kem_keypair: pk")
+    csk = _output(out_sk, CRYPTO_SECRETKEYBYTES, "crypto_kem_keypair: sk")
+    pyber_clib.crypto_kem_keypair(cpk, csk)
+
+    return _result(cpk, out_pk), _result(csk, out_sk)
+
+
+@_instrumented
+def crypto_kem_enc(pk, out=None) -> Tuple[(bytes, bytes)]:
+    """ encapsulate a fresh shared secret under `pk`
+
+        @returns: (ct, ss); @out: optional (ct, ss) pair of writable buffers
+    """
+    cpk = _input(pk, CRYPTO_PUBLICKEYBYTES, "crypto_kem_enc")
+    out_ct, out_ss = (None, None) if out is None else out
+    cct = _output(out_ct, CRYPTO_CIPHERTEXTBYTES, "crypto_kem_enc: ct")
+    css = _output(out_ss, CRYPTO_BYTES, "crypto_kem_enc: ss")
+    pyber_clib.crypto_kem_enc(cct, css, cpk)
+
+    return _result(cct, out_ct), _result(css, out_ss)
+
+
+@_instrumented
+def crypto_kem_dec(ct, sk, out=None) -> bytes:
+    """ shared secret of `ct` (a pseudo-random value if `ct` was not produced under the pk of `sk`) """
+    cct = _input(ct, CRYPTO_CIPHERTEXTBYTES, "crypto_kem_dec: ct")
+    csk = _input(sk, CRYPTO_SECRETKEYBYTES, "crypto_kem_dec: sk")
+    css = _output(out, CRYPTO_BYTES, "crypto_kem_dec")
+    pyber_clib.crypto_kem_dec(css, cct, csk)
+
+    return _result(css, out)
+
+
+@_instrumented
+def crypto_kem_keypair_batch(n, out=None) -> Tuple[(bytes, bytes)]:
+    """ generate `n` CCA KEM key pairs in a single call into the C model
+
+        @returns: (pks, sks) n concatenated public keys and n concatenated secret keys
+    """
+    out_pks, out_sks = (None, None) if out is None else out
+    cpks = _output(out_pks, n * CRYPTO_PUBLICKEYBYTES, "crypto_kem_keypair_batch: pks")
+    csks = _output(out_sks, n * CRYPTO_SECRETKEYBYTES, "crypto_kem_keypair_batch: sks")
+    pyber_clib.crypto_kem_keypair_batch(cpks, csks, n)
+
+    return _result(cpks, out_pks), _result(csks, out_sks)
+
+
+@_instrumented
+def crypto_kem_enc_batch(pk, n, out=None) -> Tuple[(bytes, bytes)]:
+    """ `n` encapsulations in a single call into the C model
+
+        pk: a single public key used for all encapsulations, or n concatenated public keys
+        @returns: (cts, sss) n concatenated cipher texts and n concatenated shared secrets
+    """
+    cpk = _from_buffer(pk)
+    if len(cpk) == CRYPTO_PUBLICKEYBYTES:
+        pk_stride = 0
+    else:
+        assert len(cpk) == n * CRYPTO_PUBLICKEYBYTES, f"crypto_kem_enc_batch: pk should be {CRYPTO_PUBLICKEYBYTES} or {n * CRYPTO_PUBLICKEYBYTES} bytes"
+        pk_stride = CRYPTO_PUBLICKEYBYTES
+
+    out_cts, out_sss = (None, None) if out is None else out
+    ccts = _output(out_cts, n * CRYPTO_CIPHERTEXTBYTES, "crypto_kem_enc_batch: cts")
+    csss = _output(out_sss, n * CRYPTO_BYTES, "crypto_kem_enc_batch: sss")
+    pyber_clib.crypto_kem_enc_batch(ccts, csss, cpk, pk_stride, n)
+
+    return _result(ccts, out_cts), _result(csss, out_sss)
+
+
+@_instrumented
+def crypto_kem_dec_batch(cts, sk, out=None) -> bytes:
+    """ decapsulate n concatenated cipher texts in a single call into the C model
+
+        sk: a single secret key used for all cipher texts, or n concatenated secret keys
+        @returns: n concatenated shared secrets
+    """
+    ccts = _from_buffer(cts)
+    n = _batch_len(ccts, CRYPTO_CIPHERTEXTBYTES, "crypto_kem_dec_batch: cts")
+    csk = _from_buffer(sk)
+    if len(csk) == CRYPTO_SECRETKEYBYTES:
+        sk_stride = 0
+    else:
+        assert len(csk) == n * CRYPTO_SECRETKEYBYTES, f"crypto_kem_dec_batch: sk should be {CRYPTO_SECRETKEYBYTES} or {n * CRYPTO_SECRETKEYBYTES} bytes"
+        sk_stride = CRYPTO_SECRETKEYBYTES
+
+    csss = _output(out, n * CRYPTO_BYTES, "crypto_kem_dec_batch")
+    pyber_clib.crypto_kem_dec_batch(csss, ccts, csk, sk_stride, n)
+
+    return _result(csss, out)
+
+
+@_instrumented
+def repack_sk_nontt(sk, out=None) -> bytes:
+    """ results are cached in `repack_sk_cache` """
+    csk = _input(sk, KYBER_INDCPA_SECRETKEYBYTES, "repack_sk_nontt")
+
+    def expand():
+        cresk = ffi.new(f'unsigned char[{KYBER_INDCPA_SECRETKEYBYTES}]')
+        pyber_clib.repack_sk_nontt(cresk, csk)
+        if instrument.level >= instrument.LOG:
+            instrument.log.debug("repack_sk_nontt: cresk=%s", ffi.buffer(cresk)[:].hex())
+        return ffi.buffer(cresk)[:]
+
+    return _cached(repack_sk_cache, csk, expand, out)
+
+def test_poly_decompress():
+    print("testing poly_decompress")
+    ct_bytes = bytes([i & 0xff for i in range(KYBER_POLYCOMPRESSEDBYTES)])
+    poly = poly_decompress(ct_bytes)
+    poly.dump()
+
+def test_polyvec_decompress():
+    print("testing poly_decompress")
+    ct_bytes = bytes([i & 0xff for i in range(KYBER_POLYVECCOMPRESSEDBYTES)])
+    polyvec = polyvec_decompress(ct_bytes)
+    polyvec.dump()
+
+def test_cpa_enc():
+    coins = [i & 0xff for i in range(KYBER_SYMBYTES)]
+    pk = [i & 0xff for i in range(compressed_pk_bytes())]
+    msg = [i & 0xff for i in range(KYBER_INDCPA_MSGBYTES)]
+
+    atpk = list(atpk_bytes(bytes(pk)))
+    exp = list(indcpa_enc_nontt(msg, atpk, coins))
+
+    print(f"exp: {to_hex_str(exp)}")
+
+
+
+__all__ = ['pyber_clib', 'polyvec_nega_mac', 'polyvec_nega_mac_batch', 'KYBER_N', 'poly_decompress', 'polyvec_decompress',
+           'poly_tomsg', 'indcpa_enc_nontt', 'indcpa_dec_nontt', 'to_hex_str',
+           'indcpa_enc_nontt_traced', 'indcpa_dec_nontt_traced', 'ENC_TRACE_DTYPE', 'DEC_TRACE_DTYPE',
+           'KYBER_K', 'KYBER_Q', 'KYBER_ETA', 
+           'KYBER_POLYBYTES', 'KYBER_POLYVECBYTES', 'KYBER_INDCPA_SECRETKEYBYTES',
+           'KYBER_CIPHERTEXTBYTES', 'KYBER_INDCPA_MSGBYTES',
+            'Polynomial', 'PolynomialVector', "getnoise_bytes",
+           'indcpa_keypair_batch', 'indcpa_enc_batch', 'indcpa_dec_batch',
+           'indcpa_keypair_from_seed', 'seed_stream', 'seeded_keypair', 'seeded_msg_coins', 'NIST_ROUND',
+           'atpk_bytes', 'repack_sk_nontt', 'ExpansionCache', 'CacheInfo', 'atpk_cache', 'repack_sk_cache',
+           'cache_info', 'cache_clear',
+           'CRYPTO_PUBLICKEYBYTES', 'CRYPTO_SECRETKEYBYTES', 'CRYPTO_CIPHERTEXTBYTES', 'CRYPTO_BYTES',
+           'crypto_kem_keypair', 'crypto_kem_enc', 'crypto_kem_dec',
+           'crypto_kem_keypair_batch', 'crypto_kem_enc_batch', 'crypto_kem_dec_batch']
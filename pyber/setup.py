@@ -3,8 +3,10 @@ from setuptools import setup
 setup(
     name="pyber",
     version="0.1",
-    py_modules=["_pyber2", "pyber2", "_pyber", "pyber"],
-    setup_requires=["cffi>=1.11.0"],
-    cffi_modules=["build_pyber.py:ffibuilder", "build_pyber.py:ffibuilder2"],
-    install_requires=["cffi>=1.11.0"],
+    py_modules=["_pyber2", "pyber2", "_pyber", "pyber", "pyber_model", "numpy_backend", "vectors", "bench", "stimulus", "instrument", "generate", "pipeline"],
+    setup_requires=["cffi>=1.12.0"],
+    cffi_modules=["build_pyber.py:ffibuilder", "build_pyber.py:ffibuilder2",
+                  "build_pyber.py:ffibuilder_k2", "build_pyber.py:ffibuilder_k4",
+                  "build_pyber.py:ffibuilder2_k2", "build_pyber.py:ffibuilder2_k4"],
+    install_requires=["cffi>=1.12.0", "numpy"],
 )
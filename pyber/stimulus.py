@@ -0,0 +1,87 @@
+"""
+    Vectorized, seedable stimulus for the testbenches
+
+    Every value is drawn from a counter-based Philox generator. The key is derived from (seed, stream, field name,
+    size) and item `index` starts at a counter block of its own, so:
+
+        - item `index` of a field is the same whether it is drawn on its own or as part of any batch, in any order
+        - draws need no shared state, any number of processes can generate disjoint parts of a set in parallel
+        - a whole batch is a single call into numpy, no per-coefficient Python loop
+
+        stim = Stimulus(seed=1)
+        coins = stim.bytes('coins', index, KYBER_SYMBYTES)
+        polys = stim.coeffs('v', index, (KYBER_N,), KYBER_Q, batch=10000)    # (10000, KYBER_N)
+        a = stim.polyvec(model, 'a', index)                                # model.PolynomialVector
+
+    Coefficients in [0, q) are the top bits of q * (32-bit random word), a bias below q / 2**32 that is irrelevant for
+    stimulus but keeps every item a fixed number of random words.
+"""
+import hashlib
+import os
+
+import numpy as np
+
+_WORDS_PER_BLOCK = 4  # Philox4x64 produces 4 64-bit words per counter increment
+
+
+def default_seed() -> int:
+    """ RANDOM_SEED of the simulation (as used by cocotb), 0 if it is not set """
+    return int(os.getenv('RANDOM_SEED', '0'))
+
+
+class Stimulus():
+    def __init__(self, seed=None, stream: str = 'stimulus'):
+        """ seed: int or bytes-like, default_seed() if None; stream: name that separates unrelated uses of one seed """
+        if seed is None:
+            seed = default_seed()
+        self.seed = seed
+        self.stream = stream
+
+    def __repr__(self):
+        return f"Stimulus(seed={self.seed!r}, stream='{self.stream}')"
+
+    def _key(self, name, words):
+        seed = bytes(self.seed).hex() if not isinstance(self.seed, int) else str(self.seed)
+        digest = hashlib.blake2b(f"{seed}/{self.stream}/{name}/{words}".encode(), digest_size=16).digest()
+        return np.frombuffer(digest, dtype='<u8')
+
+    def raw(self, name: str, index: int, words: int, batch: int = 1) -> np.ndarray:
+        """ (batch, words) uint64 random words of items index .. index + batch - 1 of field `name` """
+        assert index >= 0 and words > 0 and batch >= 0
+        stride = -(-words // _WORDS_PER_BLOCK)
+        bitgen = np.random.Philox(key=self._key(name, words), counter=index * stride)
+        raw = bitgen.random_raw(batch * stride * _WORDS_PER_BLOCK).astype('<u8', copy=False)
+        return raw.reshape(batch, stride * _WORDS_PER_BLOCK)[:, :words]
+
+    def bytes(self, name: str, index: int, nbytes: int, batch: int = None):
+        """ `nbytes` random bytes of item `index`, or a (batch, nbytes) uint8 array of items index .. index + batch - 1 """
+        raw = self.raw(name, index, -(-nbytes // 8), 1 if batch is None else batch)
+        b = np.ascontiguousarray(raw).view(np.uint8)[:, :nbytes]
+        return b[0].tobytes() if batch is None else b
+
+    def integers(self, name: str, index: int, high: int, shape=(), batch: int = None) -> np.ndarray:
+        """ array of `shape` (prefixed by `batch` if given) of uniform integers in [0, high), high <= 2**32 """
+        assert 0 < high <= 1 << 32
+        shape = tuple(np.atleast_1d(shape)) if shape != () else ()
+        n = int(np.prod(shape, dtype=np.int64))
+        raw = self.raw(name, index, -(-max(n, 1) // 2), 1 if batch is None else batch)
+        u32 = np.ascontiguousarray(raw).view('<u4')[:, :n].astype(np.uint64)
+        x = (u32 * np.uint64(high)) >> np.uint64(32)
+        x = x.reshape((-1,) + shape)
+        return x[0] if batch is None else x
+
+    def coeffs(self, name: str, index: int, shape, q: int, batch: int = None) -> np.ndarray:
+        """ uint16 coefficients in [0, q) """
+        return self.integers(name, index, q, shape, batch).astype(np.uint16)
+
+    def polynomial(self, model, name: str, index: int):
+        """ model.Polynomial with uniform coefficients """
+        return model.Polynomial(self.coeffs(name, index, (model.KYBER_N,), model.KYBER_Q))
+
+    def polyvec(self, model, name: str, index: int):
+        """ model.PolynomialVector with uniform coefficients """
+        coeffs = self.coeffs(name, index, (model.KYBER_K, model.KYBER_N), model.KYBER_Q)
+        return model.PolynomialVector([model.Polynomial(c) for c in coeffs])
+
+
+__all__ = ['Stimulus', 'default_seed']
@@ -0,0 +1,53 @@
+"""
+    pytest checks that parallel generation produces the same store file as vectors.create, for any partition
+"""
+import pytest
+
+try:
+    from . import generate, load, vectors
+except ImportError:
+    import generate
+    import vectors
+    from pyber import load
+
+
+def _model(round, k=3):
+    try:
+        return load(round, k)
+    except ImportError as e:
+        pytest.skip(str(e))
+
+
+@pytest.mark.parametrize('round', [1, 2])
+@pytest.mark.parametrize('n_keys', [1, 3])
+@pytest.mark.parametrize('workers, chunk', [(1, 4096), (1, 2), (3, 2), (2, 5)])
+def test_generate_matches_create(round, n_keys, workers, chunk, tmp_path):
+    model = _model(round)
+    n_vectors = 11
+    vectors.create(tmp_path / 'ref.bin', model, 7, n_vectors, n_keys).close()
+    done = []
+    generate.generate(tmp_path / 'gen.bin', model, 7, n_vectors, n_keys, workers, chunk,
+                      progress=lambda d, n: done.append(d)).close()
+
+    assert (tmp_path / 'gen.bin').read_bytes() == (tmp_path / 'ref.bin').read_bytes()
+    assert done[-1] == n_vectors
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['gen.bin', 'ref.bin'], "temporary file left behind"
+
+
+def test_shards():
+    assert generate.shards(0, 4) == []
+    assert generate.shards(10, 4) == [(0, 4), (4, 8), (8, 10)]
+    assert generate.shards(8, 4) == [(0, 4), (4, 8)]
+
+
+def test_open_or_generate(tmp_path):
+    model = _model(2)
+    path = tmp_path / 'v.bin'
+    with generate.open_or_generate(path, model, 0, 4, workers=2, chunk=2) as store:
+        assert len(store) == 4
+    mtime = path.stat().st_mtime_ns
+    with generate.open_or_generate(path, model, 0, 3, workers=2, chunk=2) as store:
+        assert len(store) == 4
+    assert path.stat().st_mtime_ns == mtime, "a matching store should not be regenerated"
+    with generate.open_or_generate(path, model, 1, 4, workers=2, chunk=2) as store:
+        assert store.seed == 1
@@ -0,0 +1,74 @@
+"""
+    pytest checks of the pyber_model wrappers, against the extensions that are built (the others are skipped)
+"""
+import numpy as np
+import pytest
+
+try:
+    from . import load, stimulus
+except ImportError:
+    import stimulus
+    from pyber import load
+
+
+def _model(round, k=3):
+    try:
+        return load(round, k)
+    except ImportError as e:
+        pytest.skip(str(e))
+
+
+@pytest.mark.parametrize('round', [1, 2])
+@pytest.mark.parametrize('subtract', [False, True])
+def test_polyvec_nega_mac_batch(round, subtract):
+    model = _model(round)
+    stim = stimulus.Stimulus(seed=1)
+    n = 4
+    R = stim.coeffs('r', 0, (model.KYBER_N,), model.KYBER_Q, batch=n)
+    A = stim.coeffs('a', 0, (model.KYBER_K, model.KYBER_N), model.KYBER_Q, batch=n)
+    B = stim.coeffs('b', 0, (model.KYBER_K, model.KYBER_N), model.KYBER_Q, batch=n)
+
+    got = model.polyvec_nega_mac_batch(R, A, B, subtract)
+    for i in range(n):
+        pv_a = model.PolynomialVector([model.Polynomial(p) for p in A[i]])
+        pv_b = model.PolynomialVector([model.Polynomial(p) for p in B[i]])
+        exp = model.polyvec_nega_mac(model.Polynomial(R[i]), pv_a, pv_b, subtract)
+        assert np.array_equal(got[i], exp.coeffs), f"triple {i}"
+
+    out = np.zeros_like(got)
+    assert model.polyvec_nega_mac_batch(R, A, B, subtract, out=out) is out
+    assert np.array_equal(out, got)
+
+
+@pytest.mark.parametrize('round', [1, 2])
+def test_polyvec_nega_mac_batch_rejects_out_of_range(round):
+    model = _model(round)
+    R = np.zeros((1, model.KYBER_N), dtype=np.int64)
+    A = np.ones((1, model.KYBER_K, model.KYBER_N), dtype=np.int64)
+    B = A.copy()
+    model.polyvec_nega_mac_batch(R, A, B)
+
+    for bad in (-1, model.KYBER_Q, 1 << 16):
+        A[0, 1, 7] = bad
+        with pytest.raises(ValueError):
+            model.polyvec_nega_mac_batch(R, A, B)
+        with pytest.raises(ValueError):
+            model.polyvec_nega_mac_batch(R, B, A)
+        A[0, 1, 7] = 1
+    R[0, 0] = -1
+    with pytest.raises(ValueError):
+        model.polyvec_nega_mac_batch(R, A, B)
+    R[0, 0] = 0
+    with pytest.raises(ValueError):
+        model.polyvec_nega_mac_batch(R.astype(float), A, B)
+
+
+@pytest.mark.parametrize('round', [1, 2])
+def test_random(round):
+    model = _model(round)
+    a, b = model.Polynomial.random(), model.Polynomial.random()
+    assert a != b, "unseeded draws should differ"
+    for p in (a, b, *model.PolynomialVector.random().polys):
+        assert p.coeffs.dtype == model.COEFF_DTYPE and 0 <= p.coeffs.min() and p.coeffs.max() < model.KYBER_Q
+
+    assert model.Polynomial.random(np.random.default_rng(5)) == model.Polynomial.random(np.random.default_rng(5))
@@ -0,0 +1,52 @@
+"""
+    pytest checks of stimulus.Stimulus: items are independent of the batch they are drawn in
+"""
+import numpy as np
+import pytest
+
+try:
+    from .stimulus import Stimulus
+except ImportError:
+    from stimulus import Stimulus
+
+
+@pytest.mark.parametrize('nbytes', [1, 32, 33, 1088])
+def test_bytes_batch_independent(nbytes):
+    stim = Stimulus(seed=3)
+    batch = stim.bytes('coins', 0, nbytes, batch=8)
+    assert batch.shape == (8, nbytes) and batch.dtype == np.uint8
+    for i in range(8):
+        item = stim.bytes('coins', i, nbytes)
+        assert isinstance(item, bytes) and len(item) == nbytes
+        assert item == batch[i].tobytes()
+        assert item == stim.bytes('coins', 0, nbytes, batch=i + 1)[i].tobytes()
+        assert item == stim.bytes('coins', i, nbytes, batch=3)[0].tobytes()
+
+
+@pytest.mark.parametrize('q', [7681, 3329, 2])
+@pytest.mark.parametrize('shape', [(256,), (3, 256), (5,)])
+def test_coeffs_batch_independent(q, shape):
+    stim = Stimulus(seed=b'\x01\x02', stream='test')
+    batch = stim.coeffs('a', 0, shape, q, batch=6)
+    assert batch.shape == (6,) + shape and batch.dtype == np.uint16
+    assert batch.min() >= 0 and batch.max() < q
+    for i in range(6):
+        item = stim.coeffs('a', i, shape, q)
+        assert np.array_equal(item, batch[i])
+        assert np.array_equal(item, stim.coeffs('a', 0, shape, q, batch=i + 1)[i])
+
+
+def test_integers_full_range():
+    stim = Stimulus(seed=4)
+    batch = stim.integers('w', 0, 1 << 32, (64,), batch=4)
+    assert batch.max() < 1 << 32 and batch.max() >= 1 << 31
+    assert np.array_equal(stim.integers('w', 3, 1 << 32, (64,)), batch[3])
+
+
+def test_fields_and_seeds_differ():
+    a = Stimulus(seed=1)
+    assert a.bytes('x', 0, 32) != a.bytes('y', 0, 32)
+    assert a.bytes('x', 0, 32) != a.bytes('x', 1, 32)
+    assert a.bytes('x', 0, 32) != Stimulus(seed=2).bytes('x', 0, 32)
+    assert a.bytes('x', 0, 32) != Stimulus(seed=1, stream='other').bytes('x', 0, 32)
+    assert a.bytes('x', 0, 32) == Stimulus(seed=1).bytes('x', 0, 32)
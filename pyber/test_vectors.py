@@ -0,0 +1,78 @@
+"""
+    pytest checks of the golden-vector store, against the extensions that are built (the others are skipped)
+"""
+import pytest
+
+try:
+    from . import load, vectors
+except ImportError:
+    import vectors
+    from pyber import load
+
+
+def _model(round, k=3):
+    try:
+        return load(round, k)
+    except ImportError as e:
+        pytest.skip(str(e))
+
+
+@pytest.mark.parametrize('round', [1, 2])
+def test_multi_key_store(round, tmp_path):
+    model = _model(round)
+    n_keys = 3
+    with vectors.create(tmp_path / 'v.bin', model, seed=5, n_vectors=8, n_keys=n_keys, chunk=3) as store:
+        assert (store.round, store.k, store.seed, store.n_keys, len(store)) == (round, 3, 5, n_keys, 8)
+        for i in range(len(store)):
+            v = store.read(i)
+            pk, sk = model.seeded_keypair(5, i % n_keys)
+            assert (v.pk, v.sk) == (bytes(pk), bytes(sk))
+            assert bytes(model.indcpa_dec_batch(v.ct, sk)) == v.msg
+            if i >= n_keys:
+                other = model.seeded_keypair(5, (i + 1) % n_keys)[1]
+                assert bytes(model.indcpa_dec_batch(v.ct, other)) != v.msg
+
+
+@pytest.mark.parametrize('round', [1, 2])
+def test_open_matching(round, tmp_path):
+    model = _model(round)
+    path = tmp_path / 'v.bin'
+    vectors.create(path, model, seed=1, n_vectors=4, n_keys=2).close()
+
+    with vectors.open_matching(path, model, 1, 4, 2) as store:
+        assert len(store) == 4
+    with vectors.open_matching(path, model, 1, 2, 2) as store:
+        assert len(store) == 4
+    assert vectors.open_matching(path, model, 2, 4, 2) is None, "seed"
+    assert vectors.open_matching(path, model, 1, 5, 2) is None, "n_vectors"
+    assert vectors.open_matching(path, model, 1, 4, 1) is None, "n_keys"
+    assert vectors.open_matching(path, _model(3 - round), 1, 4, 2) is None, "round"
+    assert vectors.open_matching(path, _model(round, 2), 1, 4, 2) is None, "K"
+    assert vectors.open_matching(tmp_path / 'missing.bin', model, 1, 4, 2) is None
+
+    path.write_bytes(b'not a store')
+    assert vectors.open_matching(path, model, 1, 4, 2) is None
+
+
+def test_close_with_live_fields(tmp_path):
+    model = _model(2)
+    store = vectors.create(tmp_path / 'v.bin', model, seed=0, n_vectors=2)
+    v, column = store[1], store.column('ct')
+    ct = bytes(v.ct)
+    store.close()
+    store.close()
+    assert bytes(v.ct) == ct and column[1].tobytes() == ct
+    with pytest.raises(ValueError):
+        store[0]
+
+
+def test_create_failure_removes_tmp(tmp_path, monkeypatch):
+    model = _model(2)
+
+    def fail(*args):
+        raise RuntimeError("interrupted")
+
+    monkeypatch.setattr(vectors, 'fill_vectors', fail)
+    with pytest.raises(RuntimeError):
+        vectors.create(tmp_path / 'v.bin', model, seed=0, n_vectors=2)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,271 @@
+"""
+    Memory-mapped golden-vector store for the CPA testbenches
+
+    A store file holds `n_keys` key records (pk, sk, rsk, atpk) followed by `n_vectors` fixed-size vector records
+    (msg, coins, ct). Vector `i` is encrypted under key `i % n_keys`. All sizes live in the header, so a reader
+    needs neither the C model nor any parsing: `store[i]` is O(1) and returns zero-copy memoryview slices of the
+    mmap. Vectors are drawn from the seeded streams of the model (`seeded_keypair`, `seeded_msg_coins`), so a store
+    is fully determined by (round, K, seed, n_keys, n_vectors).
+
+    Generate once, then replay from any number of simulator processes:
+
+        store = vectors.open_or_create('cpa_vectors.bin', pyber2, seed=0, n_vectors=100000)
+        v = store[42]
+        v.atpk, v.msg, v.coins, v.ct
+        store.close()
+"""
+import mmap
+import os
+import struct
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b'PYBERVEC'
+VERSION = 1
+HEADER_BYTES = 128
+
+# magic, version, round, K, seed, n_keys, n_vectors, then the size of every field
+_HEADER = struct.Struct('<8sHBBQQQ7I')
+
+KEY_FIELDS = ('pk', 'sk', 'rsk', 'atpk')
+VECTOR_FIELDS = ('msg', 'coins', 'ct')
+FIELDS = KEY_FIELDS + VECTOR_FIELDS
+
+Vector = namedtuple('Vector', ('index',) + FIELDS)
+
+
+def field_sizes(model) -> dict:
+    """ record layout for a C model module (pyber or pyber2) """
+    return dict(pk=model.KYBER_INDCPA_PUBLICKEYBYTES,
+                sk=model.KYBER_INDCPA_SECRETKEYBYTES,
+                rsk=model.KYBER_INDCPA_SECRETKEYBYTES,
+                atpk=model.KYBER_POLYVECBYTES * (model.KYBER_K + 1),
+                msg=model.KYBER_INDCPA_MSGBYTES,
+                coins=model.KYBER_SYMBYTES,
+                ct=model.KYBER_CIPHERTEXTBYTES)
+
+
+class VectorStore():
+    def __init__(self, path):
+        self.path = Path(path)
+        with self.path.open('rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < HEADER_BYTES:
+            self._mm.close()
+            raise ValueError(f"{self.path} is too short to be a vector store")
+        (magic, version, self.round, self.k, self.seed, self.n_keys, self.n_vectors,
+         *sizes) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"{self.path} is not a version {VERSION} vector store")
+        self.sizes = dict(zip(FIELDS, sizes))
+
+        self._offsets = {}
+        off = 0
+        for name in KEY_FIELDS:
+            self._offsets[name] = off
+            off += self.sizes[name]
+        self.key_record_bytes = off
+        off = 0
+        for name in VECTOR_FIELDS:
+            self._offsets[name] = off
+            off += self.sizes[name]
+        self.vector_record_bytes = off
+        self._keys_base = HEADER_BYTES
+        self._vectors_base = HEADER_BYTES + self.n_keys * self.key_record_bytes
+
+        expected = self._vectors_base + self.n_vectors * self.vector_record_bytes
+        if len(self._mm) != expected:
+            self._mm.close()
+            raise ValueError(f"{self.path} is {len(self._mm)} bytes but its header describes {expected} bytes")
+        self._view = memoryview(self._mm)
+
+    def __repr__(self):
+        return f"VectorStore('{self.path}', round={self.round}, K={self.k}, seed={self.seed}, n_keys={self.n_keys}, n_vectors={self.n_vectors})"
+
+    def __len__(self):
+        return self.n_vectors
+
+    def _field(self, name, index):
+        if name in KEY_FIELDS:
+            start = self._keys_base + (index % self.n_keys) * self.key_record_bytes
+        else:
+            start = self._vectors_base + index * self.vector_record_bytes
+        start += self._offsets[name]
+        return self._view[start:start + self.sizes[name]]
+
+    def __getitem__(self, index) -> Vector:
+        if self._view is None:
+            raise ValueError(f"{self.path}: store is closed")
+        if index < 0:
+            index += self.n_vectors
+        if not 0 <= index < self.n_vectors:
+            raise IndexError(f"vector index {index} out of range (store has {self.n_vectors} vectors)")
+        return Vector(index, *(self._field(name, index) for name in FIELDS))
+
+    def __iter__(self):
+        for i in range(self.n_vectors):
+            yield self[i]
+
+    def field(self, name, index) -> memoryview:
+        """ one field of vector `index` """
+        return getattr(self[index], name)
+
+    def read(self, index) -> Vector:
+        """ vector `index` with its fields copied to bytes, valid after the store is closed """
+        return Vector(*(bytes(f) if isinstance(f, memoryview) else f for f in self[index]))
+
+    def column(self, name) -> np.ndarray:
+        """ read-only (n, size) uint8 view of a field over all key records (key fields) or vector records """
+        if self._view is None:
+            raise ValueError(f"{self.path}: store is closed")
+        if name in KEY_FIELDS:
+            base, n, stride = self._keys_base, self.n_keys, self.key_record_bytes
+        else:
+            base, n, stride = self._vectors_base, self.n_vectors, self.vector_record_bytes
+        return np.ndarray(shape=(n, self.sizes[name]), dtype=np.uint8, buffer=self._mm,
+                          offset=base + self._offsets[name], strides=(stride, 1))
+
+    def matches(self, model, seed, n_vectors=0, n_keys=None) -> bool:
+        """ True if this store holds (at least `n_vectors` of) the vector set of `model` and `seed` """
+        return (self.round == model.NIST_ROUND and self.k == model.KYBER_K and self.seed == seed and
+                self.sizes == field_sizes(model) and self.n_vectors >= n_vectors and
+                (n_keys is None or self.n_keys == n_keys))
+
+    def close(self):
+        """ release the mapping of the store; fields of `store[i]` and `column` views that are still alive keep it
+            mapped, and valid, until they are garbage-collected
+        """
+        if self._view is None:
+            return
+        self._view.release()
+        try:
+            self._mm.close()
+        except BufferError:
+            pass  # exported views hold the mmap, which is closed when the last of them goes
+        self._view = self._mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def key_records(model, seed: int, n_keys: int) -> list:
+    """ (pk, sk, rsk, atpk) of the `n_keys` keys of the vector set of `model` and `seed` """
+    sizes = field_sizes(model)
+    keys = []
+    for k in range(n_keys):
+        pk, sk = model.seeded_keypair(seed, k)
+        rsk = bytes(model.repack_sk_nontt(sk))
+        atpk = bytes(model.atpk_bytes(pk))
+        for name, value in zip(KEY_FIELDS, (pk, sk, rsk, atpk)):
+            assert len(value) == sizes[name], f"{name} was {len(value)} bytes but should be {sizes[name]} bytes"
+        keys.append((pk, sk, rsk, atpk))
+    return keys
+
+
+def header_bytes(model, seed: int, n_keys: int, n_vectors: int) -> bytes:
+    sizes = field_sizes(model)
+    header = _HEADER.pack(MAGIC, VERSION, model.NIST_ROUND, model.KYBER_K, seed, n_keys, n_vectors,
+                          *(sizes[name] for name in FIELDS))
+    return header.ljust(HEADER_BYTES, b'\0')
+
+
+def store_bytes(model, n_keys: int, n_vectors: int) -> int:
+    """ size of the store file of a vector set """
+    sizes = field_sizes(model)
+    return (HEADER_BYTES + n_keys * sum(sizes[name] for name in KEY_FIELDS) +
+            n_vectors * sum(sizes[name] for name in VECTOR_FIELDS))
+
+
+def fill_vectors(model, seed: int, keys: list, start: int, records: np.ndarray):
+    """ encrypt vectors start .. start + len(records) - 1 into `records`, a (n, vector record bytes) uint8 array
+
+        Every record depends only on (model, seed, its index), so any partition of a vector set into calls gives the
+        same bytes. Vectors are checked by decrypting them.
+    """
+    sizes = field_sizes(model)
+    n_keys = len(keys)
+    n = len(records)
+    msgs, coins = model.seeded_msg_coins(seed, start, n)
+    pks = b''.join(keys[i % n_keys][0] for i in range(start, start + n)) if n_keys > 1 else keys[0][0]
+    cts = model.indcpa_enc_batch(msgs, pks, coins)
+    msg_rows = np.frombuffer(msgs, dtype=np.uint8).reshape(n, -1)
+    ct_rows = np.frombuffer(cts, dtype=np.uint8).reshape(n, -1)
+    # every vector against the sk of its own key
+    key = (start + np.arange(n)) % n_keys
+    for k in np.unique(key):
+        rows = np.flatnonzero(key == k)
+        dec = model.indcpa_dec_batch(np.ascontiguousarray(ct_rows[rows]), keys[k][1])
+        bad = np.flatnonzero((np.frombuffer(dec, dtype=np.uint8).reshape(len(rows), -1) != msg_rows[rows]).any(axis=1))
+        assert len(bad) == 0, f"decryption of generated vector {start + rows[bad[0]]} failed"
+    o_coins = sizes['msg']
+    o_ct = o_coins + sizes['coins']
+    records[:, :o_coins] = msg_rows
+    records[:, o_coins:o_ct] = np.frombuffer(coins, dtype=np.uint8).reshape(n, -1)
+    records[:, o_ct:] = ct_rows
+
+
+def create(path, model, seed: int, n_vectors: int, n_keys: int = 1, chunk: int = 4096) -> VectorStore:
+    """ generate the vector set of `model` (pyber or pyber2) and `seed` into a new store at `path`
+
+        Vectors are encrypted in batches of `chunk` and checked by decrypting them. The file is written to a
+        temporary name and renamed, so concurrent readers never see a partial store. See `generate` for a parallel
+        version producing the same file.
+    """
+    assert n_keys >= 1 and n_vectors >= 0
+    sizes = field_sizes(model)
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+
+    keys = key_records(model, seed, n_keys)
+
+    try:
+        with tmp.open('wb') as f:
+            f.write(header_bytes(model, seed, n_keys, n_vectors))
+            for key in keys:
+                f.write(b''.join(key))
+
+            records = np.empty((min(chunk, max(n_vectors, 1)), sum(sizes[name] for name in VECTOR_FIELDS)),
+                               dtype=np.uint8)
+            for start in range(0, n_vectors, chunk):
+                rec = records[:min(chunk, n_vectors - start)]
+                fill_vectors(model, seed, keys, start, rec)
+                f.write(rec.tobytes())
+
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return VectorStore(path)
+
+
+def open_matching(path, model, seed: int, n_vectors: int, n_keys: int = 1):
+    """ the store at `path` if it exists and holds the requested vector set, else None """
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        store = VectorStore(path)
+    except ValueError:
+        return None
+    if store.matches(model, seed, n_vectors, n_keys):
+        return store
+    store.close()
+    return None
+
+
+def open_or_create(path, model, seed: int, n_vectors: int, n_keys: int = 1) -> VectorStore:
+    """ open the store at `path`, (re)generating it first if it does not hold the requested vector set """
+    store = open_matching(path, model, seed, n_vectors, n_keys)
+    if store is not None:
+        return store
+    return create(path, model, seed, n_vectors, n_keys)
+
+
+__all__ = ['VectorStore', 'Vector', 'create', 'open_or_create', 'open_matching', 'key_records', 'fill_vectors',
+           'header_bytes', 'store_bytes', 'field_sizes', 'FIELDS', 'KEY_FIELDS', 'VECTOR_FIELDS']
@@ -0,0 +1,55 @@
+"""
+    pytest checks of backpressure: a pattern is fully determined by its name
+"""
+import numpy as np
+import pytest
+
+import backpressure
+
+
+def _trace(path, bits):
+    path.write_text(''.join(map(str, bits)))
+    return str(path)
+
+
+@pytest.fixture
+def patterns(tmp_path):
+    (tmp_path / 'a,b').mkdir()
+    bits = [0, 0, 1, 1, 1, 0, 1, 0, 0]
+    return [backpressure.random(), backpressure.random(seed=7, p=0.25, n=16), backpressure.bursty(),
+            backpressure.bursty(seed=3, burst=4, gap=2, n=8), backpressure.periodic(), backpressure.periodic(3, 0),
+            backpressure.alternating(),
+            backpressure.trace(_trace(tmp_path / 'ready.txt', bits)),
+            backpressure.trace(_trace(tmp_path / 'a,b' / 'x,repeat=1.txt', bits), repeat=1),
+            backpressure.trace(_trace(tmp_path / '123', bits)),
+            backpressure.trace(_trace(tmp_path / 'p=1,q=2', [1, 0, 1]), repeat=0)]
+
+
+def test_round_trip(patterns):
+    for p in patterns:
+        assert backpressure.pattern(p.name) == p, p.name
+        assert backpressure.resolve(p.name) == p
+    assert len({p.name for p in patterns}) == len(patterns)
+
+
+def test_trace_round_trips_bits(tmp_path):
+    bits = [0, 1, 1, 0, 0, 0, 1]
+    p = backpressure.pattern(f"trace:path={_trace(tmp_path / '42', bits)}")
+    assert p.bits().tolist() == bits and not p.repeat
+    assert backpressure.from_bits('x', p.bits()).windows == p.windows
+
+
+def test_bad_names(tmp_path):
+    with pytest.raises(ValueError):
+        backpressure.pattern('sometimes')
+    with pytest.raises(ValueError):
+        backpressure.pattern('random:seed')
+    with pytest.raises(ValueError):
+        backpressure.pattern(f"trace:{tmp_path / 'ready.txt'}")
+
+
+def test_window_past_end():
+    p = backpressure.from_bits('x', np.array([1, 0]))
+    assert p.window(0) == (1, 1, 1)
+    assert p.window(1) == (True, False, 1)
+    assert backpressure.periodic(2, 3).window(1) == (2, 3, 1)
@@ -40,7 +40,7 @@ def func_test(dut, valid_gen=None, ready_gen=None):
     log = dut._log 
     yield tb.reset()
     
-    input = [tb.rnd.randint(0, 255) for _ in range(KYBER_ETA * KYBER_N // 4)]
+    input = list(tb.stimulus.bytes('cbd_in', tb.test_index, KYBER_ETA * KYBER_N // 4))
     nibble_in = []
     for i in input:
         nibble_in.append(i % 16)
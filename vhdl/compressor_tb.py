@@ -20,14 +20,17 @@ from cocotb.regression import TestFactory
 
 from cmd_tester import ValidReadyTester
 
+from pyber import load
+
 round2 = True
 
-if round2:
-    import pyber2 as pyber
-    from pyber2 import KYBER_K, KYBER_N, KYBER_POLYCOMPRESSEDBYTES, KYBER_POLYVECCOMPRESSEDBYTES, poly_tomsg, Polynomial
-else:
-    import pyber
-    from pyber import KYBER_K, KYBER_N, KYBER_POLYCOMPRESSEDBYTES, KYBER_POLYVECCOMPRESSEDBYTES, poly_tomsg, Polynomial
+pyber = load(round=2 if round2 else 1)
+KYBER_K = pyber.KYBER_K
+KYBER_N = pyber.KYBER_N
+KYBER_POLYCOMPRESSEDBYTES = pyber.KYBER_POLYCOMPRESSEDBYTES
+KYBER_POLYVECCOMPRESSEDBYTES = pyber.KYBER_POLYVECCOMPRESSEDBYTES
+poly_tomsg = pyber.poly_tomsg
+Polynomial = pyber.Polynomial
 
 
 @cocotb.coroutine
@@ -45,14 +48,14 @@ def func_test(dut, debug=True, is_polyvec=False, is_msg=True, valid_generator=No
         poly_bytes = [i & 0xff for i in range(KYBER_POLYCOMPRESSEDBYTES)]
         polyvec_bytes = [i & 0xff for i in range(KYBER_POLYVECCOMPRESSEDBYTES)]
     else:
-        poly_bytes = [tb.rnd.randint(0, 0xff) for _ in range(KYBER_POLYCOMPRESSEDBYTES)]
-        polyvec_bytes = [tb.rnd.randint(0, 0xff) for _ in range(KYBER_POLYVECCOMPRESSEDBYTES)]
+        poly_bytes = list(tb.stimulus.bytes('poly_bytes', tb.test_index, KYBER_POLYCOMPRESSEDBYTES))
+        polyvec_bytes = list(tb.stimulus.bytes('polyvec_bytes', tb.test_index, KYBER_POLYVECCOMPRESSEDBYTES))
         
     
     if is_polyvec:
         pass
     else:
-        poly = Polynomial.random(tb.rnd)
+        poly = tb.stimulus.polynomial(pyber, 'poly', tb.test_index)
         exp = poly_tomsg(poly)
         if debug:
             poly.dump()
@@ -205,6 +205,7 @@ architecture RTL of cpa is
 	signal decompress_coefout_ready   : std_logic;
 	--
 	signal DUMMY_NIST_ROUND           : positive := P_NIST_ROUND;
+	signal DUMMY_KYBER_K              : positive := P_KYBER_K; -- @suppress "Unused declaration"
 
 begin
 
@@ -135,6 +135,9 @@ architecture RTL of cpa_dec is
 	signal decompress_coefout_valid   : std_logic;
 	signal decompress_coefout_ready   : std_logic;
 	signal ct_byte_cntr               : unsigned(log2ceilnz(KYBER_POLYVECCOMPRESSEDBYTES) - 1 downto 0);
+	-- parameters of this build, read by the testbench
+	signal DUMMY_NIST_ROUND           : positive := P_NIST_ROUND; -- @suppress "Unused declaration"
+	signal DUMMY_KYBER_K              : positive := P_KYBER_K; -- @suppress "Unused declaration"
 
 	type T_state is (
 		S_init,
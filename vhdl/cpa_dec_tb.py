@@ -9,14 +9,13 @@
 ##
 ############################################################################################################
 
+import os
 import cocotb
 from cocotb.triggers import RisingEdge
 from cocotb.regression import TestFactory
 from cocotb.generators.bit import wave, intermittent_single_cycles, random_50_percent
 from cmd_tester import CmdDoneTester, to_hex_str
-import pyber
-from pyber import (KYBER_CIPHERTEXTBYTES, KYBER_INDCPA_SECRETKEYBYTES, KYBER_POLYVECCOMPRESSEDBYTES,
-                   KYBER_POLYCOMPRESSEDBYTES, KYBER_INDCPA_MSGBYTES, KYBER_SYMBYTES)
+from pyber import load, vectors
 
 
 @cocotb.test()
@@ -30,27 +29,27 @@ def cpa_enc_tb(dut, debug=True, valid_generator=None, ready_generator=None):
 
     clkedge = RisingEdge(dut.clk)
 
+    # the model of the parameters the DUT was built with
+    pyber = load(round=int(tb.dut.DUMMY_NIST_ROUND), k=int(tb.dut.DUMMY_KYBER_K))
+
     dut.i_start_dec <= 0
     dut.i_recv_sk <= 0
 
-    pk, sk = pyber.indcpa_keypair()
-
-    msg = [tb.rnd.randint(0, 0xff) for i in range(KYBER_INDCPA_MSGBYTES)]
-    coins = [tb.rnd.randint(0, 0xff) for i in range(KYBER_SYMBYTES)]
-
-    ct = list(pyber.indcpa_enc(msg, pk, coins))
-    msg1 = list(pyber.indcpa_dec(ct, sk))
+    # vector `index` of the set identified by (round, K, seed) is always the same; PYBER_INDEX re-runs a single one
+    seed = int(os.getenv('PYBER_SEED', '0'))
+    index = int(os.getenv('PYBER_INDEX', '0'))
+    tb.log.info(f"seed={seed} index={index}")
+    with vectors.open_or_create(os.getenv('PYBER_VECTORS', f'cpa_vectors_r{pyber.NIST_ROUND}_k{pyber.KYBER_K}.bin'),
+                                pyber, seed, max(index + 1, int(os.getenv('PYBER_N_VECTORS', '1')))) as store:
+        v = store.read(index)
 
-    assert msg == msg1
+    rsk, ct = list(v.rsk), list(v.ct)
+    ct_bp = ct[:pyber.KYBER_POLYVECCOMPRESSEDBYTES]
+    assert len(ct_bp) == pyber.KYBER_POLYVECCOMPRESSEDBYTES
+    ct_v = ct[pyber.KYBER_POLYVECCOMPRESSEDBYTES:]
+    assert len(ct_v) == pyber.KYBER_POLYCOMPRESSEDBYTES
 
-    rsk = pyber.repack_sk_nontt(sk)
-    ct_bp = ct[:KYBER_POLYVECCOMPRESSEDBYTES]
-    assert len(ct_bp) == KYBER_POLYVECCOMPRESSEDBYTES
-    ct_v = ct[KYBER_POLYVECCOMPRESSEDBYTES:] 
-    assert len(ct_v) == KYBER_POLYCOMPRESSEDBYTES
-
-    exp = list(pyber.indcpa_dec_nontt(ct_bp + ct_v, rsk))
-    assert exp == msg, f"exp = {exp} msg={msg}"
+    exp = list(v.msg)  # the store checked that ct decrypts to msg
 
     # This should come first!
     tb.expect_output('pt', exp)
@@ -60,7 +59,7 @@ def cpa_enc_tb(dut, debug=True, valid_generator=None, ready_generator=None):
     tb.log.info("sending SecretKey")
     if debug:
         tb.log.info(f"rsk: {to_hex_str(rsk)}")
-    dut.i_recv_sk <= 1
+    tb.start_command('RECV_SK', dut.i_recv_sk)
     yield tb.drive_input('sk', rsk)
 
     tb.log.info("waiting for done...")
@@ -70,7 +69,7 @@ def cpa_enc_tb(dut, debug=True, valid_generator=None, ready_generator=None):
     yield clkedge  # optional
 
     tb.log.info("sending command start_dec")
-    dut.i_start_dec <= 1
+    tb.start_command('START_DEC', dut.i_start_dec)
     tb.log.info("sending ciphertext")
 
     tb.log.info(f"sending ct_bp: {to_hex_str(ct_bp)}")
@@ -87,6 +86,8 @@ def cpa_enc_tb(dut, debug=True, valid_generator=None, ready_generator=None):
     yield clkedge  # optional
     yield clkedge  # optional
 
+    tb.save_perf(os.getenv('PERF_FILE', f'cpa_dec_perf_{tb.test_index}.json'))
+
     raise tb.scoreboard.result
 
 
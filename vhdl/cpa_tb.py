@@ -9,11 +9,13 @@
 ##
 ############################################################################################################
 
+import os
 import cocotb
 from cocotb.triggers import RisingEdge
 from cocotb.regression import TestFactory, TestSuccess, TestError
 from cocotb.generators.bit import wave, intermittent_single_cycles, random_50_percent
-from cmd_tester import CmdDoneTester, to_hex_str
+from cmd_tester_async import CmdDoneTester, Command, Job, to_hex_str
+from pyber import load, vectors
 
 
 CMD_RECV_PK = 1
@@ -21,48 +23,55 @@ CMD_START_ENC = 2
 CMD_RECV_SK = 3
 CMD_START_DEC = 4
 
+
+def open_vectors(pyber, n_vectors):
+    """ the vector store of PYBER_SEED, vector `index` of the set identified by (round, K, seed) is always the same;
+        vector i uses key i % PYBER_N_KEYS
+    """
+    seed = int(os.getenv('PYBER_SEED', '0'))
+    n_keys = int(os.getenv('PYBER_N_KEYS', '1'))
+    path = os.getenv('PYBER_VECTORS', f'cpa_vectors_r{pyber.NIST_ROUND}_k{pyber.KYBER_K}.bin')
+    return vectors.open_or_create(path, pyber, seed, max(n_vectors, int(os.getenv('PYBER_N_VECTORS', '1'))), n_keys)
+
+
+def enc_job(store, v, split_ct=0):
+    """ split_ct: if non-zero, ct is expected as two pdo transactions of different lengths, ct[:split_ct] then the rest """
+    ct = [('pdo', v.ct[:split_ct]), ('pdo', v.ct[split_ct:])] if split_ct else [('pdo', v.ct)]
+    return Job(('pk', v.index % store.n_keys),
+               Command('RECV_PK', CMD_RECV_PK, [('pdi', v.atpk)], []),
+               Command('START_ENC', CMD_START_ENC, [('rdi', v.coins), ('sdi', v.msg)], ct))
+
+
+def dec_job(store, v):
+    return Job(('sk', v.index % store.n_keys),
+               Command('RECV_SK', CMD_RECV_SK, [('sdi', v.rsk)], []),
+               Command('START_DEC', CMD_START_DEC, [('pdi', v.ct)], [('sdo', v.msg)]))
+
 @cocotb.test()
-def cpa_enc_tb(dut, debug=True, enc_dec=(False, True), valid_generator=None, ready_generator=None):
+async def cpa_enc_tb(dut, debug=True, enc_dec=(False, True), valid_generator=None, ready_generator=None):
     """
         testbench for CPA encrypt top module
     """
     enc, dec = enc_dec
     tb = CmdDoneTester(dut, dut.clk, valid_generator=valid_generator, ready_generator=ready_generator)
 
-    yield tb.reset()  # important!
+    await tb.reset()  # important!
 
 
-    ###
-    if tb.dut.DUMMY_NIST_ROUND == 1:
-        import pyber
-        from pyber import (atpk_bytes, KYBER_INDCPA_PUBLICKEYBYTES, KYBER_Q, KYBER_CIPHERTEXTBYTES, KYBER_INDCPA_SECRETKEYBYTES, KYBER_POLYVECCOMPRESSEDBYTES,
-                        KYBER_POLYCOMPRESSEDBYTES, KYBER_INDCPA_MSGBYTES, KYBER_SYMBYTES)
-
-    else:
-        import pyber2 as pyber
-        from pyber2 import (atpk_bytes, KYBER_INDCPA_PUBLICKEYBYTES, KYBER_Q, KYBER_CIPHERTEXTBYTES, KYBER_INDCPA_SECRETKEYBYTES, KYBER_POLYVECCOMPRESSEDBYTES,
-                            KYBER_POLYCOMPRESSEDBYTES, KYBER_INDCPA_MSGBYTES, KYBER_SYMBYTES)
-    ###
+    pyber = load(round=int(tb.dut.DUMMY_NIST_ROUND), k=int(tb.dut.DUMMY_KYBER_K))
     clkedge = RisingEdge(dut.clk)
 
     dut.i_command <= 0
 
-    yield clkedge
-
-    pk, sk = pyber.indcpa_keypair()
+    await clkedge
 
-    rsk = pyber.repack_sk_nontt(sk)
+    # PYBER_INDEX re-runs a single vector
+    index = int(os.getenv('PYBER_INDEX', '0'))
+    with open_vectors(pyber, index + 1) as store:
+        tb.log.info(f"seed={store.seed} index={index}")
+        v = store.read(index)
 
-    msg = [tb.rnd.randint(0, 0xff) for i in range(KYBER_INDCPA_MSGBYTES)]
-    coins = [tb.rnd.randint(0, 0xff) for i in range(KYBER_SYMBYTES)]
-
-    ct = list(pyber.indcpa_enc(msg, pk, coins))
-
-    msg1 = list(pyber.indcpa_dec(ct, sk))
-
-    assert msg == msg1
-
-    atpk = list(atpk_bytes(pk))
+    rsk, atpk, msg, coins, ct = list(v.rsk), list(v.atpk), list(v.msg), list(v.coins), list(v.ct)
 
     if enc:
         # This should come first!
@@ -73,33 +82,33 @@ def cpa_enc_tb(dut, debug=True, enc_dec=(False, True), valid_generator=None, rea
         tb.log.info("sending AT+PK")
         if debug:
             print(f"at+pk: {to_hex_str(atpk)}")
-        dut.i_command <= CMD_RECV_PK
-        yield tb.drive_input('pdi', atpk)
+        tb.start_command('RECV_PK', dut.i_command, CMD_RECV_PK)
+        await tb.drive_input('pdi', v.atpk)
 
         print("waiting for done...")
-        yield tb.wait_for_done()
-        yield clkedge  # optional
+        await tb.wait_for_done()
+        await clkedge  # optional
         dut.i_command <= 0
-        yield clkedge  # optional
+        await clkedge  # optional
 
         tb.log.info("sending [CMD_START_ENC]")
         tb.log.info("sending coins")
         if debug:
             print(f"coins: {to_hex_str(coins)}")
-        dut.i_command <= CMD_START_ENC
-        yield tb.drive_input('rdi', coins)
+        tb.start_command('START_ENC', dut.i_command, CMD_START_ENC)
+        await tb.drive_input('rdi', v.coins)
 
         tb.log.info("sending message")
         if debug:
             print(f"message: {to_hex_str(msg)}")
-        yield tb.drive_input('sdi', msg)
+        await tb.drive_input('sdi', v.msg)
 
         tb.log.info("waiting for done")
-        yield tb.wait_for_done()
+        await tb.wait_for_done()
 
         dut.i_command <= 0
 
-        yield clkedge  # optional
+        await clkedge  # optional
         try:
             raise tb.scoreboard.result
         except TestSuccess:
@@ -116,29 +125,29 @@ def cpa_enc_tb(dut, debug=True, enc_dec=(False, True), valid_generator=None, rea
         tb.log.info("sending SK")
         if debug:
             print(f"repacked sk: {to_hex_str(rsk)}")
-        dut.i_command <= CMD_RECV_SK
-        yield tb.drive_input('sdi', rsk)
+        tb.start_command('RECV_SK', dut.i_command, CMD_RECV_SK)
+        await tb.drive_input('sdi', v.rsk)
 
         print("waiting for done...")
-        yield tb.wait_for_done()
-        yield clkedge  # optional
+        await tb.wait_for_done()
+        await clkedge  # optional
         dut.i_command <= 0
-        yield clkedge  # optional
+        await clkedge  # optional
 
         tb.log.info("sending [CMD_START_DEC]")
-        dut.i_command <= CMD_START_DEC
+        tb.start_command('START_DEC', dut.i_command, CMD_START_DEC)
 
         tb.log.info("sending ciphertext")
         if debug:
             print(f"ciphertext: {to_hex_str(ct)}")
-        yield tb.drive_input('pdi', ct)
+        await tb.drive_input('pdi', v.ct)
 
         tb.log.info("waiting for done")
-        yield tb.wait_for_done()
+        await tb.wait_for_done()
 
         dut.i_command <= 0
 
-        yield clkedge  # optional
+        await clkedge  # optional
         
         try:
             raise tb.scoreboard.result
@@ -146,8 +155,57 @@ def cpa_enc_tb(dut, debug=True, enc_dec=(False, True), valid_generator=None, rea
             tb.log.info("Dec PASSED!")
             pass
         
-        yield clkedge  # optional
-        yield clkedge  # optional
+        await clkedge  # optional
+        await clkedge  # optional
+
+    # cycles per command and bus stalls, tracked across runs
+    tb.save_perf(os.getenv('PERF_FILE', f'cpa_perf_r{pyber.NIST_ROUND}_k{pyber.KYBER_K}.json'))
+
+
+async def run_throughput(dut, enc_dec=(True, True), split_ct=False, valid_generator=None, ready_generator=None):
+    """
+        sustained throughput: PYBER_JOBS encryptions, then as many decryptions, of the vectors from PYBER_INDEX on, back
+        to back; keys are only loaded when they change
+    """
+    enc, dec = enc_dec
+    tb = CmdDoneTester(dut, dut.clk, valid_generator=valid_generator, ready_generator=ready_generator)
+
+    await tb.reset()  # important!
+
+    pyber = load(round=int(tb.dut.DUMMY_NIST_ROUND), k=int(tb.dut.DUMMY_KYBER_K))
+    dut.i_command <= 0
+    await RisingEdge(dut.clk)
+
+    n_jobs = int(os.getenv('PYBER_JOBS'))
+    index = int(os.getenv('PYBER_INDEX', '0'))
+    with open_vectors(pyber, index + n_jobs) as store:
+        tb.log.info(f"seed={store.seed} vectors {index}..{index + n_jobs - 1}, {store.n_keys} keys")
+        vs = [store.read(i) for i in range(index, index + n_jobs)]
+
+    if enc:
+        split = pyber.KYBER_POLYVECCOMPRESSEDBYTES if split_ct else 0
+        await tb.run_jobs([enc_job(store, v, split) for v in vs], dut.i_command)
+    if dec:
+        await tb.run_jobs([dec_job(store, v) for v in vs], dut.i_command)
+
+    await RisingEdge(dut.clk)
+    try:
+        raise tb.scoreboard.result
+    except TestSuccess:
+        tb.log.info("PASSED!")
+
+    tb.save_perf(os.getenv('PERF_FILE', f'cpa_throughput_r{pyber.NIST_ROUND}_k{pyber.KYBER_K}.json'))
+
+
+@cocotb.test(skip=not int(os.getenv('PYBER_JOBS', '0')))
+async def cpa_throughput_tb(dut):
+    await run_throughput(dut)
+
+
+@cocotb.test(skip=not int(os.getenv('PYBER_JOBS', '0')))
+async def cpa_throughput_split_ct_tb(dut):
+    """ encryptions only, every ct checked as its u then v part: queued pdo transactions of two different lengths """
+    await run_throughput(dut, enc_dec=(True, False), split_ct=True)
 
 
 
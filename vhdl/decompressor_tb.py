@@ -23,14 +23,17 @@ from cocotb.generators.byte import random_data, get_bytes
 from cocotb.handle import ModifiableObject
 from cmd_tester import ValidReadyTester
 
+from pyber import load
+
 round2 = True
 
-if round2:
-    import pyber2 as pyber
-    from pyber2 import KYBER_K, KYBER_N, KYBER_POLYCOMPRESSEDBYTES, KYBER_POLYVECCOMPRESSEDBYTES, poly_decompress, polyvec_decompress
-else:
-    import pyber
-    from pyber import KYBER_K, KYBER_N, KYBER_POLYCOMPRESSEDBYTES, KYBER_POLYVECCOMPRESSEDBYTES, poly_decompress, polyvec_decompress
+pyber = load(round=2 if round2 else 1)
+KYBER_K = pyber.KYBER_K
+KYBER_N = pyber.KYBER_N
+KYBER_POLYCOMPRESSEDBYTES = pyber.KYBER_POLYCOMPRESSEDBYTES
+KYBER_POLYVECCOMPRESSEDBYTES = pyber.KYBER_POLYVECCOMPRESSEDBYTES
+poly_decompress = pyber.poly_decompress
+polyvec_decompress = pyber.polyvec_decompress
 
 
 @cocotb.coroutine
@@ -47,8 +50,8 @@ def func_test(dut, debug=True, is_polyvec=True, valid_generator=None, ready_gene
         poly_bytes = [i & 0xff for i in range(KYBER_POLYCOMPRESSEDBYTES)]
         polyvec_bytes = [i & 0xff for i in range(KYBER_POLYVECCOMPRESSEDBYTES)]
     else:
-        poly_bytes = [tb.rnd.randint(0, 0xff) for _ in range(KYBER_POLYCOMPRESSEDBYTES)]
-        polyvec_bytes = [tb.rnd.randint(0, 0xff) for _ in range(KYBER_POLYVECCOMPRESSEDBYTES)]
+        poly_bytes = list(tb.stimulus.bytes('poly_bytes', tb.test_index, KYBER_POLYCOMPRESSEDBYTES))
+        polyvec_bytes = list(tb.stimulus.bytes('polyvec_bytes', tb.test_index, KYBER_POLYVECCOMPRESSEDBYTES))
         
     
     if is_polyvec:
@@ -177,6 +177,7 @@ architecture RTL of polyvec_mac is
 	signal dp_remout_ready       : std_logic;
 	--
 	signal DUMMY_NIST_ROUND      : positive := P_NIST_ROUND; -- @suppress "Unused declaration"
+	signal DUMMY_KYBER_K         : positive := P_KYBER_K; -- @suppress "Unused declaration"
 	signal dp_divier_empty       : std_logic;
 
 begin
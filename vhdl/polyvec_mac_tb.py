@@ -21,6 +21,7 @@ from cocotb.regression import TestFactory
 from cocotb.scoreboard import Scoreboard
 from cocotb.generators.bit import wave, intermittent_single_cycles, random_50_percent
 from cmd_tester import CmdDoneTester
+from pyber import load
 
 
 @cocotb.coroutine
@@ -32,14 +33,9 @@ def run_test(dut, subtract=True, valid_generator=None, ready_generator=None):
     yield tb.reset()
     clkedge = RisingEdge(dut.clk)
 
-    ###
-    if tb.dut.DUMMY_NIST_ROUND == 1:
-        import pyber
-        from pyber import (Polynomial, PolynomialVector, KYBER_N, KYBER_Q)
-    else:
-        import pyber2 as pyber
-        from pyber2 import (Polynomial, PolynomialVector, KYBER_N, KYBER_Q)
-    ###
+    pyber = load(round=int(tb.dut.DUMMY_NIST_ROUND), k=int(tb.dut.DUMMY_KYBER_K))
+    Polynomial, PolynomialVector = pyber.Polynomial, pyber.PolynomialVector
+    KYBER_N, KYBER_Q = pyber.KYBER_N, pyber.KYBER_Q
 
     dut.i_rama_blk <= 0
 
@@ -53,7 +49,7 @@ def run_test(dut, subtract=True, valid_generator=None, ready_generator=None):
 
     yield clkedge
 
-    a = PolynomialVector.random(tb.rnd)
+    a = tb.stimulus.polyvec(pyber, 'a', tb.test_index)
     # a = PolynomialVector.zero()
     # a.polys[0].coeffs[0] = 1
     # a.polys[1].coeffs[0] = 1
@@ -63,7 +59,7 @@ def run_test(dut, subtract=True, valid_generator=None, ready_generator=None):
     # a.polys[2].coeffs[1] = 1
     # print("a--------")
     # a.dump()
-    b = PolynomialVector.random(tb.rnd)
+    b = tb.stimulus.polyvec(pyber, 'b', tb.test_index)
     # b = PolynomialVector.zero()
     # b.polys[0].coeffs[0] = 1
     # b.polys[1].coeffs[0] = 1
@@ -74,7 +70,7 @@ def run_test(dut, subtract=True, valid_generator=None, ready_generator=None):
     # print("\nb--------")
     # b.dump()
     # r = Polynomial.zero()
-    v = Polynomial.random(tb.rnd)
+    v = tb.stimulus.polynomial(pyber, 'v', tb.test_index)
     
     # print("r--------")
     # r.dump()
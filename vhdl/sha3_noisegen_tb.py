@@ -47,8 +47,8 @@ def func_test(dut, valid_gen=None, ready_gen=None):
     
     clkedge = RisingEdge(dut.clk)
 
-    coins = [tb.rnd.randint(0,255) for _ in range(KYBER_SYMBYTES)]
-    nonce = tb.rnd.randint(0, 255)
+    coins = list(tb.stimulus.bytes('coins', tb.test_index, KYBER_SYMBYTES))
+    nonce = int(tb.stimulus.integers('nonce', tb.test_index, 256))
     exp = getnoise_bytes(coins, nonce)
 
     print(f"exp={exp}")